@@ -103,15 +103,19 @@ def add_test_pdf():
             
             # Save the PDF to the file
             with open(test_pdf_path, "wb") as f:
-                f.write(buffer.getvalue())
+                f.write(buffer.getbuffer())
         
         # Generate a unique filename
         timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
         unique_filename = f"{timestamp}_test_compliance.pdf"
         
-        # Copy the test PDF to the storage location
+        # Put the test PDF in the storage location; a hard link needs no data copied, and a plain
+        # copy is used when linking isn't possible (e.g. storage on another file system)
         dest_path = os.path.join(settings.PDF_STORAGE_PATH, unique_filename)
-        shutil.copyfile(test_pdf_path, dest_path)
+        try:
+            os.link(test_pdf_path, dest_path)
+        except OSError:
+            shutil.copyfile(test_pdf_path, dest_path)
         
         # Create a PDF record in the database
         pdf = PDF(
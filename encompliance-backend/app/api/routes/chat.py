@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 from sqlalchemy.orm import Session
-from app.services.llm_service import get_llm_response, call_openai_api_streaming, call_local_model_api
+from app.services.llm_service import get_llm_response, call_openai_api_streaming, call_local_model_api, clear_env_cache, get_http_client
 from app.services.document_service import get_document_context
 from app.core.config import get_settings, SYSTEM_PROMPT
 from app.database import get_db
@@ -13,10 +13,14 @@ from fastapi.responses import JSONResponse, StreamingResponse
 from app.core.chat_utils import enhance_system_message_with_pdf_context, get_compliance_system_message
 import traceback
 import datetime
+import httpx
 from sqlalchemy import func
 
 router = APIRouter(tags=["chat"])
 
+# Connection tests reuse the shared LLM client but should fail fast
+CONNECTION_TEST_TIMEOUT = httpx.Timeout(10.0)
+
 # Add OPTIONS handler for CORS preflight requests
 @router.options("/chat")
 async def options_chat():
@@ -447,7 +451,6 @@ async def test_connection(
                 return {"success": False, "error": "Local model URL is required"}
             
             # Test connection to local LLM
-            import httpx
             try:
                 # Use the LM Studio OpenAI-compatible chat endpoint with the correct path
                 base_url = request.local_model_url
@@ -461,24 +464,24 @@ async def test_connection(
                 else:
                     endpoint_url = f"{base_url}/v1/chat/completions"
                 
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    response = await client.post(
-                        endpoint_url,
-                        headers={"Content-Type": "application/json"},
-                        json={
-                            "messages": [
-                                {"role": "system", "content": SYSTEM_PROMPT},
-                                {"role": "user", "content": "Hello, this is a test message."}
-                            ],
-                            "max_tokens": 10
-                        },
-                        timeout=10.0
-                    )
-                    
-                    if response.status_code != 200:
-                        return {"success": False, "error": f"Failed to connect to local LLM: {response.text}"}
-                    
-                    return {"success": True, "provider": "local"}
+                client = get_http_client()
+                response = await client.post(
+                    endpoint_url,
+                    headers={"Content-Type": "application/json"},
+                    json={
+                        "messages": [
+                            {"role": "system", "content": SYSTEM_PROMPT},
+                            {"role": "user", "content": "Hello, this is a test message."}
+                        ],
+                        "max_tokens": 10
+                    },
+                    timeout=CONNECTION_TEST_TIMEOUT
+                )
+                
+                if response.status_code != 200:
+                    return {"success": False, "error": f"Failed to connect to local LLM: {response.text}"}
+                
+                return {"success": True, "provider": "local"}
             except Exception as e:
                 return {"success": False, "error": f"Failed to connect to local LLM: {str(e)}"}
         
@@ -510,106 +513,109 @@ async def test_connection(
             if detected_provider == "openai":
                 os.environ["OPENAI_API_KEY"] = request.api_key
                 # Make a simple test request to the OpenAI API
-                import httpx
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    # First check if the API key is valid by getting models
-                    response = await client.get(
-                        "https://api.openai.com/v1/models",
-                        headers={
-                            "Authorization": f"Bearer {request.api_key}",
-                            "Content-Type": "application/json"
-                        }
-                    )
-                    if response.status_code != 200:
-                        return {"success": False, "error": f"Failed to connect to OpenAI API: {response.text}"}
-                    
-                    # Then test a simple chat completion with our system prompt
-                    chat_response = await client.post(
-                        "https://api.openai.com/v1/chat/completions",
-                        headers={
-                            "Authorization": f"Bearer {request.api_key}",
-                            "Content-Type": "application/json"
-                        },
-                        json={
-                            "model": "gpt-3.5-turbo",
-                            "messages": [
-                                {"role": "system", "content": SYSTEM_PROMPT},
-                                {"role": "user", "content": "Hello, this is a test message."}
-                            ],
-                            "max_tokens": 10
-                        }
-                    )
-                    if chat_response.status_code != 200:
-                        return {"success": False, "error": f"Failed to test chat completion: {chat_response.text}"}
+                client = get_http_client()
+                # First check if the API key is valid by getting models
+                response = await client.get(
+                    "https://api.openai.com/v1/models",
+                    headers={
+                        "Authorization": f"Bearer {request.api_key}",
+                        "Content-Type": "application/json"
+                    },
+                    timeout=CONNECTION_TEST_TIMEOUT
+                )
+                if response.status_code != 200:
+                    return {"success": False, "error": f"Failed to connect to OpenAI API: {response.text}"}
+                
+                # Then test a simple chat completion with our system prompt
+                chat_response = await client.post(
+                    "https://api.openai.com/v1/chat/completions",
+                    headers={
+                        "Authorization": f"Bearer {request.api_key}",
+                        "Content-Type": "application/json"
+                    },
+                    json={
+                        "model": "gpt-3.5-turbo",
+                        "messages": [
+                            {"role": "system", "content": SYSTEM_PROMPT},
+                            {"role": "user", "content": "Hello, this is a test message."}
+                        ],
+                        "max_tokens": 10
+                    },
+                    timeout=CONNECTION_TEST_TIMEOUT
+                )
+                if chat_response.status_code != 200:
+                    return {"success": False, "error": f"Failed to test chat completion: {chat_response.text}"}
             elif detected_provider == "anthropic":
                 os.environ["ANTHROPIC_API_KEY"] = request.api_key
                 # Make a simple test request to the Anthropic API
-                import httpx
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    # First check if the API key is valid by getting models
-                    response = await client.get(
-                        "https://api.anthropic.com/v1/models",
-                        headers={
-                            "x-api-key": request.api_key,
-                            "anthropic-version": "2023-06-01",
-                            "Content-Type": "application/json"
-                        }
-                    )
-                    if response.status_code != 200:
-                        return {"success": False, "error": f"Failed to connect to Anthropic API: {response.text}"}
-                    
-                    # Then test a simple message with our system prompt
-                    chat_response = await client.post(
-                        "https://api.anthropic.com/v1/messages",
-                        headers={
-                            "x-api-key": request.api_key,
-                            "anthropic-version": "2023-06-01",
-                            "Content-Type": "application/json"
-                        },
-                        json={
-                            "model": "claude-3-haiku-20240307",
-                            "system": SYSTEM_PROMPT,
-                            "messages": [
-                                {"role": "user", "content": "Hello, this is a test message."}
-                            ],
-                            "max_tokens": 10
-                        }
-                    )
-                    if chat_response.status_code != 200:
-                        return {"success": False, "error": f"Failed to test chat completion: {chat_response.text}"}
+                client = get_http_client()
+                # First check if the API key is valid by getting models
+                response = await client.get(
+                    "https://api.anthropic.com/v1/models",
+                    headers={
+                        "x-api-key": request.api_key,
+                        "anthropic-version": "2023-06-01",
+                        "Content-Type": "application/json"
+                    },
+                    timeout=CONNECTION_TEST_TIMEOUT
+                )
+                if response.status_code != 200:
+                    return {"success": False, "error": f"Failed to connect to Anthropic API: {response.text}"}
+                
+                # Then test a simple message with our system prompt
+                chat_response = await client.post(
+                    "https://api.anthropic.com/v1/messages",
+                    headers={
+                        "x-api-key": request.api_key,
+                        "anthropic-version": "2023-06-01",
+                        "Content-Type": "application/json"
+                    },
+                    json={
+                        "model": "claude-3-haiku-20240307",
+                        "system": SYSTEM_PROMPT,
+                        "messages": [
+                            {"role": "user", "content": "Hello, this is a test message."}
+                        ],
+                        "max_tokens": 10
+                    },
+                    timeout=CONNECTION_TEST_TIMEOUT
+                )
+                if chat_response.status_code != 200:
+                    return {"success": False, "error": f"Failed to test chat completion: {chat_response.text}"}
             elif detected_provider == "google":
                 os.environ["GOOGLE_API_KEY"] = request.api_key
                 # Make a simple test request to the Google Gemini API
-                import httpx
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    # First check if the API key is valid by getting models
-                    response = await client.get(
-                        "https://generativelanguage.googleapis.com/v1/models?key=" + request.api_key
-                    )
-                    if response.status_code != 200:
-                        return {"success": False, "error": f"Failed to connect to Google Gemini API: {response.text}"}
-                    
-                    # Then test a simple generation with our system prompt
-                    # Gemini doesn't support system messages directly, so we'll prepend it to the user message
-                    chat_response = await client.post(
-                        "https://generativelanguage.googleapis.com/v1/models/gemini-pro:generateContent?key=" + request.api_key,
-                        headers={
-                            "Content-Type": "application/json"
-                        },
-                        json={
-                            "contents": [
-                                {
-                                    "role": "user",
-                                    "parts": [{"text": f"System instructions: {SYSTEM_PROMPT}\n\nUser message: Hello, this is a test message."}]
-                                }
-                            ],
-                            "generationConfig": {
-                                "maxOutputTokens": 10
+                client = get_http_client()
+                # First check if the API key is valid by getting models
+                response = await client.get(
+                    "https://generativelanguage.googleapis.com/v1/models?key=" + request.api_key,
+                    timeout=CONNECTION_TEST_TIMEOUT
+                )
+                if response.status_code != 200:
+                    return {"success": False, "error": f"Failed to connect to Google Gemini API: {response.text}"}
+                
+                # Then test a simple generation with our system prompt
+                # Gemini doesn't support system messages directly, so we'll prepend it to the user message
+                chat_response = await client.post(
+                    "https://generativelanguage.googleapis.com/v1/models/gemini-pro:generateContent?key=" + request.api_key,
+                    headers={
+                        "Content-Type": "application/json"
+                    },
+                    json={
+                        "contents": [
+                            {
+                                "role": "user",
+                                "parts": [{"text": f"System instructions: {SYSTEM_PROMPT}\n\nUser message: Hello, this is a test message."}]
                             }
+                        ],
+                        "generationConfig": {
+                            "maxOutputTokens": 10
                         }
-                    )
-                    if chat_response.status_code != 200:
-                        return {"success": False, "error": f"Failed to test chat completion: {chat_response.text}"}
+                    },
+                    timeout=CONNECTION_TEST_TIMEOUT
+                )
+                if chat_response.status_code != 200:
+                    return {"success": False, "error": f"Failed to test chat completion: {chat_response.text}"}
             elif detected_provider == "other":
                 # For custom API providers
                 if not request.other_api_url:
@@ -619,7 +625,6 @@ async def test_connection(
                 os.environ["OTHER_API_URL"] = request.other_api_url
                 
                 # Make a simple test request to the custom API
-                import httpx
                 
                 # Ensure the URL ends with /models for OpenAI compatibility
                 api_url = request.other_api_url
@@ -633,33 +638,35 @@ async def test_connection(
                         api_url = f"{api_url}/v1/models"
                 
                 try:
-                    async with httpx.AsyncClient(timeout=10.0) as client:
-                        response = await client.get(
-                            api_url,
+                    client = get_http_client()
+                    response = await client.get(
+                        api_url,
+                        headers={
+                            "Authorization": f"Bearer {request.api_key}",
+                            "Content-Type": "application/json"
+                        },
+                        timeout=CONNECTION_TEST_TIMEOUT
+                    )
+                    if response.status_code != 200:
+                        # If the models endpoint fails, try a simple chat completion
+                        chat_url = api_url.replace("/models", "/chat/completions")
+                        chat_response = await client.post(
+                            chat_url,
                             headers={
                                 "Authorization": f"Bearer {request.api_key}",
                                 "Content-Type": "application/json"
-                            }
+                            },
+                            json={
+                                "messages": [
+                                    {"role": "system", "content": SYSTEM_PROMPT},
+                                    {"role": "user", "content": "Hello, this is a test message."}
+                                ],
+                                "max_tokens": 10
+                            },
+                            timeout=CONNECTION_TEST_TIMEOUT
                         )
-                        if response.status_code != 200:
-                            # If the models endpoint fails, try a simple chat completion
-                            chat_url = api_url.replace("/models", "/chat/completions")
-                            chat_response = await client.post(
-                                chat_url,
-                                headers={
-                                    "Authorization": f"Bearer {request.api_key}",
-                                    "Content-Type": "application/json"
-                                },
-                                json={
-                                    "messages": [
-                                        {"role": "system", "content": SYSTEM_PROMPT},
-                                        {"role": "user", "content": "Hello, this is a test message."}
-                                    ],
-                                    "max_tokens": 10
-                                }
-                            )
-                            if chat_response.status_code != 200:
-                                return {"success": False, "error": f"Failed to connect to custom API: {response.text}"}
+                        if chat_response.status_code != 200:
+                            return {"success": False, "error": f"Failed to connect to custom API: {response.text}"}
                 except Exception as e:
                     return {"success": False, "error": f"Failed to connect to custom API: {str(e)}"}
             else:
@@ -670,6 +677,7 @@ async def test_connection(
             # Restore original environment variables
             for key, value in original_env.items():
                 os.environ[key] = value
+            clear_env_cache()
     except Exception as e:
         print(f"Error testing connection: {str(e)}")
         import traceback
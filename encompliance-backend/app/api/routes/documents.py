@@ -1,6 +1,7 @@
+import asyncio
 import os
 import shutil
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, status, Request
 from fastapi.responses import JSONResponse, FileResponse
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
@@ -8,7 +9,7 @@ from datetime import datetime
 from app.database import get_db
 from app.models.document import Document
 from app.models.user import User
-from app.services.document_service import list_documents, get_document, get_file_mimetype, get_file_type, get_document_context
+from app.services.document_service import list_documents, get_document, get_file_mimetype, get_file_type, get_document_context, extract_text_from_pdf
 from app.auth.dependencies import get_current_user
 from app.core.config import get_settings
 import logging
@@ -17,6 +18,9 @@ import traceback
 router = APIRouter(tags=["documents"])
 settings = get_settings()
 
+# Chunk size for streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 # Define the document mapping
 document_mapping = {
     "childcare-746-centers": "chapter-746-centers.pdf",
@@ -44,6 +48,7 @@ async def options_documents():
 
 @router.post("/documents/upload", status_code=status.HTTP_201_CREATED)
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -67,52 +72,52 @@ async def upload_document(
         )
     
     try:
-        # Create storage directory if it doesn't exist
-        os.makedirs(settings.PDF_STORAGE_PATH, exist_ok=True)
-        
         # Generate a unique filename
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         unique_filename = f"{timestamp}_{file.filename}"
         file_path = os.path.join(settings.PDF_STORAGE_PATH, unique_filename)
         print(f"Saving file to: {file_path}")
         
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Stream the upload from its spooled temporary file in chunks, so large files are never held
+        # in memory whole; disk writes block, so do them in a worker thread to keep the event loop free
+        def write_upload() -> int:
+            with open(file_path, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer, UPLOAD_CHUNK_SIZE)
+                return buffer.tell()
         
         # Get file size
-        file_size = os.path.getsize(file_path)
+        file_size = await asyncio.to_thread(write_upload)
         print(f"File saved successfully. Size: {file_size} bytes")
         
         # Validate the file content
         if file_extension == '.pdf':
             # Check if it's a valid PDF
             try:
-                with open(file_path, 'rb') as f:
-                    header = f.read(5)
-                    if header != b'%PDF-':
-                        print(f"WARNING: File does not appear to be a valid PDF (header: {header})")
-                        # Try to convert HTML to PDF if it's an HTML file
-                        if header.startswith(b'<!DOC') or header.startswith(b'<html'):
-                            print("File appears to be HTML. Attempting to convert to PDF...")
-                            
-                            # For now, just replace with a valid test PDF
-                            test_pdf_path = os.path.join(os.path.dirname(settings.PDF_STORAGE_PATH), "resources", "test_compliance.pdf")
-                            if os.path.exists(test_pdf_path):
-                                print(f"Replacing with valid test PDF from: {test_pdf_path}")
-                                shutil.copy2(test_pdf_path, file_path)
-                                print("Replacement successful")
-                            else:
-                                print("No valid test PDF found for replacement")
-                                raise HTTPException(
-                                    status_code=status.HTTP_400_BAD_REQUEST,
-                                    detail="The uploaded file is not a valid PDF"
-                                )
+                await file.seek(0)
+                header = await file.read(5)
+                if header != b'%PDF-':
+                    print(f"WARNING: File does not appear to be a valid PDF (header: {header})")
+                    # Try to convert HTML to PDF if it's an HTML file
+                    if header.startswith(b'<!DOC') or header.startswith(b'<html'):
+                        print("File appears to be HTML. Attempting to convert to PDF...")
+                        
+                        # For now, just replace with a valid test PDF
+                        test_pdf_path = os.path.join(os.path.dirname(settings.PDF_STORAGE_PATH), "resources", "test_compliance.pdf")
+                        if os.path.exists(test_pdf_path):
+                            print(f"Replacing with valid test PDF from: {test_pdf_path}")
+                            shutil.copyfile(test_pdf_path, file_path)
+                            print("Replacement successful")
                         else:
+                            print("No valid test PDF found for replacement")
                             raise HTTPException(
                                 status_code=status.HTTP_400_BAD_REQUEST,
                                 detail="The uploaded file is not a valid PDF"
                             )
+                    else:
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="The uploaded file is not a valid PDF"
+                        )
             except Exception as e:
                 print(f"Error validating PDF: {str(e)}")
                 raise HTTPException(
@@ -138,6 +143,11 @@ async def upload_document(
         
         print(f"Document record created successfully. ID: {document.id}")
         
+        # Extract the text once now, after the response is sent, so the first chat about this
+        # document reads it from the extraction cache instead of parsing the PDF
+        if file_extension == '.pdf':
+            background_tasks.add_task(extract_text_from_pdf, file_path)
+        
         return {
             "id": document.id,
             "filename": document.filename,
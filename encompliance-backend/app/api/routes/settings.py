@@ -172,6 +172,10 @@ async def save_model_settings(
         # Update local model URL if provided
         if settings.local_model_url:
             os.environ["LOCAL_MODEL_URL"] = settings.local_model_url
+        
+        # API keys may have changed, so re-detect the cloud provider on the next request
+        from app.services.llm_service import clear_env_cache
+        clear_env_cache()
             
         return {"message": "Settings saved successfully"}
     except Exception as e:
@@ -1,6 +1,6 @@
 from fastapi import Depends, HTTPException, status, Header, Request
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+import jwt
 from sqlalchemy.orm import Session
 from typing import Optional, Union, Dict, Any
 from app.database import get_db
@@ -14,6 +14,9 @@ from datetime import datetime
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Reused JWT decoder; only the configured algorithm is accepted
+jwt_decoder = jwt.PyJWT()
+
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
 
@@ -76,7 +79,7 @@ async def get_current_user(
     try:
         # Decode the JWT token
         logger.info(f"Attempting to decode token: {token[:15]}...")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt_decoder.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         logger.info(f"Token payload: {payload}")
         
         username: str = payload.get("sub")
@@ -97,7 +100,7 @@ async def get_current_user(
                 logger.warning(f"Token expired at {expiry}")
                 raise credentials_exception
                 
-    except JWTError as e:
+    except jwt.InvalidTokenError as e:
         logger.error(f"JWT decode error: {str(e)}")
         raise credentials_exception
         
@@ -1,10 +1,22 @@
+import hashlib
+import logging
 import os
-from typing import List, Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from app.services.document_service import get_document_context, extract_text_from_pdf
 from app.core.config import get_settings, SYSTEM_PROMPT
 from sqlalchemy.orm import Session
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Recently built document system messages, keyed by a digest of the context rather than the context
+# itself, so the cache doesn't keep extra copies of large contexts alive
+ENHANCED_MESSAGE_CACHE_SIZE = 8
+_enhanced_message_cache: "OrderedDict[Tuple[str, str, Optional[int]], str]" = OrderedDict()
+_enhanced_message_cache_lock = threading.Lock()
 
 def get_document_filename_from_path(filepath: str) -> str:
     """Get the original filename from a filepath"""
@@ -58,14 +70,18 @@ async def enhance_system_message_with_document_context(
 
 def enhance_system_message_with_pdf_context(
     system_message: str,
-    document_context: str
+    document_context: str,
+    max_context_length: Optional[int] = None
 ) -> str:
     """
     Enhance the system message with document content (backward compatibility function)
     
+    Results are cached, so follow-up turns over the same documents reuse the built message.
+    
     Args:
         system_message: The original system message
         document_context: Document content to include
+        max_context_length: Optional limit on how many characters of the context to include
         
     Returns:
         Enhanced system message with document content
@@ -73,27 +89,67 @@ def enhance_system_message_with_pdf_context(
     if not document_context:
         return system_message
     
-    # Check if the document context contains any highlighted important documents
-    has_important_docs = "⭐⭐⭐ IMPORTANT DOCUMENT ⭐⭐⭐" in document_context
+    key = (system_message, hashlib.blake2b(document_context.encode("utf-8"), digest_size=16).hexdigest(), max_context_length)
+    with _enhanced_message_cache_lock:
+        enhanced_message = _enhanced_message_cache.get(key)
+        if enhanced_message is not None:
+            _enhanced_message_cache.move_to_end(key)
+            return enhanced_message
+    
+    enhanced_message = build_system_message_with_pdf_context(system_message, document_context, max_context_length)
+    with _enhanced_message_cache_lock:
+        _enhanced_message_cache[key] = enhanced_message
+        # Evict the least recently used messages once the cache is full
+        while len(_enhanced_message_cache) > ENHANCED_MESSAGE_CACHE_SIZE:
+            _enhanced_message_cache.popitem(last=False)
+    return enhanced_message
+
+def build_system_message_with_pdf_context(
+    system_message: str,
+    document_context: str,
+    max_context_length: Optional[int] = None
+) -> str:
+    """
+    Build the system message with document content appended (uncached).
     
-    # Add document context to system message
-    enhanced_message = f"{system_message}\n\n"
+    Args:
+        system_message: The original system message
+        document_context: Document content to include, not empty
+        max_context_length: Optional limit on how many characters of the context to include
+        
+    Returns:
+        Enhanced system message with document content
+    """
+    # Truncate while building the message rather than beforehand, so the context is only copied once
+    context_end = len(document_context)
+    truncated = max_context_length is not None and context_end > max_context_length
+    if truncated:
+        context_end = max_context_length
+    
+    # Check if the document context contains any highlighted important documents
+    has_important_docs = document_context.find("⭐⭐⭐ IMPORTANT DOCUMENT ⭐⭐⭐", 0, context_end) >= 0
     
     # Add stronger emphasis for important documents
     if has_important_docs:
-        enhanced_message += "CRITICAL INSTRUCTION: The user has provided documents for reference. Some documents are marked with ⭐⭐⭐ symbols as IMPORTANT. These IMPORTANT documents contain critical information that you MUST reference and acknowledge in your response.\n\n"
+        instructions = "CRITICAL INSTRUCTION: The user has provided documents for reference. Some documents are marked with ⭐⭐⭐ symbols as IMPORTANT. These IMPORTANT documents contain critical information that you MUST reference and acknowledge in your response.\n\n"
     else:
-        enhanced_message += "IMPORTANT: The user has provided the following documents for reference. You MUST use this information to answer their questions.\n\n"
-    
-    enhanced_message += document_context
+        instructions = "IMPORTANT: The user has provided the following documents for reference. You MUST use this information to answer their questions.\n\n"
     
-    enhanced_message += "\n\nYou MUST acknowledge and cite the content from ALL provided documents in your responses, especially those marked as IMPORTANT. If asked about a specific document by name (like 'Minimum Standards for Child-Care Centers'), you MUST directly quote its contents in your response. Always refer to documents by their titles, NOT by ID numbers. Do not ignore any document, no matter how small."
-    
-    print(f"Enhanced system message with document context. Total length: {len(enhanced_message)}")
-    print(f"Document context preview: {document_context[:500]}...")
+    # Add document context to system message
+    enhanced_message = "".join((
+        system_message,
+        "\n\n",
+        instructions,
+        document_context[:context_end] if truncated else document_context,
+        "\n[Context truncated due to length]" if truncated else "",
+        "\n\nYou MUST acknowledge and cite the content from ALL provided documents in your responses, especially those marked as IMPORTANT. If asked about a specific document by name (like 'Minimum Standards for Child-Care Centers'), you MUST directly quote its contents in your response. Always refer to documents by their titles, NOT by ID numbers. Do not ignore any document, no matter how small."
+    ))
+    
+    logger.debug("Enhanced system message with document context. Total length: %d", len(enhanced_message))
+    logger.debug("Document context preview: %.500s...", document_context)
     
     if has_important_docs:
-        print("Document context contains IMPORTANT highlighted documents")
+        logger.debug("Document context contains IMPORTANT highlighted documents")
     
     return enhanced_message
 
@@ -134,6 +190,7 @@ def format_chat_history(
     
     return formatted_messages
 
+@lru_cache(maxsize=16)
 def get_compliance_system_message(operation_type: str) -> str:
     """
     Get the system message for compliance assistant
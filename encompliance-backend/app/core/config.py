@@ -61,6 +61,19 @@ class Settings(BaseSettings):
     USE_LOCAL_MODEL: bool = True  # Use local model by default
     LOCAL_MODEL_URL: str = os.getenv("LOCAL_MODEL_URL", "http://127.0.0.1:1234")
     LOCAL_MODEL_NAME: str = os.getenv("LOCAL_MODEL_NAME", "local-model")
+    LOCAL_MODEL_MAX_CONTEXT: int = int(os.getenv("LOCAL_MODEL_MAX_CONTEXT", "8192"))  # Context window (tokens) of the loaded model
+    LOCAL_MODEL_MAX_CONCURRENCY: int = int(os.getenv("LOCAL_MODEL_MAX_CONCURRENCY", "2"))  # Parallel requests sent to LM Studio
+    CLOUD_MODEL_MAX_CONCURRENCY: int = int(os.getenv("CLOUD_MODEL_MAX_CONCURRENCY", "20"))  # Parallel requests sent to cloud providers
+    DOCUMENT_CONTEXT_MAX_TOKENS: int = int(os.getenv("DOCUMENT_CONTEXT_MAX_TOKENS", "28000"))  # Document context budget (tokens) per request
+    
+    # Response cache settings - repeated prompts with the same context and backend reuse an earlier answer
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    # Also reuse answers for merely similar prompts; off by default, since questions differing only in an
+    # age group or section number can score above the threshold
+    LLM_CACHE_SIMILARITY_ENABLED: bool = os.getenv("LLM_CACHE_SIMILARITY_ENABLED", "false").lower() == "true"
+    LLM_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("LLM_CACHE_SIMILARITY_THRESHOLD", "0.95"))  # Cosine similarity needed for a hit
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+    LLM_CACHE_TTL_SECONDS: float = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
     
     # OpenAI API settings (not currently active, but available for future use)
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY", "")
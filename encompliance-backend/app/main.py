@@ -1,7 +1,10 @@
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
+import copy
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from app.database import engine
 from app.models.user import Base
 from app.models.document import Document
@@ -12,8 +15,24 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+class DeferredFormatQueueHandler(QueueHandler):
+    """Queue handler that leaves line formatting to the listener thread."""
+    
+    def prepare(self, record):
+        # The stdlib handler runs the full formatter (timestamp, layout, traceback) in the logging thread.
+        # Only merge the arguments here, while they are still valid, and format on the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+# Set up logging - records are queued and written by a background thread so log I/O never blocks the event loop
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+log_listener = QueueListener(log_queue, log_handler)
+logging.basicConfig(level=logging.INFO, handlers=[DeferredFormatQueueHandler(log_queue)])
+log_listener.start()
 logger = logging.getLogger(__name__)
 
 # Create database tables
@@ -28,14 +47,14 @@ except Exception as e:
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         # Log request details
-        logger.info(f"Request: {request.method} {request.url.path}")
-        logger.info(f"Request headers: {request.headers}")
+        logger.info("Request: %s %s", request.method, request.url.path)
+        logger.debug("Request headers: %s", request.headers)
         
         # Process the request
         response = await call_next(request)
         
         # Log response details
-        logger.info(f"Response status: {response.status_code}")
+        logger.info("Response status: %s", response.status_code)
         
         return response
 
@@ -112,6 +131,23 @@ app.include_router(queries.router, prefix="/api/v1/api")
 app.include_router(documents.router, prefix="/api/v1/api")  # Add documents router to nested path
 app.include_router(settings.router, prefix="/api/v1/api")  # Add settings router to nested path
 
+@app.on_event("shutdown")
+async def shutdown_http_clients():
+    # Close the shared LLM HTTP clients so pooled connections are released cleanly
+    from app.services.llm_service import close_http_clients
+    await close_http_clients()
+
+@app.on_event("shutdown")
+async def shutdown_pdf_workers():
+    # Stop the PDF extraction worker processes
+    from app.services.document_service import shutdown_pdf_pool
+    shutdown_pdf_pool()
+
+@app.on_event("shutdown")
+async def stop_log_listener():
+    # Flush any queued log records before the process exits
+    log_listener.stop()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Encompliance.io API"} 
\ No newline at end of file
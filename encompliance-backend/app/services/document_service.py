@@ -1,22 +1,34 @@
+import asyncio
+import io
+import logging
 import os
 import PyPDF2
 import traceback
 import mimetypes
+import multiprocessing
 import shutil
 import re
+import threading
 import json
 import hashlib
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from typing import List, Optional, Dict, Any, Tuple
 from app.core.config import get_settings
+from app.services.pdf_pages import init_pdf_worker, read_pdf_page_range
 from app.models.document import Document
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from app.database import get_db
 from fastapi import Depends
 from app.models.user import User
 from datetime import datetime
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Uploaded documents are stored here; created once at import rather than on every upload
+os.makedirs(settings.PDF_STORAGE_PATH, exist_ok=True)
 
 # Directory to store document indexes
 INDEX_DIR = os.path.join(os.path.dirname(settings.PDF_STORAGE_PATH), "document_indexes")
@@ -26,6 +38,13 @@ os.makedirs(INDEX_DIR, exist_ok=True)
 EMBEDDING_DIR = os.path.join(os.path.dirname(settings.PDF_STORAGE_PATH), "document_embeddings")
 os.makedirs(EMBEDDING_DIR, exist_ok=True)
 
+# Directory to cache extracted PDF text, keyed by a hash of the file contents
+PDF_TEXT_CACHE_DIR = os.path.join(settings.PDF_STORAGE_PATH, ".cache")
+os.makedirs(PDF_TEXT_CACHE_DIR, exist_ok=True)
+# Version of the extraction output format; bump it whenever parse_pdf_text's output changes so
+# entries written by older builds are no longer read
+PDF_TEXT_CACHE_VERSION = 2
+
 # Flag to control whether to use embeddings (can be disabled if dependencies aren't installed)
 USE_EMBEDDINGS = True
 
@@ -86,6 +105,49 @@ except ImportError:
     def compute_similarity(query_embedding, chunk_embeddings) -> List[float]:
         return []
 
+# PyMuPDF extracts text several times faster than PyPDF2; fall back to PyPDF2 if it isn't installed
+try:
+    import fitz  # PyMuPDF
+    USE_PYMUPDF = True
+except ImportError:
+    print("Warning: PyMuPDF not installed. Falling back to PyPDF2 for PDF text extraction.")
+    USE_PYMUPDF = False
+
+# Worker processes for page extraction; gains level off beyond a handful of workers
+PDF_EXTRACT_MAX_WORKERS = min(os.cpu_count() or 1, 4)
+# Smaller PDFs are read in-process, since starting the worker round trip costs more than it saves
+PDF_PARALLEL_MIN_PAGES = 32
+
+# Read buffer for the PyPDF2 fallback
+PDF_READ_BUFFER_SIZE = 1 << 16
+
+# Documents processed concurrently when building a document context
+DOCUMENT_CONTEXT_CONCURRENCY = 4
+
+# Process pool for page extraction, created on first use
+_pdf_pool = None
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """Get or create the process pool used to extract PDF pages in parallel"""
+    global _pdf_pool
+    if _pdf_pool is None:
+        # Workers are spawned rather than forked: forking the multithreaded server process can
+        # copy locks held by other threads and deadlock the child. Spawned workers only import
+        # the small pdf_pages module that holds the functions run in them.
+        _pdf_pool = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_pdf_worker
+        )
+    return _pdf_pool
+
+def shutdown_pdf_pool() -> None:
+    """Stop the PDF extraction worker processes (called on app shutdown)."""
+    global _pdf_pool
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool = None
+
 def get_document_index_path(doc_id: int) -> str:
     """Get the path to the document index file"""
     return os.path.join(INDEX_DIR, f"doc_{doc_id}_index.json")
@@ -154,10 +216,10 @@ def create_document_index(doc_id: int, content: str, title: str, chapters: str,
             "indexed_at": datetime.now().isoformat()
         }
         
-        # Save the index to a file
-        index_path = get_document_index_path(doc_id)
-        with open(index_path, 'w', encoding='utf-8') as f:
-            json.dump(index_data, f, ensure_ascii=False, indent=2)
+        # Both files are written to a temporary name and renamed into place, so a writer stopped
+        # part way (or racing another writer for the same document) never leaves a truncated file.
+        # The index is written last, since its presence marks the document as indexed.
+        tmp_suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
         
         # Create embeddings for the chunks if embeddings are enabled
         if USE_EMBEDDINGS and len(chunks) > 0:
@@ -169,15 +231,25 @@ def create_document_index(doc_id: int, content: str, title: str, chapters: str,
                 embeddings = compute_embeddings(chunk_texts)
                 
                 if embeddings is not None:
-                    # Save embeddings to a file
+                    # Save embeddings to a file (through a file object, so numpy doesn't add .npz to the temp name)
                     embedding_path = get_document_embedding_path(doc_id)
-                    np.savez_compressed(embedding_path, embeddings=embeddings)
+                    tmp_path = embedding_path + tmp_suffix
+                    with open(tmp_path, 'wb') as f:
+                        np.savez_compressed(f, embeddings=embeddings)
+                    os.replace(tmp_path, embedding_path)
                     print(f"Created embeddings for document ID {doc_id} with {len(chunks)} chunks")
             except Exception as e:
                 print(f"Error creating embeddings for document ID {doc_id}: {str(e)}")
                 print(f"Traceback: {traceback.format_exc()}")
                 # Continue with the index even if embeddings fail
         
+        # Save the index to a file
+        index_path = get_document_index_path(doc_id)
+        tmp_path = index_path + tmp_suffix
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index_data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, index_path)
+        
         print(f"Successfully created index for document ID {doc_id} with {len(chunks)} chunks")
         return True
     
@@ -367,48 +439,43 @@ async def get_document_context(doc_ids: List[int], db: Session = Depends(get_db)
         Extracted text from the documents
     """
     try:
-        print(f"Retrieving document context for IDs: {doc_ids}, user_id: {current_user_id}")
+        logger.debug("Retrieving document context for IDs: %s, user_id: %s", doc_ids, current_user_id)
         if query:
-            print(f"Using query for semantic retrieval: '{query[:100]}...' (truncated)")
+            logger.debug("Using query for semantic retrieval: '%s...' (truncated)", query[:100])
         
         # Get document records from database, filtering by user ID if provided
-        query_db = db.query(Document).filter(Document.id.in_(doc_ids), Document.is_deleted == False)
+        # Only the columns used below are loaded
+        query_db = db.query(Document).options(
+            load_only(Document.id, Document.filename, Document.filepath, Document.file_type)
+        ).filter(Document.id.in_(doc_ids), Document.is_deleted.is_(False))
         
         # If current_user_id is provided, only return documents that belong to the user
         if current_user_id is not None:
             query_db = query_db.filter(Document.uploaded_by == current_user_id)
             
-        documents = query_db.all()
+        # Sync SQLAlchemy and PDF parsing block, so run them in worker threads to keep the event loop free
+        documents = await asyncio.to_thread(query_db.all)
         
-        print(f"Found {len(documents)} document records for IDs: {doc_ids}")
+        logger.debug("Found %s document records for IDs: %s", len(documents), doc_ids)
         
         if not documents:
-            print(f"WARNING: No document records found for IDs: {doc_ids}")
-            # Check what documents are available
-            all_docs_query = db.query(Document)
-            if current_user_id is not None:
-                all_docs_query = all_docs_query.filter(Document.uploaded_by == current_user_id)
-            all_docs = all_docs_query.all()
-            
-            print(f"Available documents in database: {len(all_docs)}")
-            for doc in all_docs:
-                print(f"  - ID: {doc.id}, Filename: {doc.filename}, Type: {doc.file_type}, Path: {doc.filepath}, Deleted: {doc.is_deleted}")
-            
+            logger.warning("No document records found for IDs: %s", doc_ids)
             return "[No documents found for the requested IDs]"
         
-        # Dictionary to store document contexts
-        document_contexts = {}
+        # Storage directory listing, only read if a document is missing and reused for later misses
+        storage_files = None
         
-        # Extract text from each document
-        for doc in documents:
-            print(f"Processing document: ID={doc.id}, Filename={doc.filename}, Type={doc.file_type}, Filepath={doc.filepath}")
+        async def build_document_context(doc) -> Dict:
+            """Locate and extract one document, returning its context entry"""
+            nonlocal storage_files
+            logger.debug("Processing document: ID=%s, Filename=%s, Type=%s, Filepath=%s", doc.id, doc.filename, doc.file_type, doc.filepath)
             
             # First, try to get document from index if it exists
             if query:
-                indexed_doc = get_document_from_index(doc.id, query)
+                indexed_doc = await asyncio.to_thread(get_document_from_index, doc.id, query)
                 if indexed_doc:
-                    print(f"Retrieved document from index for ID {doc.id}")
-                    document_contexts[doc.id] = {
+                    logger.debug("Retrieved document from index for ID %s", doc.id)
+                    return {
                         'filename': doc.filename,
                         'text': f"TITLE: {indexed_doc['title']}\n\nCHAPTERS:\n{indexed_doc['chapters']}\n\nHEADINGS:\n{indexed_doc['headings']}\n\nCONTENT:\n{indexed_doc['content']}",
                         'length': indexed_doc['total_chars'],
@@ -418,18 +485,16 @@ async def get_document_context(doc_ids: List[int], db: Session = Depends(get_db)
                         'chapters': indexed_doc['chapters'],
                         'content': indexed_doc['content']
                     }
-                    continue
             
             # If no index or not using query, proceed with normal extraction
             # IMPORTANT: The filepath in the database is just the filename, not the full path
             # We need to join it with the PDF_STORAGE_PATH to get the full path
             file_path = os.path.join(settings.PDF_STORAGE_PATH, doc.filepath)
             
-            print(f"Full file path: {file_path}")
-            print(f"File exists: {os.path.exists(file_path)}")
+            logger.debug("Full file path: %s", file_path)
             
             if not os.path.exists(file_path):
-                print(f"WARNING: Document file not found at primary path: {file_path}")
+                logger.warning("Document file not found at primary path: %s", file_path)
                 
                 # Try multiple alternative paths
                 alternative_paths = [
@@ -452,44 +517,38 @@ async def get_document_context(doc_ids: List[int], db: Session = Depends(get_db)
                     os.path.join(settings.PDF_STORAGE_PATH, doc.filepath.replace(" ", "%20"))
                 ]
                 
-                # Print all alternative paths we're going to try
-                print(f"Trying {len(alternative_paths)} alternative paths:")
-                for i, path in enumerate(alternative_paths):
-                    print(f"  {i+1}. {path} (exists: {os.path.exists(path)})")
-                
                 found_file = False
                 for alt_path in alternative_paths:
-                    print(f"Trying alternative path: {alt_path}")
+                    logger.debug("Trying alternative path: %s", alt_path)
                     if os.path.exists(alt_path):
-                        print(f"Found file at alternative path: {alt_path}")
+                        logger.debug("Found file at alternative path: %s", alt_path)
                         file_path = alt_path
                         found_file = True
                         break
                 
                 if not found_file:
-                    print(f"File not found at any alternative path")
+                    logger.debug("File not found at any alternative path")
                     
-                    # Last resort: list all files in the directory and look for similar names
-                    print(f"Listing all files in {settings.PDF_STORAGE_PATH}:")
+                    # Last resort: look for similar names among the files in the storage directory
                     try:
-                        all_files = os.listdir(settings.PDF_STORAGE_PATH)
-                        for file in all_files:
-                            print(f"  - {file}")
-                            
+                        if storage_files is None:
+                            storage_files = os.listdir(settings.PDF_STORAGE_PATH)
+                            logger.debug("Listed %s files in %s", len(storage_files), settings.PDF_STORAGE_PATH)
+                        for file in storage_files:
                             # Check if this file might be a match
                             if doc.filename.lower() in file.lower():
-                                print(f"Possible match found: {file}")
+                                logger.debug("Possible match found: %s", file)
                                 possible_match = os.path.join(settings.PDF_STORAGE_PATH, file)
                                 if os.path.isfile(possible_match):
-                                    print(f"Using possible match: {possible_match}")
+                                    logger.debug("Using possible match: %s", possible_match)
                                     file_path = possible_match
                                     found_file = True
                                     break
                     except Exception as e:
-                        print(f"Error listing directory: {str(e)}")
+                        logger.error("Error listing directory: %s", e)
                     
                     if not found_file:
-                        document_contexts[doc.id] = {
+                        return {
                             'filename': doc.filename,
                             'text': f"[Document {doc.filename} (ID: {doc.id}) not found at {file_path}]",
                             'length': 0,
@@ -499,17 +558,16 @@ async def get_document_context(doc_ids: List[int], db: Session = Depends(get_db)
                             'chapters': "",
                             'content': f"[Document {doc.filename} (ID: {doc.id}) not found at {file_path}]"
                         }
-                        continue
             
             # Extract text based on file type
             if doc.file_type.lower() == 'pdf' or doc.filename.lower().endswith('.pdf'):
                 try:
-                    extracted_data = extract_text_from_pdf(file_path)
+                    extracted_data = await asyncio.to_thread(extract_text_from_pdf, file_path)
                     
                     if isinstance(extracted_data, dict) and "error" in extracted_data:
                         error_msg = extracted_data["error"]
-                        print(f"Error extracting text: {error_msg}")
-                        document_contexts[doc.id] = {
+                        logger.error("Error extracting text: %s", error_msg)
+                        return {
                             'filename': doc.filename,
                             'text': f"[Error extracting text from {doc.filename}: {error_msg}]",
                             'length': 0,
@@ -529,10 +587,11 @@ async def get_document_context(doc_ids: List[int], db: Session = Depends(get_db)
                         # If we have a query and the document is large, perform semantic chunking and retrieval
                         original_content_length = len(content_text)
                         if query and original_content_length > 50000:
-                            print(f"Large document detected ({original_content_length} chars). Performing semantic chunking and retrieval.")
+                            logger.debug("Large document detected (%s chars). Performing semantic chunking and retrieval.", original_content_length)
                             
                             # Get the most relevant chunks based on the query
-                            relevant_chunks = get_relevant_chunks(
+                            relevant_chunks = await asyncio.to_thread(
+                                get_relevant_chunks,
                                 content_text,
                                 query,
                                 max_chunks=5,  # Adjust based on testing
@@ -548,7 +607,7 @@ async def get_document_context(doc_ids: List[int], db: Session = Depends(get_db)
                             # Add a note about content filtering
                             content_text += "\n\n[Note: Content has been filtered to show only the most relevant sections based on the query. The full document contains more information.]"
                             
-                            print(f"Reduced content size from {original_content_length} to {len(content_text)} characters")
+                            logger.debug("Reduced content size from %s to %s characters", original_content_length, len(content_text))
                         
                         total_length = (
                             len(title_text) + 
@@ -568,7 +627,7 @@ async def get_document_context(doc_ids: List[int], db: Session = Depends(get_db)
                         if content_text:
                             full_text += f"CONTENT:\n{content_text}\n"
                         
-                        document_contexts[doc.id] = {
+                        context = {
                             'filename': doc.filename,
                             'text': full_text,
                             'length': total_length,
@@ -582,18 +641,20 @@ async def get_document_context(doc_ids: List[int], db: Session = Depends(get_db)
                         # Create index for this document if it doesn't exist yet
                         index_path = get_document_index_path(doc.id)
                         if not os.path.exists(index_path) and original_content_length > 10000:
-                            print(f"Creating index for document ID {doc.id}")
-                            create_document_index(
+                            logger.debug("Creating index for document ID %s", doc.id)
+                            await asyncio.to_thread(
+                                create_document_index,
                                 doc.id, 
                                 extracted_data.get("content", ""),
                                 title_text,
                                 chapters_text,
                                 headings_text
                             )
+                        return context
                 except Exception as e:
                     error_msg = f"Error extracting text from {doc.filename}: {str(e)}"
-                    print(error_msg)
-                    document_contexts[doc.id] = {
+                    logger.error("%s", error_msg)
+                    return {
                         'filename': doc.filename,
                         'text': f"[{error_msg}]",
                         'length': 0,
@@ -606,8 +667,8 @@ async def get_document_context(doc_ids: List[int], db: Session = Depends(get_db)
             else:
                 # For now, just indicate that text extraction is not supported for this file type
                 text = f"[Text extraction not supported for {doc.file_type} files]"
-                print(f"Text extraction not supported for {doc.file_type} files")
-                document_contexts[doc.id] = {
+                logger.debug("Text extraction not supported for %s files", doc.file_type)
+                return {
                     'filename': doc.filename,
                     'text': text,
                     'length': len(text),
@@ -618,6 +679,17 @@ async def get_document_context(doc_ids: List[int], db: Session = Depends(get_db)
                     'content': text
                 }
         
+        # Work on several documents at once so one document's extraction overlaps the next one's lookup;
+        # gather keeps the results in the original document order
+        semaphore = asyncio.Semaphore(DOCUMENT_CONTEXT_CONCURRENCY)
+        
+        async def build_with_limit(doc) -> Dict:
+            async with semaphore:
+                return await build_document_context(doc)
+        
+        contexts = await asyncio.gather(*(build_with_limit(doc) for doc in documents))
+        document_contexts = {doc.id: context for doc, context in zip(documents, contexts)}
+        
         # Convert any string error messages to document objects for consistent handling
         for doc_id in document_contexts:
             if isinstance(document_contexts[doc_id], str):
@@ -680,13 +752,12 @@ async def get_document_context(doc_ids: List[int], db: Session = Depends(get_db)
         
         result += "### DOCUMENT CONTENT ###\n" + "\n".join(content_section)
         
-        print(f"Returning {len(result)} characters of document context with prioritized structure")
+        logger.debug("Returning %s characters of document context with prioritized structure", len(result))
         
         return result
     
     except Exception as e:
-        print(f"Error extracting document context: {str(e)}")
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error("Error extracting document context: %s", e, exc_info=True)
         return f"[Error extracting document context: {str(e)}]"
 
 def get_relevant_chunks(text: str, query: str, max_chunks: int = 5, chunk_size: int = 10000) -> List[str]:
@@ -771,7 +842,159 @@ def get_relevant_chunks(text: str, query: str, max_chunks: int = 5, chunk_size:
     
     return top_chunks
 
+# Share of pages without text above which a PDF is treated as scanned images
+IMAGE_ONLY_PAGE_RATIO = 0.8
+IMAGE_ONLY_PDF_NOTE = "[Most pages of this PDF are scanned images without a text layer; OCR is needed to read them]"
+
+# Heading patterns, compiled once since they are checked against every line of every page
+CHAPTER_HEADING_RE = re.compile(r'(?:CHAPTER|Chapter|Section|SECTION|PART|Part)\s+\d+')
+# Numbered sections like "1. INTRODUCTION" or roman numerals like "IV. SCOPE"
+NUMBERED_HEADING_RE = re.compile(r'(?:\d+|[IVXLCDM]+)\.\s+[A-Z]')
+
+def is_heading(text: str) -> bool:
+    """Check if a stripped, non-empty line looks like a heading or chapter"""
+    # Check if line is all caps, starts with Chapter, or matches common heading patterns
+    if len(text) < 100 and (text.isupper() and len(text) > 3 or NUMBERED_HEADING_RE.match(text)):
+        return True
+    return CHAPTER_HEADING_RE.match(text) is not None
+
+def read_pdf_pages(pdf_path: str) -> Tuple[str, List[str]]:
+    """
+    Read the title and the plain text of every page of a PDF.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        Tuple of (title, list of page texts); the title defaults to the file name
+    """
+    title = os.path.basename(pdf_path)  # Default to filename
+    page_texts = []
+    
+    if USE_PYMUPDF:
+        logger.debug("Opening PDF with PyMuPDF")
+        with fitz.open(pdf_path) as doc:
+            if doc.needs_pass and not doc.authenticate(''):  # Try empty password
+                raise ValueError("Failed to decrypt PDF: password required")
+            
+            metadata_title = (doc.metadata or {}).get("title")
+            if metadata_title:
+                title = metadata_title
+                logger.debug("Extracted title from metadata: %s", title)
+            
+            num_pages = doc.page_count
+            if num_pages < PDF_PARALLEL_MIN_PAGES or PDF_EXTRACT_MAX_WORKERS < 2:
+                return title, read_pdf_page_range(pdf_path, 0, num_pages, doc)
+        
+        # Split the pages into one contiguous range per worker and extract them in parallel
+        range_size = -(-num_pages // PDF_EXTRACT_MAX_WORKERS)
+        starts = range(0, num_pages, range_size)
+        ends = [min(start + range_size, num_pages) for start in starts]
+        logger.debug("Extracting %s pages in %s parallel ranges", num_pages, len(ends))
+        for texts in get_pdf_pool().map(read_pdf_page_range, [pdf_path] * len(ends), starts, ends):
+            page_texts.extend(texts)
+        return title, page_texts
+    
+    logger.debug("Creating PDF reader")
+    # PyPDF2 issues many small reads, so give it a 64KB buffer to amortize the syscalls
+    with io.BufferedReader(open(pdf_path, 'rb', buffering=0), buffer_size=PDF_READ_BUFFER_SIZE) as file:
+        reader = PyPDF2.PdfReader(file)
+        logger.debug("PDF reader created successfully")
+        
+        # Check if PDF is encrypted
+        if reader.is_encrypted:
+            logger.debug("PDF is encrypted, attempting to decrypt")
+            try:
+                reader.decrypt('')  # Try empty password
+                logger.debug("PDF decrypted successfully")
+            except Exception as e:
+                raise ValueError(f"Failed to decrypt PDF: {str(e)}")
+        
+        # Extract document title from metadata if available
+        try:
+            if reader.metadata and hasattr(reader.metadata, 'title') and reader.metadata.title:
+                title = reader.metadata.title
+                logger.debug("Extracted title from metadata: %s", title)
+        except:
+            logger.debug("Could not extract title from metadata")
+        
+        for i, page in enumerate(reader.pages):
+            try:
+                page_texts.append(page.extract_text())
+            except Exception as e:
+                error_msg = f"Error extracting text from page {i+1}: {str(e)}"
+                logger.warning("%s", error_msg)
+                page_texts.append(f"[Error on page {i+1}: {error_msg}]")
+    return title, page_texts
+
+def get_pdf_cache_key(pdf_path: str) -> str:
+    """Hash the contents of a file for the extracted text cache"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(pdf_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+@lru_cache(maxsize=256)
+def get_pdf_cache_key_for_stat(pdf_path: str, mtime_ns: int, size: int) -> str:
+    """Hash a file once per (path, mtime, size), so unchanged files aren't re-read on every extraction"""
+    return get_pdf_cache_key(pdf_path)
+
+def get_pdf_cache_path(cache_key: str) -> str:
+    """Get the path to the cached extraction result for a content hash"""
+    return os.path.join(PDF_TEXT_CACHE_DIR, f"v{PDF_TEXT_CACHE_VERSION}-{cache_key}.json")
+
 def extract_text_from_pdf(pdf_path: str) -> dict:
+    """
+    Extract text from a PDF file, reusing the cached result if the file contents are unchanged.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        Dictionary containing structured text with title, headings, and content
+    """
+    # Hash before any parsing so unchanged files never hit the PDF libraries
+    try:
+        stat = os.stat(pdf_path)
+        cache_key = get_pdf_cache_key_for_stat(pdf_path, stat.st_mtime_ns, stat.st_size)
+        cache_path = get_pdf_cache_path(cache_key)
+    except OSError:
+        # Missing or unreadable file: let the extractor report the error
+        return parse_pdf_text(pdf_path)
+    
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        logger.debug("Loaded extracted text for %s from cache", pdf_path)
+        # Entries only store titles read from the document itself; otherwise use this file's name
+        result.setdefault("title", os.path.basename(pdf_path))
+        return result
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("Ignoring unreadable PDF text cache entry %s: %s", cache_path, e)
+    
+    result = parse_pdf_text(pdf_path)
+    if "error" not in result:
+        try:
+            # The same bytes can be uploaded under other names, so a title that is just this
+            # file's name is left out of the shared entry
+            entry = result
+            if result.get("title") == os.path.basename(pdf_path):
+                entry = {key: value for key, value in result.items() if key != "title"}
+            
+            # Write to a temporary file unique to this process and thread first, so concurrent
+            # misses on the same PDF never share it and readers never see a partial entry
+            tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.warning("Error writing PDF text cache entry %s: %s", cache_path, e)
+    return result
+
+def parse_pdf_text(pdf_path: str) -> dict:
     """
     Extract text from a PDF file with structure prioritization.
     
@@ -782,203 +1005,165 @@ def extract_text_from_pdf(pdf_path: str) -> dict:
         Dictionary containing structured text with title, headings, and content
     """
     try:
-        print(f"Extracting text from PDF: {pdf_path}")
+        logger.debug("Extracting text from PDF: %s", pdf_path)
         
-        # Check if file exists
-        if not os.path.exists(pdf_path):
+        # Check that the file exists and get its size with a single stat call
+        try:
+            file_size = os.stat(pdf_path).st_size
+        except FileNotFoundError:
             error_msg = f"PDF file not found: {pdf_path}"
-            print(error_msg)
+            logger.error("%s", error_msg)
             return {"error": error_msg}
-        
-        # Check file size
-        file_size = os.path.getsize(pdf_path)
-        print(f"PDF file size: {file_size} bytes")
+        logger.debug("PDF file size: %s bytes", file_size)
         
         if file_size == 0:
             error_msg = f"PDF file is empty: {pdf_path}"
-            print(error_msg)
+            logger.error("%s", error_msg)
             return {"error": error_msg}
         
         # Check if file is a valid PDF by reading the first few bytes
         with open(pdf_path, 'rb') as f:
             header = f.read(5)
-            print(f"File header: {header}")
-            if header != b'%PDF-':
-                error_msg = f"File is not a valid PDF (header: {header}): {pdf_path}"
-                print(error_msg)
-                
-                # If it's an HTML file, try to extract text from it
-                if header.startswith(b'<!DOC') or header.startswith(b'<html'):
-                    print(f"File appears to be HTML, attempting to extract text")
-                    with open(pdf_path, 'r', encoding='utf-8', errors='ignore') as html_file:
-                        html_content = html_file.read()
-                        # Very basic HTML text extraction
-                        text = re.sub(r'<[^>]+>', ' ', html_content)
-                        text = re.sub(r'\s+', ' ', text).strip()
-                        if text:
-                            print(f"Extracted {len(text)} characters from HTML")
-                            # Try to extract title from HTML
-                            title_match = re.search(r'<title[^>]*>(.*?)</title>', html_content, re.IGNORECASE)
-                            title = title_match.group(1) if title_match else os.path.basename(pdf_path)
-                            
-                            # Try to extract headings from HTML
-                            headings = []
-                            for i in range(1, 7):  # h1 through h6
-                                heading_matches = re.findall(f'<h{i}[^>]*>(.*?)</h{i}>', html_content, re.IGNORECASE)
-                                for match in heading_matches:
-                                    headings.append(f"{'#' * i} {re.sub(r'<[^>]+>', '', match)}")
-                            
-                            return {
-                                "title": title,
-                                "headings": "\n".join(headings),
-                                "content": text,
-                                "total_chars": len(text)
-                            }
-                        else:
-                            return {"error": "File appears to be HTML but no text could be extracted"}
-                
-                return {"error": error_msg}
+        logger.debug("File header: %s", header)
+        if header != b'%PDF-':
+            error_msg = f"File is not a valid PDF (header: {header}): {pdf_path}"
+            logger.error("%s", error_msg)
+            
+            # If it's an HTML file, try to extract text from it
+            if header.startswith(b'<!DOC') or header.startswith(b'<html'):
+                logger.debug("File appears to be HTML, attempting to extract text")
+                with open(pdf_path, 'r', encoding='utf-8', errors='ignore') as html_file:
+                    html_content = html_file.read()
+                # Very basic HTML text extraction
+                text = re.sub(r'<[^>]+>', ' ', html_content)
+                text = re.sub(r'\s+', ' ', text).strip()
+                if text:
+                    logger.debug("Extracted %s characters from HTML", len(text))
+                    # Try to extract title from HTML
+                    title_match = re.search(r'<title[^>]*>(.*?)</title>', html_content, re.IGNORECASE)
+                    title = title_match.group(1) if title_match else os.path.basename(pdf_path)
+                    
+                    # Try to extract headings from HTML
+                    headings = []
+                    for i in range(1, 7):  # h1 through h6
+                        heading_matches = re.findall(f'<h{i}[^>]*>(.*?)</h{i}>', html_content, re.IGNORECASE)
+                        for match in heading_matches:
+                            headings.append(f"{'#' * i} {re.sub(r'<[^>]+>', '', match)}")
+                    
+                    return {
+                        "title": title,
+                        "headings": "\n".join(headings),
+                        "content": text,
+                        "total_chars": len(text)
+                    }
+                else:
+                    return {"error": "File appears to be HTML but no text could be extracted"}
+            
+            return {"error": error_msg}
         
-        # Create PDF reader
-        print("Creating PDF reader")
-        with open(pdf_path, 'rb') as file:
-            try:
-                reader = PyPDF2.PdfReader(file)
-                print(f"PDF reader created successfully")
-                
-                # Check if PDF is encrypted
-                if reader.is_encrypted:
-                    print("PDF is encrypted, attempting to decrypt")
-                    try:
-                        reader.decrypt('')  # Try empty password
-                        print("PDF decrypted successfully")
-                    except Exception as e:
-                        error_msg = f"Failed to decrypt PDF: {str(e)}"
-                        print(error_msg)
-                        return {"error": error_msg}
-                
-                # Get number of pages
-                num_pages = len(reader.pages)
-                print(f"PDF has {num_pages} pages")
-                
-                if num_pages == 0:
-                    error_msg = "PDF has 0 pages"
-                    print(error_msg)
-                    return {"error": error_msg}
-                
-                # Extract document title from metadata if available
-                title = os.path.basename(pdf_path)  # Default to filename
-                try:
-                    if reader.metadata and hasattr(reader.metadata, 'title') and reader.metadata.title:
-                        title = reader.metadata.title
-                        print(f"Extracted title from metadata: {title}")
-                except:
-                    print("Could not extract title from metadata")
-                
-                # Lists to store different components
-                headings = []
-                chapters = []
-                content_blocks = []
-                total_chars = 0
-                
-                # Function to identify if text looks like a heading or chapter
-                def is_heading(text):
-                    # Check if line is all caps, starts with Chapter, or matches common heading patterns
-                    text = text.strip()
-                    if not text:
-                        return False
-                    if text.isupper() and len(text) > 3 and len(text) < 100:
-                        return True
-                    if re.match(r'^(CHAPTER|Chapter|Section|SECTION|PART|Part)\s+\d+', text):
-                        return True
-                    if re.match(r'^\d+\.\s+[A-Z]', text) and len(text) < 100:  # Numbered sections like "1. INTRODUCTION"
-                        return True
-                    if re.match(r'^[IVXLCDM]+\.\s+[A-Z]', text) and len(text) < 100:  # Roman numerals
-                        return True
-                    return False
-                
-                # Extract text from each page
-                for i in range(num_pages):
-                    try:
-                        page = reader.pages[i]
-                        page_text = page.extract_text()
-                        
-                        if page_text:
-                            # Process page text to identify structure
-                            lines = page_text.split('\n')
-                            page_content = []
-                            
-                            for line in lines:
-                                line = line.strip()
-                                if line:
-                                    if is_heading(line):
-                                        if "chapter" in line.lower() or "section" in line.lower():
-                                            chapters.append(line)
-                                        else:
-                                            headings.append(line)
-                                    else:
-                                        page_content.append(line)
-                            
-                            # Add page content to content blocks
-                            if page_content:
-                                page_content_text = "\n".join(page_content)
-                                content_blocks.append(page_content_text)
-                                total_chars += len(page_content_text)
-                            
-                            print(f"Processed page {i+1}: found {len(page_content)} content lines")
-                        else:
-                            print(f"No text extracted from page {i+1}")
-                    except Exception as e:
-                        error_msg = f"Error extracting text from page {i+1}: {str(e)}"
-                        print(error_msg)
-                        content_blocks.append(f"[Error on page {i+1}: {error_msg}]")
-                
-                # Create structured result
-                result = {
-                    "title": title,
-                    "chapters": "\n".join(chapters),
-                    "headings": "\n".join(headings),
-                    "content": "\n\n".join(content_blocks),
-                    "total_chars": total_chars
-                }
-                
-                print(f"Total characters extracted: {total_chars}")
-                print(f"Identified {len(chapters)} chapters and {len(headings)} headings")
+        # Read the text of every page (PyMuPDF when installed, otherwise PyPDF2)
+        try:
+            title, page_texts = read_pdf_pages(pdf_path)
+        except Exception as e:
+            error_msg = f"Error reading PDF: {str(e)}"
+            logger.error("%s", error_msg, exc_info=True)
+            return {"error": error_msg}
+        
+        # Get number of pages
+        num_pages = len(page_texts)
+        logger.debug("PDF has %s pages", num_pages)
+        
+        if num_pages == 0:
+            error_msg = "PDF has 0 pages"
+            logger.error("%s", error_msg)
+            return {"error": error_msg}
+        
+        # Scanned PDFs have little or no text layer, so spot them before doing any more work on them
+        empty_pages = sum(1 for page_text in page_texts if not page_text or page_text.isspace())
+        image_only = empty_pages > num_pages * IMAGE_ONLY_PAGE_RATIO
+        if image_only:
+            logger.warning("%s of %s pages have no text, PDF looks like scanned images: %s", empty_pages, num_pages, pdf_path)
+        
+        # Lists to store different components
+        headings = []
+        chapters = []
+        content_blocks = []
+        total_chars = 0
+        
+        # Process the text of each page
+        for i, page_text in enumerate(page_texts):
+            if page_text:
+                # Process page text to identify structure
+                lines = page_text.split('\n')
+                page_content = []
                 
-                if total_chars == 0:
-                    # Try alternative extraction method
-                    print("No text extracted, trying alternative extraction method")
-                    try:
-                        from pdfminer.high_level import extract_text as pdfminer_extract_text
-                        alt_text = pdfminer_extract_text(pdf_path)
-                        if alt_text:
-                            print(f"Alternative extraction successful: {len(alt_text)} characters")
-                            result = {
-                                "title": title,
-                                "chapters": "",
-                                "headings": "",
-                                "content": alt_text,
-                                "total_chars": len(alt_text)
-                            }
-                            return result
+                for line in lines:
+                    line = line.strip()
+                    if line:
+                        if is_heading(line):
+                            lower_line = line.lower()
+                            if "chapter" in lower_line or "section" in lower_line:
+                                chapters.append(line)
+                            else:
+                                headings.append(line)
                         else:
-                            print("Alternative extraction also failed")
-                    except Exception as e:
-                        print(f"Alternative extraction error: {str(e)}")
-                        # Continue with original result
+                            page_content.append(line)
                 
-                return result
+                # Add page content to content blocks
+                if page_content:
+                    page_content_text = "\n".join(page_content)
+                    content_blocks.append(page_content_text)
+                    total_chars += len(page_content_text)
                 
+                logger.debug("Processed page %s: found %s content lines", i+1, len(page_content))
+            else:
+                logger.debug("No text extracted from page %s", i+1)
+        
+        # Create structured result
+        result = {
+            "title": title,
+            "chapters": "\n".join(chapters),
+            "headings": "\n".join(headings),
+            "content": "\n\n".join(content_blocks),
+            "total_chars": total_chars
+        }
+        
+        logger.debug("Total characters extracted: %s", total_chars)
+        logger.debug("Identified %s chapters and %s headings", len(chapters), len(headings))
+        
+        # PyMuPDF reads the whole text layer, so re-parsing an image-only PDF with pdfminer finds nothing new
+        if total_chars == 0 and not (image_only and USE_PYMUPDF):
+            # Try alternative extraction method
+            logger.debug("No text extracted, trying alternative extraction method")
+            try:
+                from pdfminer.high_level import extract_text as pdfminer_extract_text
+                alt_text = pdfminer_extract_text(pdf_path)
+                if alt_text:
+                    logger.debug("Alternative extraction successful: %s characters", len(alt_text))
+                    result = {
+                        "title": title,
+                        "chapters": "",
+                        "headings": "",
+                        "content": alt_text,
+                        "total_chars": len(alt_text)
+                    }
+                    return result
+                else:
+                    logger.debug("Alternative extraction also failed")
             except Exception as e:
-                error_msg = f"Error reading PDF: {str(e)}"
-                print(error_msg)
-                print(f"Traceback: {traceback.format_exc()}")
-                return {"error": error_msg}
+                logger.warning("Alternative extraction error: %s", e)
+                # Continue with original result
+        
+        if image_only:
+            # Flag the document so the missing text is visible to whoever reads the context
+            result["content"] = "\n\n".join(filter(None, [result["content"], IMAGE_ONLY_PDF_NOTE]))
+        
+        return result
+        
     
     except Exception as e:
         error_msg = f"Unexpected error extracting text from PDF: {str(e)}"
-        print(error_msg)
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error("%s", error_msg, exc_info=True)
         return {"error": error_msg}
 
 def get_file_mimetype(filename: str) -> str:
@@ -1142,7 +1327,7 @@ async def assign_default_pdf_to_user(user_id: int, db: Session) -> Optional[Dict
         
         # Create a copy of the file for this user
         dest_path = os.path.join(settings.PDF_STORAGE_PATH, unique_filename)
-        shutil.copy2(source_path, dest_path)
+        shutil.copyfile(source_path, dest_path)
         
         print(f"Successfully assigned Chapter 746 Centers PDF to user {user_id}")
         
@@ -1171,8 +1356,11 @@ def index_existing_documents():
         from app.database import SessionLocal
         db = SessionLocal()
         
-        # Get all non-deleted documents
-        documents = db.query(Document).filter(Document.is_deleted == False).all()
+        # Get all non-deleted documents; only these columns are used, so fetch plain rows
+        # instead of full ORM objects
+        documents = db.query(Document.id, Document.filename, Document.filepath, Document.file_type).filter(
+            Document.is_deleted == False
+        ).all()
         print(f"Found {len(documents)} documents to index")
         
         # Process each document
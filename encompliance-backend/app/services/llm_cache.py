@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import logging
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.core.config import get_settings
+from app.services.document_service import compute_embeddings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+class GenerativeCache:
+    """
+    In-memory cache of LLM responses looked up by prompt similarity.
+
+    Entries are grouped by (model, provider, operation_type, system message hash), so a cached
+    answer is only reused for the same backend when the instructions and document context are
+    identical. By default only exact repeats of a prompt hit; with similarity enabled the prompt
+    embeddings within a group are compared by cosine similarity, so near-duplicate questions also hit.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl_seconds: float = 3600.0,
+                 similarity_enabled: bool = False):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_enabled = similarity_enabled
+        # (group key, prompt) -> (normalized embedding or None, response, insert time), oldest first
+        self._entries: "OrderedDict[Tuple[Tuple[str, ...], str], Tuple[Optional[np.ndarray], str, float]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def make_key(operation_type: str, system_message: str, model: str, provider: str) -> Tuple[str, ...]:
+        """
+        Build the group key for a request.
+
+        Args:
+            operation_type: The type of operation (daycare, residential, etc.)
+            system_message: The (possibly document-enhanced) system message
+            model: Name of the model that answers the request
+            provider: Backend serving the model ('local' or the cloud provider)
+
+        Returns:
+            The group key
+        """
+        return model, provider, operation_type, hashlib.sha1(system_message.encode("utf-8")).hexdigest()
+
+    async def _embed(self, prompt: str) -> Optional[np.ndarray]:
+        # Encoding is CPU-bound, so keep it off the event loop
+        embeddings = await asyncio.to_thread(compute_embeddings, [prompt])
+        if embeddings is None:
+            return None
+        embedding = np.asarray(embeddings[0], dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else None
+
+    async def lookup(self, key: Tuple[str, ...], prompt: str) -> Optional[str]:
+        """
+        Find a cached response for a prompt similar to this one.
+
+        Args:
+            key: Group key from make_key
+            prompt: The user's query
+
+        Returns:
+            The cached response, or None if nothing is similar enough
+        """
+        # Exact repeats don't need an embedding at all
+        entry = self._entries.get((key, prompt))
+        now = time.monotonic()
+        if entry is not None and now - entry[2] < self.ttl_seconds:
+            return entry[1]
+        if not self.similarity_enabled:
+            return None
+
+        candidates = [
+            (embedding, response) for (group, _), (embedding, response, created) in self._entries.items()
+            if group == key and embedding is not None and now - created < self.ttl_seconds
+        ]
+        if not candidates:
+            return None
+
+        query = await self._embed(prompt)
+        if query is None:
+            return None
+
+        similarities = np.stack([embedding for embedding, _ in candidates]) @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.threshold:
+            logger.info("LLM cache hit (similarity %.3f)", similarities[best])
+            return candidates[best][1]
+        return None
+
+    async def insert(self, key: Tuple[str, ...], prompt: str, response: str) -> None:
+        """
+        Store a response for later similar prompts.
+
+        Args:
+            key: Group key from make_key
+            prompt: The user's query
+            response: The LLM's response
+        """
+        # Embeddings are only needed for similarity lookups
+        embedding = None
+        if self.similarity_enabled:
+            embedding = await self._embed(prompt)
+            if embedding is None:
+                return
+
+        async with self._lock:
+            self._entries[(key, prompt)] = (embedding, response, time.monotonic())
+            self._entries.move_to_end((key, prompt))
+            # Evict the oldest entries once the cache is full
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached responses."""
+        self._entries.clear()
+
+# Shared cache used by get_llm_response
+response_cache = GenerativeCache(
+    threshold=settings.LLM_CACHE_SIMILARITY_THRESHOLD,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    similarity_enabled=settings.LLM_CACHE_SIMILARITY_ENABLED
+)
@@ -1,7 +1,18 @@
+import asyncio
+import hashlib
 import httpx
-import json
+import itertools
+import logging
+import operator
+import orjson
 import os
-from typing import List, Optional, Dict, Any, AsyncGenerator
+import re
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from functools import lru_cache, partial
+from typing import List, Optional, Dict, Any, AsyncGenerator, Callable, Tuple
 from app.core.config import get_settings, SYSTEM_PROMPT
 from app.core.chat_utils import (
     enhance_system_message_with_pdf_context, 
@@ -9,9 +20,485 @@ from app.core.chat_utils import (
     get_compliance_system_message
 )
 from app.services.document_service import get_document_context
+from app.services.llm_cache import response_cache
 from sqlalchemy.orm import Session
 
+# tiktoken is optional - when available it gives an exact token count for prompt trimming
+try:
+    import tiktoken
+    _token_encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _token_encoding = None
+
+# simdjson is optional - when available, chat stream deltas are read straight out of the parsed
+# document by one reused parser instead of building a full dict for every event
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# High-volume per-chunk debug messages are only logged once every LOG_SAMPLE_RATE calls
+LOG_SAMPLE_RATE = 50
+_log_sample_counter = itertools.count()
+
+def log_sampled(msg: str, *args: Any) -> None:
+    """Log a high-volume debug message, keeping only 1 in LOG_SAMPLE_RATE occurrences."""
+    if logger.isEnabledFor(logging.DEBUG) and next(_log_sample_counter) % LOG_SAMPLE_RATE == 0:
+        logger.debug(msg, *args)
+
+# Prompt budget for LM Studio completions: context window minus the tokens reserved for max_tokens
+AVG_CHARS_PER_TOKEN = 3.5
+MAX_PROMPT_TOKENS = settings.LOCAL_MODEL_MAX_CONTEXT - 1500
+MAX_PROMPT_LENGTH = int(MAX_PROMPT_TOKENS * AVG_CHARS_PER_TOKEN)
+
+def get_lmstudio_endpoint(path: str) -> str:
+    """Build an LM Studio API URL from LOCAL_MODEL_URL, avoiding a double /v1/."""
+    base_url = settings.LOCAL_MODEL_URL
+    # Remove trailing slash if present
+    if base_url.endswith('/'):
+        base_url = base_url[:-1]
+    
+    # Check if /v1 is already in the base URL to avoid duplication
+    if '/v1' in base_url:
+        return f"{base_url}/{path}"
+    return f"{base_url}/v1/{path}"
+
+# LM Studio settings don't change at runtime, so resolve these once
+LMSTUDIO_CHAT_URL = get_lmstudio_endpoint("chat/completions")
+LMSTUDIO_COMPLETIONS_URL = get_lmstudio_endpoint("completions")
+DEFAULT_LOCAL_MODELS = frozenset({"local-model", settings.LOCAL_MODEL_NAME})
+# cache_prompt asks llama.cpp-based servers to keep the prompt's KV cache, so a repeated prefix
+# (system message and document context) isn't prefilled again; servers that don't know it ignore it
+COMPLETION_PAYLOAD_TEMPLATE = {
+    "temperature": 0.7,
+    "max_tokens": 1500,
+    "stop": ("User:", "Human:", "\n\nHuman:", "\n\nUser:"),
+    "cache_prompt": True
+}
+LMSTUDIO_CHAT_PAYLOAD_TEMPLATE = {
+    "temperature": 0.7,
+    "max_tokens": 1500,
+    "cache_prompt": True
+}
+
+# Request parts shared by every call - httpx copies headers and orjson serializes bodies without mutating them
+JSON_HEADERS = {"Content-Type": "application/json"}
+SSE_REQUEST_HEADERS = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+GEMINI_GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "maxOutputTokens": 1000,
+}
+
+# Prefix of the data lines in server-sent event streams, and the end-of-stream sentinel.
+# Streams are parsed as raw bytes, so lines are never decoded to str
+SSE_DATA_PREFIX = b"data: "
+SSE_DATA_PREFIX_LEN = len(SSE_DATA_PREFIX)
+SSE_DONE = b"[DONE]"
+
+# Streamed deltas are batched until this many characters (or seconds) have accumulated
+STREAM_FLUSH_CHARS = 64
+STREAM_FLUSH_INTERVAL = 0.05
+
+# For streams the read timeout bounds the gap between chunks, not the whole generation,
+# so a stalled server fails fast while long but flowing completions are never cut off
+LLM_HTTP_TIMEOUT = httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=5.0)
+# Non-streaming local calls get nothing back until generation finishes, so allow a longer read
+LMSTUDIO_BLOCKING_TIMEOUT = httpx.Timeout(connect=5.0, read=120.0, write=10.0, pool=5.0)
+
+# Shared client for all LLM providers so connections (and TLS sessions) stay alive between requests.
+# HTTP/2 lets concurrent cloud streams multiplex over one connection (plain-http LM Studio stays on HTTP/1.1)
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client for LLM calls, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=LLM_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=30.0)
+        )
+    return _http_client
+
+# Cap concurrent requests per backend so bursts queue here instead of overloading the model server
+lmstudio_semaphore = asyncio.Semaphore(settings.LOCAL_MODEL_MAX_CONCURRENCY)
+cloud_semaphore = asyncio.Semaphore(settings.CLOUD_MODEL_MAX_CONCURRENCY)
+
+# Non-streaming requests are retried with exponential backoff when the failure is transient:
+# the connection couldn't be made, or the server asked us to slow down / is briefly unavailable
+LLM_RETRY_ATTEMPTS = 3
+LLM_RETRY_BASE_DELAY = 0.5
+LLM_RETRY_MAX_DELAY = 8.0
+LLM_RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+LLM_RETRY_STATUS_CODES = frozenset({429, 503})
+
+async def post_with_retry(url: str, **kwargs: Any) -> httpx.Response:
+    """
+    POST with the shared client, retrying transient failures with exponential backoff.
+    
+    Read timeouts are not retried - the server may still be generating, and retrying would
+    only multiply a slow request. Streaming calls don't use this, since they can't be safely
+    replayed once chunks have been yielded.
+    
+    Args:
+        url: The URL to post to
+        **kwargs: Any other arguments for httpx.AsyncClient.post
+        
+    Returns:
+        The final response (which may still be a 429/503 if every attempt failed)
+    """
+    for attempt in range(1, LLM_RETRY_ATTEMPTS + 1):
+        try:
+            response = await get_http_client().post(url, **kwargs)
+        except LLM_RETRY_EXCEPTIONS as e:
+            if attempt == LLM_RETRY_ATTEMPTS:
+                raise
+            logger.warning("Request to %s failed (%s), retrying (attempt %d/%d)", url, e, attempt, LLM_RETRY_ATTEMPTS)
+        else:
+            if response.status_code not in LLM_RETRY_STATUS_CODES or attempt == LLM_RETRY_ATTEMPTS:
+                return response
+            logger.warning("Request to %s returned %d, retrying (attempt %d/%d)", url, response.status_code, attempt, LLM_RETRY_ATTEMPTS)
+        
+        await asyncio.sleep(min(LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1), LLM_RETRY_MAX_DELAY))
+
+async def close_http_clients() -> None:
+    """Close the shared HTTP client used for LLM calls (called on app shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def aiter_sse_data(response: httpx.Response) -> AsyncGenerator[bytes, None]:
+    """
+    Yield the raw payload of each data line in a server-sent event stream, stopping at [DONE].
+    
+    Lines are split from the raw bytes, skipping httpx's incremental UTF-8 decode - orjson
+    parses the bytes payloads directly.
+    
+    Args:
+        response: The open streaming response
+        
+    Yields:
+        The JSON payload of each event as bytes
+    """
+    pending = b""
+    async for chunk in response.aiter_bytes():
+        lines = (pending + chunk).split(b"\n") if pending else chunk.split(b"\n")
+        # The last piece is an incomplete line until the next chunk (or the end of the stream)
+        pending = lines.pop()
+        for line in lines:
+            if line.startswith(SSE_DATA_PREFIX):
+                data = line[SSE_DATA_PREFIX_LEN:].strip()
+                if data == SSE_DONE:
+                    return
+                yield data
+    
+    if pending.startswith(SSE_DATA_PREFIX):
+        data = pending[SSE_DATA_PREFIX_LEN:].strip()
+        if data != SSE_DONE:
+            yield data
+
+def make_delta_parser() -> Callable[[bytes | str], Optional[str]]:
+    """
+    Create a function that reads choices[0].delta.content from one chat completion stream event.
+    
+    With simdjson installed a single parser is reused for every event, otherwise events are
+    parsed with orjson. Create one per stream - a simdjson parser can't be shared between streams.
+    
+    Returns:
+        A function taking an event's JSON payload and returning its content, or None if the event
+        has no delta content (malformed JSON raises ValueError)
+    """
+    if simdjson is not None:
+        parser = simdjson.Parser()
+        
+        def parse_delta(data: bytes | str) -> Optional[str]:
+            document = parser.parse(data.encode() if isinstance(data, str) else data)
+            try:
+                return document.at_pointer("/choices/0/delta/content")
+            except (KeyError, IndexError, TypeError):
+                return None
+        
+        return parse_delta
+    
+    def parse_delta(data: bytes | str) -> Optional[str]:
+        chunk_data = orjson.loads(data)
+        try:
+            return chunk_data["choices"][0]["delta"]["content"]
+        except (KeyError, IndexError, TypeError):
+            return None
+    
+    return parse_delta
+
+async def read_error_detail(response: httpx.Response) -> str:
+    """
+    Get the error message from a failed streaming response.
+    
+    Streaming responses have to be read explicitly (response.text/json are not awaitable), so the
+    body is read once and parsed with orjson, falling back to the raw text.
+    
+    Args:
+        response: The open streaming response with a non-200 status
+        
+    Returns:
+        The provider's error message, the raw body, or the HTTP status if neither is available
+    """
+    try:
+        body = await response.aread()
+    except httpx.HTTPError:
+        return f"HTTP Error {response.status_code}"
+    
+    try:
+        error = orjson.loads(body).get("error", {})
+    except (orjson.JSONDecodeError, AttributeError):
+        return body.decode("utf-8", "replace") or f"HTTP Error {response.status_code}"
+    
+    # Most providers send {"error": {"message": ...}}, but some send the message string directly
+    if isinstance(error, dict):
+        return error.get("message", "Unknown error")
+    return str(error) or "Unknown error"
+
+async def aiter_sse_text(
+    response: httpx.Response,
+    extract: Callable[[bytes], Optional[str]],
+    coalesce: bool = False
+) -> AsyncGenerator[str, None]:
+    """
+    Yield the generated text from a server-sent event stream - the one parse loop every provider shares.
+    
+    Events are only read from the socket when the consumer asks for the next chunk, so a slow
+    client applies backpressure all the way to the model server - keep this loop pull-based
+    (no background reader task or unbounded buffer between the socket and the yield).
+    
+    Args:
+        response: The open streaming response
+        extract: Returns the text of one raw event payload (None if it has none) and raises
+            ValueError for malformed JSON
+        coalesce: Batch small deltas until STREAM_FLUSH_CHARS characters (or STREAM_FLUSH_INTERVAL
+            seconds) have accumulated, for servers that send roughly one token per event
+        
+    Yields:
+        Chunks of the response text
+    """
+    pending = []
+    pending_chars = 0
+    # Bind per-token helpers to locals to skip global/attribute lookups in the loop
+    monotonic = time.monotonic
+    last_flush = monotonic()
+    async for data in aiter_sse_data(response):
+        # Only malformed JSON is expected here - anything else is a real bug and propagates
+        try:
+            text_chunk = extract(data)
+        except ValueError as e:
+            logger.warning("Error parsing chunk data: %s", e)
+            # The traceback is only formatted when debug logging is on, not for every bad frame
+            logger.debug("Problematic data: %.100r", data, exc_info=True)
+            continue
+        if not text_chunk:
+            continue
+        
+        if not coalesce:
+            yield text_chunk
+            continue
+        
+        pending.append(text_chunk)
+        pending_chars += len(text_chunk)
+        # Flush once enough text has built up, or promptly if tokens are arriving slowly
+        now = monotonic()
+        if pending_chars >= STREAM_FLUSH_CHARS or now - last_flush >= STREAM_FLUSH_INTERVAL:
+            batch = "".join(pending)
+            pending.clear()
+            pending_chars = 0
+            last_flush = now
+            log_sampled("Yielding chunk: %.20s...", batch)
+            yield batch
+    
+    # Flush whatever is still pending when the stream ends
+    if pending:
+        yield "".join(pending)
+
+def extract_completion_event(data: bytes) -> Optional[str]:
+    """Get the text of one completion stream event (raises ValueError for malformed JSON)."""
+    # Keepalive and finish events carry no text, so skip them without parsing
+    if b'"text"' not in data:
+        return None
+    text = extract_completion_text(data)
+    if text is not None:
+        return text
+    # Unusual event shape - fall back to a full parse
+    try:
+        return orjson.loads(data)["choices"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+def extract_gemini_text(data: bytes) -> Optional[str]:
+    """Get the text of one Gemini stream event (raises ValueError for malformed JSON)."""
+    result = orjson.loads(data)
+    # One lookup chain - events without text (e.g. safety or usage metadata) just miss
+    try:
+        return result["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+def extract_completion_text(data: bytes) -> Optional[str]:
+    """
+    Pull the "text" value out of a completion SSE event without parsing the whole JSON object.
+    
+    Args:
+        data: The raw JSON payload of a single SSE event
+        
+    Returns:
+        The decoded text, or None if the event doesn't have a plain string "text" field
+        (callers should fall back to a full JSON parse in that case)
+    """
+    start = data.find(b'"text":')
+    if start < 0:
+        return None
+    start += 7
+    
+    # Allow whitespace after the colon, then require a string literal (not null).
+    # Indexing bytes gives ints, so compare against byte values
+    while start < len(data) and data[start] == 0x20:  # ' '
+        start += 1
+    if start >= len(data) or data[start] != 0x22:  # '"'
+        return None
+    start += 1
+    
+    # Find the closing quote, skipping quotes escaped by an odd number of backslashes
+    end = start
+    while True:
+        end = data.find(b'"', end)
+        if end < 0:
+            return None
+        backslashes = 0
+        while data[end - 1 - backslashes] == 0x5C:  # '\\'
+            backslashes += 1
+        if backslashes % 2 == 0:
+            break
+        end += 1
+    
+    text = data[start - 1:end + 1]
+    # Only escaped literals need a JSON decode - plain ones are just UTF-8
+    if b'\\' in text:
+        return orjson.loads(text)
+    return text[1:-1].decode()
+
+def get_prompt_char_budget(prompt: str) -> int:
+    """
+    Get the maximum number of prompt characters that fit in the local model's token budget.
+    
+    Uses tiktoken for an exact count when installed, otherwise an average chars-per-token estimate.
+    
+    Args:
+        prompt: The prompt to measure
+        
+    Returns:
+        The character length the prompt should be trimmed to
+    """
+    # Without a tokenizer (or for prompts that can't exceed the budget) fall back to the estimate
+    if _token_encoding is None or len(prompt) <= MAX_PROMPT_TOKENS:
+        return MAX_PROMPT_LENGTH
+    
+    token_count = len(_token_encoding.encode(prompt))
+    if token_count <= MAX_PROMPT_TOKENS:
+        return len(prompt)
+    
+    # Scale the character length by how far over the token budget the prompt is
+    return int(len(prompt) * MAX_PROMPT_TOKENS / token_count)
+
+# Marker left in place of the middle of an over-long prompt
+PROMPT_TRIM_MARKER = "\n\n[...content trimmed...]\n\n"
+
+def trim_prompt_middle(prompt: str, max_length: int) -> str:
+    """
+    Trim a prompt to max_length characters by keeping the beginning and the end and cutting the middle.
+    
+    Args:
+        prompt: The prompt to trim
+        max_length: The maximum length of the result (including the trim marker)
+        
+    Returns:
+        The trimmed prompt, built in a single join
+    """
+    # Leave room for the marker so the result really fits in the budget
+    half = max(max_length - len(PROMPT_TRIM_MARKER), 0) // 2
+    return "".join((prompt[:half], PROMPT_TRIM_MARKER, prompt[len(prompt) - half:]))
+
+# Truncation lengths of recent contexts, keyed by a digest of the context so the cache doesn't keep
+# large contexts alive
+CONTEXT_CHAR_LIMIT_CACHE_SIZE = 32
+_context_char_limit_cache: "OrderedDict[Tuple[str, int], Optional[int]]" = OrderedDict()
+_context_char_limit_cache_lock = threading.Lock()
+
+def get_context_char_limit(document_context: str, max_tokens: int) -> Optional[int]:
+    """
+    Get the character length document context should be truncated to so it fits in max_tokens.
+    
+    Results are cached since the same context is usually sent with several questions.
+    
+    Args:
+        document_context: The document context to measure
+        max_tokens: The token budget for the context
+        
+    Returns:
+        The character length to truncate to, or None if the context already fits
+    """
+    key = (hashlib.blake2b(document_context.encode("utf-8"), digest_size=16).hexdigest(), max_tokens)
+    with _context_char_limit_cache_lock:
+        if key in _context_char_limit_cache:
+            _context_char_limit_cache.move_to_end(key)
+            return _context_char_limit_cache[key]
+    
+    limit = compute_context_char_limit(document_context, max_tokens)
+    with _context_char_limit_cache_lock:
+        _context_char_limit_cache[key] = limit
+        # Evict the least recently used lengths once the cache is full
+        while len(_context_char_limit_cache) > CONTEXT_CHAR_LIMIT_CACHE_SIZE:
+            _context_char_limit_cache.popitem(last=False)
+    return limit
+
+def compute_context_char_limit(document_context: str, max_tokens: int) -> Optional[int]:
+    """
+    Measure how long document context can be within max_tokens (uncached).
+    
+    Uses tiktoken for an exact cut when installed, otherwise an average chars-per-token estimate.
+    
+    Args:
+        document_context: The document context to measure
+        max_tokens: The token budget for the context
+        
+    Returns:
+        The character length to truncate to, or None if the context already fits
+    """
+    if _token_encoding is None:
+        max_chars = int(max_tokens * AVG_CHARS_PER_TOKEN)
+        return max_chars if len(document_context) > max_chars else None
+    
+    # Every token covers at least one character, so short contexts can't exceed the budget
+    if len(document_context) <= max_tokens:
+        return None
+    
+    tokens = _token_encoding.encode(document_context)
+    if len(tokens) <= max_tokens:
+        return None
+    return len(_token_encoding.decode(tokens[:max_tokens]))
+
+# Triggers for forcing document acknowledgment: a "what does ... say" question about a context containing test.pdf
+# (matched case-insensitively so the large document context never has to be lowercased)
+DOCUMENT_QUESTION_RE = re.compile(r'^(?=.*what does)(?=.*say)', re.IGNORECASE | re.DOTALL)
+TEST_PDF_RE = re.compile(r'test\.pdf', re.IGNORECASE)
+
+# Providers that can be selected manually, and the API key prefixes used to auto-detect them
+VALID_PROVIDERS = frozenset({'openai', 'anthropic', 'google', 'other'})
+API_KEY_PREFIXES = (
+    ('sk-ant-', 'anthropic'),  # Anthropic (Claude) keys
+    ('claude-', 'anthropic'),
+    ('sk-', 'openai'),  # OpenAI keys
+    ('google-', 'google'),  # Google Gemini keys
+)
 
 def detect_provider(api_key: str, provider: Optional[str] = None) -> str:
     """
@@ -24,29 +511,57 @@ def detect_provider(api_key: str, provider: Optional[str] = None) -> str:
     Returns:
         The detected provider name: 'openai', 'anthropic', 'google', 'other', or 'unknown'
     """
-    # If provider is manually selected, use that
-    if provider and provider.lower() in ['openai', 'anthropic', 'google', 'other']:
-        return provider.lower()
+    # If provider is manually selected, use that (skip lowercasing values that are already valid)
+    if provider:
+        if provider in VALID_PROVIDERS:
+            return provider
+        provider = provider.lower()
+        if provider in VALID_PROVIDERS:
+            return provider
     
     # Auto-detect based on API key format
     if not api_key:
         return 'unknown'
     
-    # OpenAI keys typically start with 'sk-'
-    if api_key.startswith('sk-'):
-        return 'openai'
+    # Prefixes are checked in order - 'sk-ant-' must come before OpenAI's 'sk-'
+    for prefix, name in API_KEY_PREFIXES:
+        if api_key.startswith(prefix):
+            return name
     
-    # Anthropic (Claude) keys typically start with 'claude-' or 'sk-ant-'
-    if api_key.startswith('claude-') or api_key.startswith('sk-ant-'):
-        return 'anthropic'
-    
-    # Google Gemini keys typically contain 'gemini' or start with 'google-'
-    if 'gemini' in api_key or api_key.startswith('google-'):
+    # Google Gemini keys may also just contain 'gemini'
+    if 'gemini' in api_key:
         return 'google'
     
     # If no match, return unknown
     return 'unknown'
 
+# Environment variables checked (in order) when the provider is auto-detected from configured API keys
+ENV_API_KEY_PROVIDERS = (
+    ('openai', 'OPENAI_API_KEY'),
+    ('anthropic', 'ANTHROPIC_API_KEY'),
+    ('google', 'GOOGLE_API_KEY'),
+    ('other', 'OTHER_API_KEY'),
+)
+
+@lru_cache(maxsize=1)
+def detect_env_provider() -> Optional[str]:
+    """
+    Get the first provider with an API key set in the environment.
+    
+    The result is cached - call clear_env_cache() after changing API key environment variables.
+    
+    Returns:
+        The provider name, or None if no API key is set
+    """
+    for name, env_var in ENV_API_KEY_PROVIDERS:
+        if os.environ.get(env_var):
+            return name
+    return None
+
+def clear_env_cache() -> None:
+    """Forget the cached environment provider so the next request re-reads the API keys."""
+    detect_env_provider.cache_clear()
+
 async def get_llm_response(
     prompt: str,
     operation_type: str,
@@ -81,30 +596,34 @@ async def get_llm_response(
         model = settings.DEFAULT_MODEL
     
     # Get document context if document_ids provided but no context yet
+    context_limit = None
     if document_ids and not document_context and db:
         try:
             # Pass the prompt as the query to help filter relevant content
             document_context = await get_document_context(document_ids, db, current_user_id, query=prompt)
-            print(f"Retrieved document context based on query: '{prompt[:50]}...' (truncated)")
+            logger.info("Retrieved document context based on query: '%.50s...' (truncated)", prompt)
             
             # Trim context if it's too long (to avoid token limits)
-            max_context_length = 100000  # Increased for modern models with larger context windows
-            if len(document_context) > max_context_length:
-                print(f"Trimming context from {len(document_context)} to {max_context_length} characters")
-                document_context = document_context[:max_context_length] + "\n[Context truncated due to length]"
+            context_limit = get_context_char_limit(document_context, settings.DOCUMENT_CONTEXT_MAX_TOKENS)
+            if context_limit is not None:
+                logger.info("Trimming context from %d to %d characters", len(document_context), context_limit)
+                # The enhancer truncates while building the system message, avoiding an extra copy here
         except Exception as e:
-            print(f"Error getting document context: {str(e)}")
+            logger.error("Error getting document context: %s", e)
             document_context = f"[Error retrieving document context: {str(e)}]"
     
+    # Only the part of the context that will actually be sent is searched below
+    context_end = context_limit or len(document_context or "")
+    
     # Check if the context has IMPORTANT documents (with stars)
-    has_important_docs = document_context and "⭐⭐⭐ IMPORTANT DOCUMENT ⭐⭐⭐" in document_context
+    has_important_docs = bool(document_context) and document_context.find("⭐⭐⭐ IMPORTANT DOCUMENT ⭐⭐⭐", 0, context_end) >= 0
     
     # Get system message
     system_message = get_compliance_system_message(operation_type)
     
     # Enhance system message with document context if available
     if document_context:
-        system_message = enhance_system_message_with_pdf_context(system_message, document_context)
+        system_message = enhance_system_message_with_pdf_context(system_message, document_context, context_limit)
     
     # Prepare messages for the API call - start with system message
     messages = [
@@ -128,23 +647,37 @@ async def get_llm_response(
     
     # Check if we should modify the prompt to enforce document acknowledgment
     modified_prompt = prompt
-    if document_context and "test.pdf" in document_context.lower() and "what does" in prompt.lower() and "say" in prompt.lower():
+    if document_context and DOCUMENT_QUESTION_RE.search(prompt) and TEST_PDF_RE.search(document_context, 0, context_end):
         # Special handling for questions about files - force the model to acknowledge all documents
         if has_important_docs:
             modified_prompt = f"{prompt}\n\nIMPORTANT: Your response MUST directly quote any document marked with stars (⭐⭐⭐) in the context, especially if the document is named 'real test.pdf'. Do not ignore these important documents."
         else:
             modified_prompt = f"{prompt}\n\nIMPORTANT: Your response MUST acknowledge and directly quote the contents of all provided documents, especially short ones like test.pdf."
         
-        print(f"Modified prompt to enforce document acknowledgment: {modified_prompt}")
+        logger.info("Modified prompt to enforce document acknowledgment: %s", modified_prompt)
     
     # Add the current prompt (modified if necessary)
     messages.append({"role": "user", "content": modified_prompt})
     
+    # Only standalone, non-streaming questions are cached - history changes what a good answer is
+    cache_key = None
+    if settings.LLM_CACHE_ENABLED and not stream and not message_history:
+        # Key on the backend that will answer, so switching model or provider never serves another backend's answer
+        if model == "local-model" or settings.USE_LOCAL_MODEL:
+            cache_model, cache_provider = settings.LOCAL_MODEL_NAME, "local"
+        else:
+            cache_model = model
+            cache_provider = provider if provider and provider != "auto" else detect_env_provider()
+        cache_key = response_cache.make_key(operation_type, system_message, cache_model, str(cache_provider))
+        cached = await response_cache.lookup(cache_key, modified_prompt)
+        if cached is not None:
+            return cached
+    
     try:
         # Simplified model selection logic - just local or cloud
         if model == "local-model" or settings.USE_LOCAL_MODEL:
             # Use local model
-            print(f"Using local model at {settings.LOCAL_MODEL_URL}")
+            logger.info("Using local model at %s", settings.LOCAL_MODEL_URL)
             if stream:
                 async def stream_local_response():
                     try:
@@ -152,14 +685,13 @@ async def get_llm_response(
                         async for chunk in async_gen:
                             yield chunk
                     except Exception as e:
-                        print(f"Error in stream_local_response: {str(e)}")
-                        import traceback
-                        print(f"Traceback: {traceback.format_exc()}")
+                        logger.error("Error in stream_local_response: %s", e)
+                        logger.error("Traceback: %s", traceback.format_exc())
                         yield f"[Error: {str(e)}]"
                 
                 return stream_local_response()
             else:
-                return await call_local_model_api(messages, settings.LOCAL_MODEL_NAME)
+                response = await call_local_model_api(messages, settings.LOCAL_MODEL_NAME)
         else:
             # Use cloud model based on provider
             detected_provider = None
@@ -169,54 +701,60 @@ async def get_llm_response(
                 detected_provider = provider
             else:
                 # Auto-detect based on available API keys
-                if os.environ.get("OPENAI_API_KEY"):
-                    detected_provider = "openai"
-                elif os.environ.get("ANTHROPIC_API_KEY"):
-                    detected_provider = "anthropic"
-                elif os.environ.get("GOOGLE_API_KEY"):
-                    detected_provider = "google"
-                elif os.environ.get("OTHER_API_KEY"):
-                    detected_provider = "other"
+                detected_provider = detect_env_provider()
             
-            # Use the detected provider
-            if detected_provider == "openai":
-                print(f"Using OpenAI cloud model")
+            # Anthropic support (streaming or not) has not been implemented yet
+            if detected_provider == "anthropic":
+                logger.info("Using Anthropic cloud model")
                 if stream:
-                    return call_openai_api_streaming(messages, "gpt-4o-mini")  # Default to GPT-4o-mini
-                else:
-                    return await call_openai_api(messages, "gpt-4o-mini")
-            elif detected_provider == "anthropic":
-                print(f"Using Anthropic cloud model")
-                if stream:
-                    # Anthropic streaming not implemented yet
                     raise NotImplementedError("Anthropic Claude API streaming is not yet implemented")
-                else:
-                    # Call Anthropic API (not implemented yet)
-                    raise NotImplementedError("Anthropic Claude API integration is not yet implemented")
-            elif detected_provider == "google":
-                print(f"Using Google cloud model")
-                if stream:
-                    return call_google_gemini_api_streaming(messages, "gemini-pro")
-                else:
-                    return await call_google_gemini_api(messages, "gemini-pro")
-            elif detected_provider == "other":
-                print(f"Using custom API provider")
-                # For custom providers, we'll use the OpenAI-compatible API format
-                # This assumes the custom provider follows the OpenAI API format
-                if stream:
-                    return call_custom_api_streaming(messages, "default")
-                else:
-                    return await call_custom_api(messages, "default")
-            else:
+                raise NotImplementedError("Anthropic Claude API integration is not yet implemented")
+            
+            # Look up the pre-bound call for this provider instead of re-walking the provider ladder
+            handler = CLOUD_PROVIDER_DISPATCH.get((detected_provider, stream))
+            if handler is None:
                 # No provider detected
                 error_msg = "No API key found for any cloud provider. Please add an API key in settings."
-                print(error_msg)
+                logger.error(error_msg)
                 return error_msg
+            
+            logger.info("Using %s cloud provider", detected_provider)
+            # Streaming handlers return an async generator directly; the others must be awaited
+            if stream:
+                return handler(messages)
+            response = await handler(messages)
     except Exception as e:
-        print(f"Error calling LLM API: {str(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error("Error calling LLM API: %s", e)
+        logger.error("Traceback: %s", traceback.format_exc())
         return get_error_response(str(e))
+    
+    if cache_key is not None:
+        await response_cache.insert(cache_key, modified_prompt, response)
+    return response
+
+async def get_llm_responses_batch(
+    prompts: List[str],
+    operation_type: str,
+    **kwargs
+) -> List[str]:
+    """
+    Get responses for several prompts concurrently.
+    
+    Requests still respect the per-backend concurrency limits, so a large batch queues
+    rather than flooding the model server.
+    
+    Args:
+        prompts: The user queries to answer
+        operation_type: The type of operation (daycare, residential, etc.)
+        **kwargs: Any other get_llm_response arguments (except stream) shared by every prompt.
+            Prefer passing document_context over db, since a session shouldn't be used concurrently.
+        
+    Returns:
+        The responses, in the same order as the prompts
+    """
+    return await asyncio.gather(
+        *(get_llm_response(prompt, operation_type, **kwargs) for prompt in prompts)
+    )
 
 async def call_openai_api(
     messages: List[Dict[str, str]],
@@ -236,28 +774,28 @@ async def call_openai_api(
         raise ValueError("OpenAI API key is not set. Please set the OPENAI_API_KEY environment variable.")
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
+        async with cloud_semaphore:
+            response = await post_with_retry(
                 "https://api.openai.com/v1/chat/completions",
                 headers={
                     "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
                     "Content-Type": "application/json"
                 },
-                json={
+                content=orjson.dumps({
                     "model": model,
                     "messages": messages,
                     "temperature": 0.7,
                     "max_tokens": 1000,
                     "stream": False  # Keep sync version as default for backward compatibility
-                }
+                })
             )
+        
+        if response.status_code != 200:
+            error_detail = orjson.loads(response.content).get("error", {}).get("message", "Unknown error")
+            raise Exception(f"OpenAI API error: {error_detail}")
             
-            if response.status_code != 200:
-                error_detail = response.json().get("error", {}).get("message", "Unknown error")
-                raise Exception(f"OpenAI API error: {error_detail}")
-                
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+        result = orjson.loads(response.content)
+        return result["choices"][0]["message"]["content"]
     except httpx.RequestError as e:
         raise Exception(f"Error communicating with OpenAI API: {str(e)}")
 
@@ -279,61 +817,30 @@ async def call_openai_api_streaming(
         raise ValueError("OpenAI API key is not set. Please set the OPENAI_API_KEY environment variable.")
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            async with client.stream(
-                "POST",
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": model,
-                    "messages": messages,
-                    "temperature": 0.7,
-                    "max_tokens": 1000,
-                    "stream": True
-                },
-                timeout=60.0
-            ) as response:
-                if response.status_code != 200:
-                    # Try to parse error details if available
-                    try:
-                        error_data = await response.json()
-                        error_detail = error_data.get("error", {}).get("message", "Unknown error")
-                    except:
-                        error_detail = "Unknown error"
-                    raise Exception(f"OpenAI API error: {error_detail}")
-                
-                # Process streaming response
-                buffer = ""
-                async for chunk in response.aiter_text():
-                    if chunk.strip():
-                        # Parse the SSE data format
-                        for line in chunk.strip().split('\n'):
-                            if line.startswith('data: '):
-                                data = line[6:]  # Remove 'data: ' prefix
-                                if data.strip() == '[DONE]':
-                                    break
-
-                                try:
-                                    chunk_data = json.loads(data)
-                                    if (
-                                        chunk_data.get("choices") and 
-                                        chunk_data["choices"][0].get("delta") and 
-                                        chunk_data["choices"][0]["delta"].get("content")
-                                    ):
-                                        text_chunk = chunk_data["choices"][0]["delta"]["content"]
-                                        buffer += text_chunk
-                                        yield text_chunk  # Yield each small chunk as it arrives
-                                except Exception as e:
-                                    print(f"Error parsing chunk data: {str(e)}")
-                                    continue
-                
-                # Yield any remaining buffer at the end
-                if buffer:
-                    yield ""
-    
+        client = get_http_client()
+        async with cloud_semaphore, client.stream(
+            "POST",
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            content=orjson.dumps({
+                "model": model,
+                "messages": messages,
+                "temperature": 0.7,
+                "max_tokens": 1000,
+                "stream": True
+            })
+        ) as response:
+            if response.status_code != 200:
+                error_detail = await read_error_detail(response)
+                raise Exception(f"OpenAI API error: {error_detail}")
+            
+            # Process streaming response
+            async for text_chunk in aiter_sse_text(response, make_delta_parser()):
+                yield text_chunk  # Yield each small chunk as it arrives
+
     except httpx.RequestError as e:
         raise Exception(f"Error communicating with OpenAI API: {str(e)}")
 
@@ -363,18 +870,13 @@ async def call_local_model_api(
         else:
             return await call_lmstudio_api(messages, model)
     except Exception as e:
-        print(f"LM Studio API call failed: {str(e)}")
+        logger.error("LM Studio API call failed: %s", e)
         # Fallback to direct completion if chat API fails
         try:
-            # Extract the last user message for direct completion
-            last_user_message = ""
-            system_context = ""
-            
-            for msg in messages:
-                if msg["role"] == "system":
-                    system_context = msg["content"]
-                elif msg["role"] == "user":
-                    last_user_message = msg["content"]
+            # Extract the last user message and system context for direct completion,
+            # walking backwards so the lookups stop at the most recent match
+            last_user_message = next((msg["content"] for msg in reversed(messages) if msg["role"] == "user"), "")
+            system_context = next((msg["content"] for msg in reversed(messages) if msg["role"] == "system"), "")
             
             # Combine system context and last user message for direct completion
             if system_context and last_user_message:
@@ -389,7 +891,7 @@ async def call_local_model_api(
                 else:
                     return await call_direct_completion_api(last_user_message, model)
         except Exception as direct_err:
-            print(f"Direct completion API failed: {str(direct_err)}")
+            logger.error("Direct completion API failed: %s", direct_err)
             # If all else fails, raise the error
             raise Exception(f"Error processing request with local model API: {str(direct_err)}")
 
@@ -405,91 +907,78 @@ async def call_lmstudio_api(messages: List[Dict[str, str]], model: str) -> str:
         The LLM's response as a string
     """
     try:
-        # Use the LM Studio OpenAI-compatible chat endpoint with the correct path
-        # But avoid double /v1/ in the URL
-        base_url = settings.LOCAL_MODEL_URL
-        # Remove trailing slash if present
-        if base_url.endswith('/'):
-            base_url = base_url[:-1]
-        
-        # Check if /v1 is already in the base URL to avoid duplication
-        if '/v1' in base_url:
-            endpoint_url = f"{base_url}/chat/completions"
-        else:
-            endpoint_url = f"{base_url}/v1/chat/completions"
+        # Use the LM Studio OpenAI-compatible chat endpoint
+        endpoint_url = LMSTUDIO_CHAT_URL
         
         # In LM Studio, we may need to use a real model name or omit it entirely
         # Let's try without specifying a model name, as it's common in LM Studio setups
-        payload = {
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 1500
-        }
+        payload = {**LMSTUDIO_CHAT_PAYLOAD_TEMPLATE, "messages": messages}
         
         # Only add model if it's not our default placeholder
         if model != "local-model" and model != settings.LOCAL_MODEL_NAME:
             payload["model"] = model
             
-        print(f"Calling LM Studio API at: {endpoint_url}")
-        print(f"Using model: {model if 'model' in payload else '(default)'}")
-        print(f"Message count: {len(messages)}")
+        logger.info("Calling LM Studio API at: %s", endpoint_url)
+        logger.debug("Using model: %s", payload.get("model", "(default)"))
+        logger.debug("Message count: %d", len(messages))
         
-        # Print a preview of each message for debugging
-        for i, msg in enumerate(messages):
-            content_preview = msg["content"][:100] + "..." if len(msg["content"]) > 100 else msg["content"]
-            print(f"Message {i} (role={msg['role']}): {content_preview}")
+        # Log a preview of each message for debugging (skipped entirely unless DEBUG is enabled)
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, msg in enumerate(messages):
+                content_preview = msg["content"][:100] + "..." if len(msg["content"]) > 100 else msg["content"]
+                logger.debug("Message %d (role=%s): %s", i, msg["role"], content_preview)
         
-        async with httpx.AsyncClient(timeout=120.0) as client:  # Increased timeout for local models
-            response = await client.post(
+        async with lmstudio_semaphore:
+            response = await post_with_retry(
                 endpoint_url,
-                headers={"Content-Type": "application/json"},
-                json=payload,
-                timeout=120.0  # Explicitly set timeout here too
+                headers=JSON_HEADERS,
+                content=orjson.dumps(payload),
+                timeout=LMSTUDIO_BLOCKING_TIMEOUT
             )
+        
+        # Get the response text
+        response_text = response.text
+        logger.info("LM Studio API response status: %s", response.status_code)
+        logger.debug("LM Studio API response preview: %.200s...", response_text)
+        
+        if response.status_code != 200:
+            raise Exception(f"LM Studio API error: {response_text}")
+        
+        try:
+            result = orjson.loads(response.content)
             
-            # Get the response text
-            response_text = response.text
-            print(f"LM Studio API response status: {response.status_code}")
-            print(f"LM Studio API response preview: {response_text[:200]}...")
+            # Debug the response structure
+            logger.debug("LM Studio response keys: %s", list(result.keys()))
             
-            if response.status_code != 200:
-                raise Exception(f"LM Studio API error: {response_text}")
+            # Check for error in response
+            if "error" in result:
+                error_msg = result.get("error")
+                logger.warning("LM Studio returned error: %s", error_msg)
+                raise Exception(f"LM Studio error: {error_msg}")
             
-            try:
-                result = response.json()
-                
-                # Debug the response structure
-                print(f"LM Studio response keys: {result.keys()}")
-                
-                # Check for error in response
-                if "error" in result:
-                    error_msg = result.get("error")
-                    print(f"LM Studio returned error: {error_msg}")
-                    raise Exception(f"LM Studio error: {error_msg}")
-                
-                # Try to handle different response formats
-                if "choices" in result and len(result["choices"]) > 0:
-                    if "message" in result["choices"][0]:
-                        return result["choices"][0]["message"]["content"]
-                    elif "text" in result["choices"][0]:
-                        return result["choices"][0]["text"]
-                    else:
-                        print(f"Unknown choice format: {result['choices'][0].keys()}")
-                elif "output" in result:
-                    return result["output"]
-                elif "text" in result:
-                    return result["text"]
-                elif "response" in result:
-                    return result["response"]
-                elif "generated_text" in result:
-                    return result["generated_text"]
-                elif "message" in result:
-                    return result["message"]
+            # Try to handle different response formats
+            if "choices" in result and len(result["choices"]) > 0:
+                if "message" in result["choices"][0]:
+                    return result["choices"][0]["message"]["content"]
+                elif "text" in result["choices"][0]:
+                    return result["choices"][0]["text"]
                 else:
-                    print(f"Unknown response format: {result}")
-                    raise Exception(f"Unknown response format from LM Studio: {list(result.keys())}")
-            except (KeyError, IndexError, json.JSONDecodeError) as e:
-                raise Exception(f"Error parsing LM Studio response: {str(e)}, Response: {response_text[:200]}...")
+                    logger.warning("Unknown choice format: %s", list(result["choices"][0].keys()))
+            elif "output" in result:
+                return result["output"]
+            elif "text" in result:
+                return result["text"]
+            elif "response" in result:
+                return result["response"]
+            elif "generated_text" in result:
+                return result["generated_text"]
+            elif "message" in result:
+                return result["message"]
+            else:
+                logger.warning("Unknown response format: %s", result)
+                raise Exception(f"Unknown response format from LM Studio: {list(result.keys())}")
+        except (KeyError, IndexError, orjson.JSONDecodeError) as e:
+            raise Exception(f"Error parsing LM Studio response: {str(e)}, Response: {response_text[:200]}...")
     except httpx.RequestError as e:
         raise Exception(f"Error communicating with LM Studio API: {str(e)}")
 
@@ -505,81 +994,62 @@ async def call_direct_completion_api(prompt: str, model: str) -> str:
         The LLM's response as a string
     """
     try:
-        # Use the correct endpoint path avoiding double /v1/
-        base_url = settings.LOCAL_MODEL_URL
-        # Remove trailing slash if present
-        if base_url.endswith('/'):
-            base_url = base_url[:-1]
-            
-        # Check if /v1 is already in the base URL to avoid duplication
-        if '/v1' in base_url:
-            endpoint_url = f"{base_url}/completions"
-        else:
-            endpoint_url = f"{base_url}/v1/completions"
+        endpoint_url = LMSTUDIO_COMPLETIONS_URL
         
         # Prepare payload without model name if using default
-        payload = {
-            "prompt": prompt,
-            "temperature": 0.7,
-            "max_tokens": 1500,
-            "stop": ["User:", "Human:", "\n\nHuman:", "\n\nUser:"]
-        }
+        payload = {**COMPLETION_PAYLOAD_TEMPLATE, "prompt": prompt}
         
         # Only add model if it's not our default placeholder
-        if model != "local-model" and model != settings.LOCAL_MODEL_NAME:
+        if model not in DEFAULT_LOCAL_MODELS:
             payload["model"] = model
             
-        print(f"Calling LM Studio completion API at: {endpoint_url}")
-        print(f"Using model: {model if 'model' in payload else '(default)'}")
-        print(f"Prompt length: {len(prompt)}")
-        print(f"Prompt preview: {prompt[:200]}...")
+        logger.info("Calling LM Studio completion API at: %s", endpoint_url)
+        logger.debug("Using model: %s", payload.get("model", "(default)"))
+        logger.debug("Prompt length: %d", len(prompt))
+        logger.debug("Prompt preview: %.200s...", prompt)
         
         # Trim prompt if too long for model
-        max_prompt_length = 12000  # Adjust based on model's token limit
+        max_prompt_length = get_prompt_char_budget(prompt)
         if len(prompt) > max_prompt_length:
-            print(f"Prompt too long ({len(prompt)} chars), trimming to {max_prompt_length}")
-            # Keep the beginning and the end, trim the middle
-            beginning = prompt[:max_prompt_length//2]
-            ending = prompt[-max_prompt_length//2:]
-            prompt = beginning + "\n\n[...content trimmed...]\n\n" + ending
-            payload["prompt"] = prompt  # Update prompt in payload
-        
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
+            logger.info("Prompt too long (%d chars), trimming to %d", len(prompt), max_prompt_length)
+            payload["prompt"] = trim_prompt_middle(prompt, max_prompt_length)
+        
+        async with lmstudio_semaphore:
+            response = await post_with_retry(
                 endpoint_url,
-                headers={"Content-Type": "application/json"},
-                json=payload,
-                timeout=120.0
+                headers=JSON_HEADERS,
+                content=orjson.dumps(payload),
+                timeout=LMSTUDIO_BLOCKING_TIMEOUT
             )
+        
+        logger.info("LM Studio completion API response status: %s", response.status_code)
+        logger.debug("LM Studio completion API response preview: %.200s...", response.text)
+        
+        if response.status_code != 200:
+            raise Exception(f"LM Studio completion API error: {response.text}")
             
-            print(f"LM Studio completion API response status: {response.status_code}")
-            print(f"LM Studio completion API response preview: {response.text[:200]}...")
+        try:
+            result = orjson.loads(response.content)
+            logger.debug("LM Studio completion response keys: %s", list(result.keys()))
             
-            if response.status_code != 200:
-                raise Exception(f"LM Studio completion API error: {response.text}")
-                
-            try:
-                result = response.json()
-                print(f"LM Studio completion response keys: {result.keys()}")
-                
-                # Check for error in response
-                if "error" in result:
-                    error_msg = result.get("error")
-                    print(f"LM Studio returned error: {error_msg}")
-                    raise Exception(f"LM Studio error: {error_msg}")
-                
-                # Try to handle different response formats
-                if "choices" in result and len(result["choices"]) > 0:
-                    if "text" in result["choices"][0]:
-                        return result["choices"][0]["text"]
-                    else:
-                        print(f"Unknown choice format: {result['choices'][0].keys()}")
-                elif "text" in result:
-                    return result["text"]
+            # Check for error in response
+            if "error" in result:
+                error_msg = result.get("error")
+                logger.warning("LM Studio returned error: %s", error_msg)
+                raise Exception(f"LM Studio error: {error_msg}")
+            
+            # Try to handle different response formats
+            if "choices" in result and len(result["choices"]) > 0:
+                if "text" in result["choices"][0]:
+                    return result["choices"][0]["text"]
                 else:
-                    raise Exception(f"Unknown response format from LM Studio: {list(result.keys())}")
-            except (KeyError, IndexError, json.JSONDecodeError) as e:
-                raise Exception(f"Error parsing LM Studio completion response: {str(e)}")
+                    logger.warning("Unknown choice format: %s", list(result["choices"][0].keys()))
+            elif "text" in result:
+                return result["text"]
+            else:
+                raise Exception(f"Unknown response format from LM Studio: {list(result.keys())}")
+        except (KeyError, IndexError, orjson.JSONDecodeError) as e:
+            raise Exception(f"Error parsing LM Studio completion response: {str(e)}")
     except httpx.RequestError as e:
         raise Exception(f"Error communicating with LM Studio completion API: {str(e)}")
 
@@ -598,119 +1068,63 @@ async def call_lmstudio_api_streaming(
         Chunks of the LLM's response as they become available
     """
     try:
-        # Use the LM Studio OpenAI-compatible chat endpoint with the correct path
-        # But avoid double /v1/ in the URL
-        base_url = settings.LOCAL_MODEL_URL
-        # Remove trailing slash if present
-        if base_url.endswith('/'):
-            base_url = base_url[:-1]
-        
-        # Check if /v1 is already in the base URL to avoid duplication
-        if '/v1' in base_url:
-            endpoint_url = f"{base_url}/chat/completions"
-        else:
-            endpoint_url = f"{base_url}/v1/chat/completions"
+        # Use the LM Studio OpenAI-compatible chat endpoint
+        endpoint_url = LMSTUDIO_CHAT_URL
         
         # In LM Studio, we may need to use a real model name or omit it entirely
         # Let's try without specifying a model name, as it's common in LM Studio setups
-        payload = {
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 1500,
-            "stream": True  # Enable streaming
-        }
+        payload = {**LMSTUDIO_CHAT_PAYLOAD_TEMPLATE, "messages": messages, "stream": True}
         
         # Only add model if it's not our default placeholder
         if model != "local-model" and model != settings.LOCAL_MODEL_NAME:
             payload["model"] = model
             
-        print(f"Calling LM Studio API with streaming at: {endpoint_url}")
-        print(f"Using model: {model if 'model' in payload else '(default)'}")
-        print(f"Message count: {len(messages)}")
+        logger.info("Calling LM Studio API with streaming at: %s", endpoint_url)
+        logger.debug("Using model: %s", payload.get("model", "(default)"))
+        logger.debug("Message count: %d", len(messages))
         
-        # Print a preview of each message for debugging
-        for i, msg in enumerate(messages):
-            content_preview = msg["content"][:100] + "..." if len(msg["content"]) > 100 else msg["content"]
-            print(f"Message {i} (role={msg['role']}): {content_preview}")
+        # Log a preview of each message for debugging (skipped entirely unless DEBUG is enabled)
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, msg in enumerate(messages):
+                content_preview = msg["content"][:100] + "..." if len(msg["content"]) > 100 else msg["content"]
+                logger.debug("Message %d (role=%s): %s", i, msg["role"], content_preview)
         
-        async with httpx.AsyncClient(timeout=120.0) as client:  # Increased timeout for local models
-            try:
-                async with client.stream(
-                    "POST",
-                    endpoint_url,
-                    headers={"Content-Type": "application/json"},
-                    json=payload,
-                    timeout=120.0
-                ) as response:
-                    if response.status_code != 200:
-                        # Try to parse error details if available
-                        try:
-                            error_text = await response.text()
-                            try:
-                                error_data = json.loads(error_text)
-                                error_detail = error_data.get("error", {}).get("message", "Unknown error")
-                            except json.JSONDecodeError:
-                                error_detail = error_text
-                        except:
-                            error_detail = f"HTTP Error {response.status_code}"
-                        
-                        error_msg = f"LM Studio API error: {error_detail}"
-                        print(error_msg)
-                        yield f"[Error: {error_msg}]"
-                        return
-                    
-                    # Process streaming response
-                    buffer = ""
-                    async for chunk in response.aiter_text():
-                        if chunk.strip():
-                            print(f"Raw chunk: {chunk[:50]}...")
-                            # Parse the SSE data format
-                            for line in chunk.strip().split('\n'):
-                                if line.startswith('data: '):
-                                    data = line[6:]  # Remove 'data: ' prefix
-                                    if data.strip() == '[DONE]':
-                                        print("[DONE] marker received")
-                                        break
-
-                                    try:
-                                        chunk_data = json.loads(data)
-                                        if (
-                                            chunk_data.get("choices") and 
-                                            chunk_data["choices"][0].get("delta") and 
-                                            chunk_data["choices"][0]["delta"].get("content")
-                                        ):
-                                            text_chunk = chunk_data["choices"][0]["delta"]["content"]
-                                            buffer += text_chunk
-                                            print(f"Yielding chunk: {text_chunk[:20]}...")
-                                            yield text_chunk  # Yield each small chunk as it arrives
-                                    except Exception as e:
-                                        print(f"Error parsing chunk data: {str(e)}")
-                                        print(f"Problematic data: {data[:100]}")
-                                        import traceback
-                                        print(f"Traceback: {traceback.format_exc()}")
-                                        continue
+        try:
+            async with lmstudio_semaphore, get_http_client().stream(
+                "POST",
+                endpoint_url,
+                headers=JSON_HEADERS,
+                content=orjson.dumps(payload)
+            ) as response:
+                if response.status_code != 200:
+                    error_detail = await read_error_detail(response)
                     
-                    # Yield any remaining buffer at the end
-                    if buffer:
-                        print("Streaming completed successfully")
-            except httpx.RequestError as e:
-                error_msg = f"Error communicating with LM Studio API: {str(e)}"
-                print(error_msg)
-                import traceback
-                print(f"Traceback: {traceback.format_exc()}")
-                yield f"[Error: {error_msg}]"
-            except Exception as e:
-                error_msg = f"Unexpected error in streaming: {str(e)}"
-                print(error_msg)
-                import traceback
-                print(f"Traceback: {traceback.format_exc()}")
-                yield f"[Error: {error_msg}]"
-    
+                    error_msg = f"LM Studio API error: {error_detail}"
+                    logger.error(error_msg)
+                    yield f"[Error: {error_msg}]"
+                    return
+                
+                # Process streaming response
+                # LM Studio sends roughly one token per event, so deltas are coalesced before yielding
+                async for text_chunk in aiter_sse_text(response, make_delta_parser(), coalesce=True):
+                    yield text_chunk
+                
+                logger.info("Streaming completed successfully")
+        except httpx.RequestError as e:
+            error_msg = f"Error communicating with LM Studio API: {str(e)}"
+            logger.error(error_msg)
+            logger.error("Traceback: %s", traceback.format_exc())
+            yield f"[Error: {error_msg}]"
+        except Exception as e:
+            error_msg = f"Unexpected error in streaming: {str(e)}"
+            logger.error(error_msg)
+            logger.error("Traceback: %s", traceback.format_exc())
+            yield f"[Error: {error_msg}]"
+
     except Exception as e:
         error_msg = f"Error setting up LM Studio API streaming: {str(e)}"
-        print(error_msg)
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error(error_msg)
+        logger.error("Traceback: %s", traceback.format_exc())
         yield f"[Error: {error_msg}]"
 
 async def call_direct_completion_api_streaming(
@@ -728,125 +1142,98 @@ async def call_direct_completion_api_streaming(
         Chunks of the LLM's response as they become available
     """
     try:
-        # Use the correct endpoint path avoiding double /v1/
-        base_url = settings.LOCAL_MODEL_URL
-        # Remove trailing slash if present
-        if base_url.endswith('/'):
-            base_url = base_url[:-1]
-            
-        # Check if /v1 is already in the base URL to avoid duplication
-        if '/v1' in base_url:
-            endpoint_url = f"{base_url}/completions"
-        else:
-            endpoint_url = f"{base_url}/v1/completions"
+        endpoint_url = LMSTUDIO_COMPLETIONS_URL
         
         # Prepare payload without model name if using default
-        payload = {
-            "prompt": prompt,
-            "temperature": 0.7,
-            "max_tokens": 1500,
-            "stop": ["User:", "Human:", "\n\nHuman:", "\n\nUser:"],
-            "stream": True  # Enable streaming
-        }
+        payload = {**COMPLETION_PAYLOAD_TEMPLATE, "prompt": prompt, "stream": True}
         
         # Only add model if it's not our default placeholder
-        if model != "local-model" and model != settings.LOCAL_MODEL_NAME:
+        if model not in DEFAULT_LOCAL_MODELS:
             payload["model"] = model
             
-        print(f"Calling LM Studio completion API with streaming at: {endpoint_url}")
-        print(f"Using model: {model if 'model' in payload else '(default)'}")
-        print(f"Prompt length: {len(prompt)}")
-        print(f"Prompt preview: {prompt[:200]}...")
+        logger.info("Calling LM Studio completion API with streaming at: %s", endpoint_url)
+        logger.debug("Using model: %s", payload.get("model", "(default)"))
+        logger.debug("Prompt length: %d", len(prompt))
+        logger.debug("Prompt preview: %.200s...", prompt)
         
         # Trim prompt if too long for model
-        max_prompt_length = 12000  # Adjust based on model's token limit
+        max_prompt_length = get_prompt_char_budget(prompt)
         if len(prompt) > max_prompt_length:
-            print(f"Prompt too long ({len(prompt)} chars), trimming to {max_prompt_length}")
-            # Keep the beginning and the end, trim the middle
-            beginning = prompt[:max_prompt_length//2]
-            ending = prompt[-max_prompt_length//2:]
-            prompt = beginning + "\n\n[...content trimmed...]\n\n" + ending
-            payload["prompt"] = prompt  # Update prompt in payload
-        
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            try:
-                async with client.stream(
-                    "POST",
-                    endpoint_url,
-                    headers={"Content-Type": "application/json"},
-                    json=payload,
-                    timeout=120.0
-                ) as response:
-                    if response.status_code != 200:
-                        # Try to parse error details if available
-                        try:
-                            error_text = await response.text()
-                            try:
-                                error_data = json.loads(error_text)
-                                error_detail = error_data.get("error", {}).get("message", "Unknown error")
-                            except json.JSONDecodeError:
-                                error_detail = error_text
-                        except:
-                            error_detail = f"HTTP Error {response.status_code}"
-                        
-                        error_msg = f"LM Studio completion API error: {error_detail}"
-                        print(error_msg)
-                        yield f"[Error: {error_msg}]"
-                        return
-                    
-                    # Process streaming response
-                    buffer = ""
-                    async for chunk in response.aiter_text():
-                        if chunk.strip():
-                            print(f"Raw completion chunk: {chunk[:50]}...")
-                            # Parse the SSE data format
-                            for line in chunk.strip().split('\n'):
-                                if line.startswith('data: '):
-                                    data = line[6:]  # Remove 'data: ' prefix
-                                    if data.strip() == '[DONE]':
-                                        print("[DONE] marker received")
-                                        break
-
-                                    try:
-                                        chunk_data = json.loads(data)
-                                        if (
-                                            chunk_data.get("choices") and 
-                                            chunk_data["choices"][0].get("text")
-                                        ):
-                                            text_chunk = chunk_data["choices"][0]["text"]
-                                            buffer += text_chunk
-                                            print(f"Yielding completion chunk: {text_chunk[:20]}...")
-                                            yield text_chunk  # Yield each small chunk as it arrives
-                                    except Exception as e:
-                                        print(f"Error parsing completion chunk data: {str(e)}")
-                                        print(f"Problematic data: {data[:100]}")
-                                        import traceback
-                                        print(f"Traceback: {traceback.format_exc()}")
-                                        continue
+            logger.info("Prompt too long (%d chars), trimming to %d", len(prompt), max_prompt_length)
+            payload["prompt"] = trim_prompt_middle(prompt, max_prompt_length)
+        
+        # Serialize the (potentially large) prompt once with orjson and send the raw bytes
+        body = orjson.dumps(payload)
+        
+        try:
+            async with lmstudio_semaphore, get_http_client().stream(
+                "POST",
+                endpoint_url,
+                headers=SSE_REQUEST_HEADERS,
+                content=body
+            ) as response:
+                if response.status_code != 200:
+                    error_detail = await read_error_detail(response)
                     
-                    # Yield any remaining buffer at the end
-                    if buffer:
-                        print("Completion streaming completed successfully")
-            except httpx.RequestError as e:
-                error_msg = f"Error communicating with LM Studio completion API: {str(e)}"
-                print(error_msg)
-                import traceback
-                print(f"Traceback: {traceback.format_exc()}")
-                yield f"[Error: {error_msg}]"
-            except Exception as e:
-                error_msg = f"Unexpected error in completion streaming: {str(e)}"
-                print(error_msg)
-                import traceback
-                print(f"Traceback: {traceback.format_exc()}")
-                yield f"[Error: {error_msg}]"
-    
+                    error_msg = f"LM Studio completion API error: {error_detail}"
+                    logger.error(error_msg)
+                    yield f"[Error: {error_msg}]"
+                    return
+                
+                # Process streaming response
+                async for text_chunk in aiter_sse_text(response, extract_completion_event, coalesce=True):
+                    yield text_chunk
+                
+                logger.info("Completion streaming completed successfully")
+        except httpx.RequestError as e:
+            error_msg = f"Error communicating with LM Studio completion API: {str(e)}"
+            logger.error(error_msg)
+            logger.error("Traceback: %s", traceback.format_exc())
+            yield f"[Error: {error_msg}]"
+        except Exception as e:
+            error_msg = f"Unexpected error in completion streaming: {str(e)}"
+            logger.error(error_msg)
+            logger.error("Traceback: %s", traceback.format_exc())
+            yield f"[Error: {error_msg}]"
+
     except Exception as e:
         error_msg = f"Error setting up LM Studio completion API streaming: {str(e)}"
-        print(error_msg)
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error(error_msg)
+        logger.error("Traceback: %s", traceback.format_exc())
         yield f"[Error: {error_msg}]"
 
+def convert_to_gemini_messages(messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Convert OpenAI-style messages to Gemini "contents".
+    
+    Gemini doesn't support system messages directly, so the system message is prepended to the
+    next user message, and assistant messages use Gemini's "model" role.
+    
+    Args:
+        messages: Formatted message history including system, user, and assistant messages
+        
+    Returns:
+        The messages in Gemini format
+    """
+    gemini_messages = []
+    system_content = None
+    
+    for msg in messages:
+        role = msg["role"]
+        if role == "system":
+            system_content = msg["content"]
+        elif role == "user":
+            text = msg["content"]
+            if system_content:
+                # Prepend system message to the first user message
+                text = f"System instructions: {system_content}\n\nUser message: {text}"
+                system_content = None  # Clear after using
+            gemini_messages.append({"role": "user", "parts": [{"text": text}]})
+        elif role == "assistant":
+            gemini_messages.append({"role": "model", "parts": [{"text": msg["content"]}]})
+    
+    return gemini_messages
+
 async def call_google_gemini_api(
     messages: List[Dict[str, str]],
     model: str = "gemini-pro"
@@ -866,67 +1253,40 @@ async def call_google_gemini_api(
     
     try:
         # Convert messages to Gemini format
-        # Gemini doesn't support system messages directly, so we'll prepend it to the first user message
-        gemini_messages = []
-        system_content = None
-        
-        for msg in messages:
-            if msg["role"] == "system":
-                system_content = msg["content"]
-            elif msg["role"] == "user":
-                if system_content:
-                    # Prepend system message to the first user message
-                    gemini_messages.append({
-                        "role": "user",
-                        "parts": [{"text": f"System instructions: {system_content}\n\nUser message: {msg['content']}"}]
-                    })
-                    system_content = None  # Clear after using
-                else:
-                    gemini_messages.append({
-                        "role": "user",
-                        "parts": [{"text": msg["content"]}]
-                    })
-            elif msg["role"] == "assistant":
-                gemini_messages.append({
-                    "role": "model",
-                    "parts": [{"text": msg["content"]}]
-                })
+        gemini_messages = convert_to_gemini_messages(messages)
         
         # Ensure we have the correct model name
         if not model.startswith("gemini-"):
             model = "gemini-pro"  # Default to gemini-pro if not specified
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
+        async with cloud_semaphore:
+            response = await post_with_retry(
                 f"https://generativelanguage.googleapis.com/v1/models/{model}:generateContent",
                 headers={
                     "Content-Type": "application/json",
                     "x-goog-api-key": os.environ.get("GOOGLE_API_KEY")
                 },
-                json={
+                content=orjson.dumps({
                     "contents": gemini_messages,
-                    "generationConfig": {
-                        "temperature": 0.7,
-                        "maxOutputTokens": 1000,
-                    }
-                }
+                    "generationConfig": GEMINI_GENERATION_CONFIG
+                })
             )
+        
+        if response.status_code != 200:
+            error_detail = orjson.loads(response.content).get("error", {}).get("message", "Unknown error")
+            raise Exception(f"Google Gemini API error: {error_detail}")
             
-            if response.status_code != 200:
-                error_detail = response.json().get("error", {}).get("message", "Unknown error")
-                raise Exception(f"Google Gemini API error: {error_detail}")
-                
-            result = response.json()
-            
-            # Extract the response text from the Gemini API response
-            if "candidates" in result and len(result["candidates"]) > 0:
-                candidate = result["candidates"][0]
-                if "content" in candidate and "parts" in candidate["content"]:
-                    parts = candidate["content"]["parts"]
-                    if len(parts) > 0 and "text" in parts[0]:
-                        return parts[0]["text"]
-            
-            raise Exception("Failed to parse response from Google Gemini API")
+        result = orjson.loads(response.content)
+        
+        # Extract the response text from the Gemini API response
+        if "candidates" in result and len(result["candidates"]) > 0:
+            candidate = result["candidates"][0]
+            if "content" in candidate and "parts" in candidate["content"]:
+                parts = candidate["content"]["parts"]
+                if len(parts) > 0 and "text" in parts[0]:
+                    return parts[0]["text"]
+        
+        raise Exception("Failed to parse response from Google Gemini API")
     except httpx.RequestError as e:
         raise Exception(f"Error communicating with Google Gemini API: {str(e)}")
 
@@ -949,101 +1309,40 @@ async def call_google_gemini_api_streaming(
     
     try:
         # Convert messages to Gemini format
-        # Gemini doesn't support system messages directly, so we'll prepend it to the first user message
-        gemini_messages = []
-        system_content = None
-        
-        for msg in messages:
-            if msg["role"] == "system":
-                system_content = msg["content"]
-            elif msg["role"] == "user":
-                if system_content:
-                    # Prepend system message to the first user message
-                    gemini_messages.append({
-                        "role": "user",
-                        "parts": [{"text": f"System instructions: {system_content}\n\nUser message: {msg['content']}"}]
-                    })
-                    system_content = None  # Clear after using
-                else:
-                    gemini_messages.append({
-                        "role": "user",
-                        "parts": [{"text": msg["content"]}]
-                    })
-            elif msg["role"] == "assistant":
-                gemini_messages.append({
-                    "role": "model",
-                    "parts": [{"text": msg["content"]}]
-                })
+        gemini_messages = convert_to_gemini_messages(messages)
         
         # Ensure we have the correct model name
         if not model.startswith("gemini-"):
             model = "gemini-pro"  # Default to gemini-pro if not specified
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            async with client.stream(
-                "POST",
-                f"https://generativelanguage.googleapis.com/v1/models/{model}:streamGenerateContent",
-                headers={
-                    "Content-Type": "application/json",
-                    "x-goog-api-key": os.environ.get("GOOGLE_API_KEY")
-                },
-                json={
-                    "contents": gemini_messages,
-                    "generationConfig": {
-                        "temperature": 0.7,
-                        "maxOutputTokens": 1000,
-                    }
-                },
-                timeout=60.0
-            ) as response:
-                if response.status_code != 200:
-                    # Try to parse error details if available
-                    try:
-                        error_text = await response.text()
-                        try:
-                            error_data = json.loads(error_text)
-                            error_detail = error_data.get("error", {}).get("message", "Unknown error")
-                        except json.JSONDecodeError:
-                            error_detail = error_text
-                    except:
-                        error_detail = f"HTTP Error {response.status_code}"
-                    
-                    error_msg = f"Google Gemini API error: {error_detail}"
-                    print(error_msg)
-                    yield f"[Error: {error_msg}]"
-                    return
+        client = get_http_client()
+        async with cloud_semaphore, client.stream(
+            "POST",
+            f"https://generativelanguage.googleapis.com/v1/models/{model}:streamGenerateContent?alt=sse",
+            headers={
+                "Content-Type": "application/json",
+                "x-goog-api-key": os.environ.get("GOOGLE_API_KEY")
+            },
+            content=orjson.dumps({
+                "contents": gemini_messages,
+                "generationConfig": GEMINI_GENERATION_CONFIG
+            })
+        ) as response:
+            if response.status_code != 200:
+                error_detail = await read_error_detail(response)
                 
-                # Process streaming response
-                buffer = ""
-                async for chunk in response.aiter_bytes():
-                    if not chunk:
-                        continue
-                    
-                    try:
-                        # Decode the chunk
-                        chunk_text = chunk.decode('utf-8')
-                        
-                        # Each line is a separate JSON object
-                        for line in chunk_text.strip().split('\n'):
-                            if not line.strip():
-                                continue
-                            
-                            try:
-                                data = json.loads(line)
-                                if "candidates" in data and len(data["candidates"]) > 0:
-                                    candidate = data["candidates"][0]
-                                    if "content" in candidate and "parts" in candidate["content"]:
-                                        parts = candidate["content"]["parts"]
-                                        if len(parts) > 0 and "text" in parts[0]:
-                                            text = parts[0]["text"]
-                                            yield text
-                            except json.JSONDecodeError:
-                                print(f"Failed to parse JSON from line: {line}")
-                    except Exception as e:
-                        print(f"Error processing chunk: {str(e)}")
-                        yield f"[Error processing response: {str(e)}]"
+                error_msg = f"Google Gemini API error: {error_detail}"
+                logger.error(error_msg)
+                yield f"[Error: {error_msg}]"
+                return
+            
+            # Process streaming response
+            # Without alt=sse Gemini streams one JSON array whose objects span many lines, so request
+            # SSE framing instead - every event is then a complete GenerateContentResponse object
+            async for text in aiter_sse_text(response, extract_gemini_text):
+                yield text
     except httpx.RequestError as e:
-        print(f"Error communicating with Google Gemini API: {str(e)}")
+        logger.error("Error communicating with Google Gemini API: %s", e)
         yield f"[Error: {str(e)}]"
 
 def get_error_response(error_message: str) -> str:
@@ -1078,6 +1377,58 @@ Please try the following:
 3. Contact system administrator if the issue persists"""
 
 # Add functions for custom API provider
+@lru_cache(maxsize=4)
+def get_custom_chat_endpoint(base_url: str) -> str:
+    """Get the chat completions URL for a custom provider base URL (OpenAI-compatible)."""
+    # Ensure the URL ends with /chat/completions for OpenAI compatibility
+    if base_url.endswith("/chat/completions"):
+        return base_url
+    if base_url.endswith("/"):
+        return base_url + "chat/completions"
+    return base_url + "/chat/completions"
+
+# Response shapes used by custom providers: OpenAI format first, then other common formats
+CUSTOM_RESPONSE_EXTRACTORS = (
+    lambda result: result["choices"][0]["message"]["content"],
+    operator.itemgetter("output"),
+    operator.itemgetter("text"),
+    operator.itemgetter("response"),
+    operator.itemgetter("generated_text"),
+)
+# The shape that worked last time - a provider keeps answering in the same format
+_custom_response_extractor: Optional[Callable[[Dict[str, Any]], str]] = None
+
+def extract_custom_response(result: Dict[str, Any]) -> str:
+    """
+    Extract the generated text from a custom provider's response.
+    
+    The extractor that matched the previous response is tried first, so only the first
+    response (or a provider change) has to probe every known format.
+    
+    Args:
+        result: The parsed JSON response
+        
+    Returns:
+        The LLM's response as a string
+    """
+    global _custom_response_extractor
+    if _custom_response_extractor is not None:
+        try:
+            return _custom_response_extractor(result)
+        except (KeyError, IndexError, TypeError):
+            pass
+    
+    for extractor in CUSTOM_RESPONSE_EXTRACTORS:
+        try:
+            text = extractor(result)
+        except (KeyError, IndexError, TypeError):
+            continue
+        _custom_response_extractor = extractor
+        return text
+    
+    # If we can't extract the response, return an error
+    raise Exception(f"Could not extract response from custom API: {result}")
+
 async def call_custom_api(
     messages: List[Dict[str, str]],
     model: str = "default"
@@ -1092,60 +1443,39 @@ async def call_custom_api(
     Returns:
         The LLM's response as a string
     """
-    if not os.environ.get("OTHER_API_KEY"):
+    api_key = os.environ.get("OTHER_API_KEY")
+    if not api_key:
         raise ValueError("Custom API key is not set. Please set the OTHER_API_KEY environment variable.")
     
-    if not os.environ.get("OTHER_API_URL"):
+    api_url = os.environ.get("OTHER_API_URL")
+    if not api_url:
         raise ValueError("Custom API URL is not set. Please set the OTHER_API_URL environment variable.")
     
     try:
-        custom_api_url = os.environ.get("OTHER_API_URL")
-        # Ensure the URL ends with /chat/completions for OpenAI compatibility
-        if not custom_api_url.endswith("/chat/completions"):
-            if custom_api_url.endswith("/"):
-                custom_api_url += "chat/completions"
-            else:
-                custom_api_url += "/chat/completions"
+        custom_api_url = get_custom_chat_endpoint(api_url)
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
+        async with cloud_semaphore:
+            response = await post_with_retry(
                 custom_api_url,
                 headers={
-                    "Authorization": f"Bearer {os.environ.get('OTHER_API_KEY')}",
+                    "Authorization": f"Bearer {api_key}",
                     "Content-Type": "application/json"
                 },
-                json={
+                content=orjson.dumps({
                     "model": model,
                     "messages": messages,
                     "temperature": 0.7,
                     "max_tokens": 1000,
                     "stream": False
-                }
+                })
             )
+        
+        if response.status_code != 200:
+            error_detail = orjson.loads(response.content).get("error", {}).get("message", "Unknown error")
+            raise Exception(f"Custom API error: {error_detail}")
             
-            if response.status_code != 200:
-                error_detail = response.json().get("error", {}).get("message", "Unknown error")
-                raise Exception(f"Custom API error: {error_detail}")
-                
-            result = response.json()
-            
-            # Try to extract the response in OpenAI format
-            if "choices" in result and len(result["choices"]) > 0:
-                if "message" in result["choices"][0] and "content" in result["choices"][0]["message"]:
-                    return result["choices"][0]["message"]["content"]
-            
-            # If we can't extract in OpenAI format, try other common formats
-            if "output" in result:
-                return result["output"]
-            elif "text" in result:
-                return result["text"]
-            elif "response" in result:
-                return result["response"]
-            elif "generated_text" in result:
-                return result["generated_text"]
-            
-            # If we can't extract the response, return an error
-            raise Exception(f"Could not extract response from custom API: {result}")
+        result = orjson.loads(response.content)
+        return extract_custom_response(result)
     except httpx.RequestError as e:
         raise Exception(f"Error communicating with custom API: {str(e)}")
 
@@ -1163,75 +1493,51 @@ async def call_custom_api_streaming(
     Yields:
         Chunks of the LLM's response as they become available
     """
-    if not os.environ.get("OTHER_API_KEY"):
+    api_key = os.environ.get("OTHER_API_KEY")
+    if not api_key:
         raise ValueError("Custom API key is not set. Please set the OTHER_API_KEY environment variable.")
     
-    if not os.environ.get("OTHER_API_URL"):
+    api_url = os.environ.get("OTHER_API_URL")
+    if not api_url:
         raise ValueError("Custom API URL is not set. Please set the OTHER_API_URL environment variable.")
     
     try:
-        custom_api_url = os.environ.get("OTHER_API_URL")
-        # Ensure the URL ends with /chat/completions for OpenAI compatibility
-        if not custom_api_url.endswith("/chat/completions"):
-            if custom_api_url.endswith("/"):
-                custom_api_url += "chat/completions"
-            else:
-                custom_api_url += "/chat/completions"
+        custom_api_url = get_custom_chat_endpoint(api_url)
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            async with client.stream(
-                "POST",
-                custom_api_url,
-                headers={
-                    "Authorization": f"Bearer {os.environ.get('OTHER_API_KEY')}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": model,
-                    "messages": messages,
-                    "temperature": 0.7,
-                    "max_tokens": 1000,
-                    "stream": True
-                },
-                timeout=60.0
-            ) as response:
-                if response.status_code != 200:
-                    # Try to parse error details if available
-                    try:
-                        error_data = await response.json()
-                        error_detail = error_data.get("error", {}).get("message", "Unknown error")
-                    except:
-                        error_detail = "Unknown error"
-                    raise Exception(f"Custom API error: {error_detail}")
-                
-                # Process streaming response
-                buffer = ""
-                async for chunk in response.aiter_text():
-                    if chunk.strip():
-                        # Parse the SSE data format
-                        for line in chunk.strip().split('\n'):
-                            if line.startswith('data: '):
-                                data = line[6:]  # Remove 'data: ' prefix
-                                if data.strip() == '[DONE]':
-                                    break
-
-                                try:
-                                    chunk_data = json.loads(data)
-                                    if (
-                                        chunk_data.get("choices") and 
-                                        chunk_data["choices"][0].get("delta") and 
-                                        chunk_data["choices"][0]["delta"].get("content")
-                                    ):
-                                        text_chunk = chunk_data["choices"][0]["delta"]["content"]
-                                        buffer += text_chunk
-                                        yield text_chunk  # Yield each small chunk as it arrives
-                                except Exception as e:
-                                    print(f"Error parsing chunk data: {str(e)}")
-                                    continue
-                
-                # Yield any remaining buffer at the end
-                if buffer:
-                    yield ""
-    
+        client = get_http_client()
+        async with cloud_semaphore, client.stream(
+            "POST",
+            custom_api_url,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            content=orjson.dumps({
+                "model": model,
+                "messages": messages,
+                "temperature": 0.7,
+                "max_tokens": 1000,
+                "stream": True
+            })
+        ) as response:
+            if response.status_code != 200:
+                error_detail = await read_error_detail(response)
+                raise Exception(f"Custom API error: {error_detail}")
+            
+            # Process streaming response
+            async for text_chunk in aiter_sse_text(response, make_delta_parser()):
+                yield text_chunk  # Yield each small chunk as it arrives
+
     except httpx.RequestError as e:
-        raise Exception(f"Error communicating with custom API: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Error communicating with custom API: {str(e)}")
+
+# Cloud provider calls keyed by (provider, stream), with each provider's default model already bound.
+# The custom ("other") provider uses the OpenAI-compatible API format.
+CLOUD_PROVIDER_DISPATCH = {
+    ("openai", False): partial(call_openai_api, model="gpt-4o-mini"),
+    ("openai", True): partial(call_openai_api_streaming, model="gpt-4o-mini"),
+    ("google", False): partial(call_google_gemini_api, model="gemini-pro"),
+    ("google", True): partial(call_google_gemini_api_streaming, model="gemini-pro"),
+    ("other", False): partial(call_custom_api, model="default"),
+    ("other", True): partial(call_custom_api_streaming, model="default"),
+}
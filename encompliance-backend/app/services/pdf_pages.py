@@ -0,0 +1,45 @@
+import logging
+from typing import List
+
+# Kept apart from document_service so the spawned PDF worker processes only import this module
+# (and PyMuPDF), not the embedding model, database and web framework the service pulls in
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+logger = logging.getLogger(__name__)
+
+def init_pdf_worker() -> None:
+    """Set up logging in a PDF worker process, which doesn't inherit the server's log listener"""
+    logging.basicConfig(level=logging.INFO, format=logging.BASIC_FORMAT)
+
+def read_pdf_page_range(pdf_path: str, page_start: int, page_end: int, doc=None) -> List[str]:
+    """
+    Extract the text of pages [page_start, page_end) with PyMuPDF.
+    
+    Runs in the PDF worker processes, so it opens its own handle unless one is passed in.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        page_start: Index of the first page to read
+        page_end: Index one past the last page to read
+        doc: Already opened fitz document, if any
+        
+    Returns:
+        List with the text of each page in the range
+    """
+    if doc is None:
+        with fitz.open(pdf_path) as doc:
+            doc.authenticate('')
+            return read_pdf_page_range(pdf_path, page_start, page_end, doc)
+    
+    page_texts = []
+    for i in range(page_start, page_end):
+        try:
+            page_texts.append(doc[i].get_text("text"))
+        except Exception as e:
+            error_msg = f"Error extracting text from page {i+1}: {str(e)}"
+            logger.warning("%s", error_msg)
+            page_texts.append(f"[Error on page {i+1}: {error_msg}]")
+    return page_texts
@@ -1,16 +1,14 @@
 import os
 import sys
 import argparse
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.models.user import User
-from app.models.user_settings import UserSettings
-from app.database import Base
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Number of user IDs covered by each DELETE transaction
+DELETE_BATCH_SIZE = 10_000
+
 def cleanup_users(confirm=False, admin_only=True):
     """
     Remove all users from the database.
@@ -25,20 +23,30 @@ def cleanup_users(confirm=False, admin_only=True):
         print("Error: DATABASE_URL environment variable not set")
         sys.exit(1)
     
+    # Imported here so --help and a missing DATABASE_URL exit without loading SQLAlchemy and the models
+    from sqlalchemy import create_engine, func
+    from sqlalchemy.orm import sessionmaker
+    from app.models.user import User
+    from app.models.user_settings import UserSettings
+    
     # Connect to database
     engine = create_engine(database_url)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     db = SessionLocal()
     
     try:
-        # Count users to be deleted
+        # Users to be deleted
+        users_query = db.query(User)
         if admin_only:
             # Define your admin users by their usernames or emails
             admin_users = ["admin@encompliance.io"]
-            count = db.query(User).filter(~User.email.in_(admin_users)).count()
+            users_query = users_query.filter(~User.email.in_(admin_users))
+        
+        # Count users to be deleted with a plain COUNT(id), without wrapping the query in a subquery
+        count = users_query.with_entities(func.count(User.id)).scalar()
+        if admin_only:
             print(f"Found {count} non-admin users to delete")
         else:
-            count = db.query(User).count()
             print(f"Found {count} users to delete")
         
         # Confirm deletion
@@ -48,29 +56,33 @@ def cleanup_users(confirm=False, admin_only=True):
                 print("Operation cancelled")
                 return
         
-        # Delete users
-        if admin_only:
-            admin_users = ["admin@encompliance.io"]
-            users = db.query(User).filter(~User.email.in_(admin_users)).all()
-        else:
-            users = db.query(User).all()
+        # Delete in primary key ranges, committing after each one, so a large cleanup is a series of
+        # short transactions rather than one long-running DELETE holding its locks throughout
+        min_id, max_id = users_query.with_entities(func.min(User.id), func.max(User.id)).one()
+        deleted = 0
+        if min_id is not None:
+            for batch_start in range(min_id, max_id + 1, DELETE_BATCH_SIZE):
+                batch_query = users_query.filter(
+                    User.id >= batch_start, User.id < batch_start + DELETE_BATCH_SIZE
+                )
+                
+                # Delete associated user settings first (will be cascade deleted, but bulk deletes skip ORM cascades);
+                # both deletes are single bulk statements, so no users are loaded
+                db.query(UserSettings).filter(
+                    UserSettings.user_id.in_(batch_query.with_entities(User.id).scalar_subquery())
+                ).delete(synchronize_session=False)
+                
+                # Delete users
+                deleted += batch_query.delete(synchronize_session=False)
+                
+                # Commit this batch
+                db.commit()
         
-        # Delete associated user settings first
-        for user in users:
-            # Delete settings (will be cascade deleted, but explicitly doing it for clarity)
-            settings = db.query(UserSettings).filter(UserSettings.user_id == user.id).first()
-            if settings:
-                db.delete(settings)
-            
-            # Delete user
-            db.delete(user)
-            
-        # Commit changes
-        db.commit()
-        print(f"Successfully deleted {len(users)} users")
+        print(f"Successfully deleted {deleted} users")
     
     except Exception as e:
         db.rollback()
+        # Batches committed before the error stay deleted
         print(f"Error: {str(e)}")
     finally:
         db.close()
@@ -12,21 +12,15 @@ def create_migration():
     # Migration message
     message = f"add_user_settings_table_{timestamp}"
     
-    # Run alembic revision command
-    try:
-        result = subprocess.run(
-            ["alembic", "revision", "--autogenerate", "-m", message],
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        print(result.stdout)
-        print("Migration file created successfully!")
-    except subprocess.CalledProcessError as e:
-        print(f"Error creating migration: {e}")
-        print(e.stdout)
-        print(e.stderr)
-        sys.exit(1)
+    # Run alembic revision command; its output goes straight to our stdout/stderr so
+    # autogenerate progress shows up live instead of being buffered until it exits
+    returncode = subprocess.run(
+        ["alembic", "revision", "--autogenerate", "-m", message]
+    ).returncode
+    if returncode != 0:
+        print(f"Error creating migration: alembic exited with status {returncode}")
+        sys.exit(returncode)
+    print("Migration file created successfully!")
 
 if __name__ == "__main__":
     create_migration() 
\ No newline at end of file
@@ -13,9 +13,11 @@ def create_test_user():
     """Create a test user in the database."""
     db = SessionLocal()
     try:
-        # Check if test user already exists
-        existing_user = db.query(User).filter(User.email == "test@example.com").first()
-        if existing_user:
+        # Check if test user already exists (EXISTS query, no need to load the row)
+        user_exists = db.query(
+            db.query(User).filter(User.email == "test@example.com").exists()
+        ).scalar()
+        if user_exists:
             print("Test user already exists.")
             return
         
@@ -33,10 +35,13 @@ def create_test_user():
         )
         
         db.add(test_user)
+        # The INSERT fills in the generated ID (RETURNING), so read it before commit expires the
+        # instance rather than refreshing it with another SELECT afterwards
+        db.flush()
+        test_user_id = test_user.id
         db.commit()
-        db.refresh(test_user)
         
-        print(f"Test user created with ID: {test_user.id}")
+        print(f"Test user created with ID: {test_user_id}")
         print("Email: test@example.com")
         print("Password: password123")
     except Exception as e:
@@ -2,16 +2,13 @@ import os
 import shutil
 import datetime
 import asyncio
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from functools import lru_cache
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.future import select
 from app.models.user import User
 from app.models.document import Document
 from app.core.config import get_settings
 from app.auth.utils import get_password_hash
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from io import BytesIO
 
 settings = get_settings()
 
@@ -20,59 +17,91 @@ ASYNC_DATABASE_URL = settings.DATABASE_URL.replace(
     'postgresql://', 'postgresql+asyncpg://'
 )
 
-async def create_test_pdf():
-    """Create a test PDF file in memory"""
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
+@lru_cache(maxsize=1)
+def get_engine():
+    """Engine shared by every call in this process, so repeated seeding reuses its connections"""
+    return create_async_engine(ASYNC_DATABASE_URL, pool_size=5, max_overflow=5)
+
+@lru_cache(maxsize=1)
+def get_sessionmaker():
+    """Session factory bound to the shared engine"""
+    return async_sessionmaker(get_engine(), expire_on_commit=False)
+
+# Text of the test document, one line per entry
+PARAGRAPHS = (
+    "This is a test PDF document for the compliance system.",
+    "",
+    "Compliance Regulations:",
+    "1. All daycare facilities must maintain a 1:4 staff-to-child ratio for children under 2 years old.",
+    "2. Staff members must have CPR certification renewed every 2 years.",
+    "3. Background checks must be performed on all staff members annually.",
+    "4. Facilities must have at least 35 square feet of indoor space per child.",
+    "5. Fire drills must be conducted monthly and documented.",
+    "6. All medications must be stored in locked cabinets.",
+    "7. Food handling areas must be separate from diapering areas.",
+    "8. Building must comply with local fire and safety codes.",
+    "9. Emergency evacuation plans must be posted in visible locations.",
+    "10. Daily health checks must be performed and documented for each child.",
+    "",
+    "Residential Care Compliance Requirements:",
+    "1. Maintain a 1:6 staff-to-resident ratio during waking hours.",
+    "2. Medication administration records must be maintained for all residents.",
+    "3. Staff must complete 40 hours of training annually.",
+    "4. Each resident must have an individualized care plan updated quarterly.",
+    "5. Facilities must conduct and document monthly safety inspections.",
+)
+
+# First file create_test_pdf rendered; later calls copy it instead of drawing the canvas again
+_rendered_test_pdf_path = None
+
+def draw_test_pdf(output) -> None:
+    """Draw the test document onto a canvas writing to the given file object"""
+    # reportlab is only needed the first time the PDF is rendered
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+    
+    c = canvas.Canvas(output, pagesize=letter)
     c.setFont("Helvetica", 12)
     
     # Add a title
     c.drawString(100, 750, "Test Compliance Document")
     
-    # Add some paragraphs of text
-    paragraphs = [
-        "This is a test PDF document for the compliance system.",
-        "",
-        "Compliance Regulations:",
-        "1. All daycare facilities must maintain a 1:4 staff-to-child ratio for children under 2 years old.",
-        "2. Staff members must have CPR certification renewed every 2 years.",
-        "3. Background checks must be performed on all staff members annually.",
-        "4. Facilities must have at least 35 square feet of indoor space per child.",
-        "5. Fire drills must be conducted monthly and documented.",
-        "6. All medications must be stored in locked cabinets.",
-        "7. Food handling areas must be separate from diapering areas.",
-        "8. Building must comply with local fire and safety codes.",
-        "9. Emergency evacuation plans must be posted in visible locations.",
-        "10. Daily health checks must be performed and documented for each child.",
-        "",
-        "Residential Care Compliance Requirements:",
-        "1. Maintain a 1:6 staff-to-resident ratio during waking hours.",
-        "2. Medication administration records must be maintained for all residents.",
-        "3. Staff must complete 40 hours of training annually.",
-        "4. Each resident must have an individualized care plan updated quarterly.",
-        "5. Facilities must conduct and document monthly safety inspections.",
-    ]
-    
-    y_position = 730
-    for paragraph in paragraphs:
-        y_position -= 20
-        c.drawString(100, y_position, paragraph)
-        if y_position < 100:
+    # Write the paragraphs through one text object per page instead of a drawString call per line
+    text = c.beginText(100, 710)
+    text.setFont("Helvetica", 12, leading=20)
+    for paragraph in PARAGRAPHS:
+        text.textLine(paragraph)
+        if text.getY() < 80:  # The line just written is below y=100
+            c.drawText(text)
             c.showPage()
-            y_position = 750
+            text = c.beginText(100, 730)
+            text.setFont("Helvetica", 12, leading=20)
+    c.drawText(text)
     
     c.save()
-    return buffer.getvalue()
+
+def create_test_pdf(dest_path: str) -> None:
+    """Write the test PDF file to dest_path"""
+    global _rendered_test_pdf_path
+    
+    # The content is fixed, so a file rendered earlier can simply be copied
+    if _rendered_test_pdf_path and os.path.exists(_rendered_test_pdf_path):
+        shutil.copyfile(_rendered_test_pdf_path, dest_path)
+        return
+    
+    # Let the canvas write straight to the file rather than through an in-memory buffer
+    with open(dest_path, "wb") as f:
+        draw_test_pdf(f)
+    _rendered_test_pdf_path = dest_path
 
 async def ensure_test_user(session):
-    """Ensure a test user exists in the database"""
-    # Check if test user already exists
-    result = await session.execute(
-        select(User).where(User.email == "test@example.com")
+    """Ensure a test user exists in the database and return its ID"""
+    # Check if test user already exists; only the ID is needed, so don't load the whole row
+    test_user_id = await session.scalar(
+        select(User.id).where(User.email == "test@example.com").limit(1)
     )
-    test_user = result.scalars().first()
     
-    if not test_user:
+    if test_user_id is None:
         print("Creating test user...")
         # Create a test user
         test_user = User(
@@ -83,41 +112,32 @@ async def ensure_test_user(session):
             is_verified=True
         )
         session.add(test_user)
+        # expire_on_commit is off and the INSERT returns the generated ID, so no refresh is needed
         await session.commit()
-        await session.refresh(test_user)
-        print(f"Created test user with ID: {test_user.id}")
+        test_user_id = test_user.id
+        print(f"Created test user with ID: {test_user_id}")
     else:
-        print(f"Test user already exists with ID: {test_user.id}")
+        print(f"Test user already exists with ID: {test_user_id}")
     
-    return test_user
+    return test_user_id
 
 async def add_test_pdf_to_db():
     """Add a test PDF to the database"""
-    # Create async engine and session
-    engine = create_async_engine(ASYNC_DATABASE_URL)
-    async_session = sessionmaker(
-        engine, expire_on_commit=False, class_=AsyncSession
-    )
-    
-    async with async_session() as session:
+    async with get_sessionmaker()() as session:
         try:
             # Ensure we have a test user
-            test_user = await ensure_test_user(session)
+            test_user_id = await ensure_test_user(session)
             
             # Create PDF storage directory if it doesn't exist
             os.makedirs(settings.PDF_STORAGE_PATH, exist_ok=True)
             
-            # Create a test PDF in memory
-            pdf_content = await create_test_pdf()
-            
             # Generate a unique filename
             timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
             unique_filename = f"{timestamp}_test_compliance.pdf"
             
-            # Save the PDF to the storage location
+            # Write the test PDF to the storage location
             dest_path = os.path.join(settings.PDF_STORAGE_PATH, unique_filename)
-            with open(dest_path, "wb") as f:
-                f.write(pdf_content)
+            create_test_pdf(dest_path)
             
             # Get file size
             file_size = os.path.getsize(dest_path)
@@ -128,11 +148,10 @@ async def add_test_pdf_to_db():
                 filepath=unique_filename,
                 file_type="PDF",
                 file_size=file_size,
-                uploaded_by=test_user.id
+                uploaded_by=test_user_id
             )
             session.add(document)
             await session.commit()
-            await session.refresh(document)
             
             print(f"Added test PDF with ID: {document.id}")
             print(f"Filename: {document.filename}")
@@ -149,7 +168,12 @@ async def add_test_pdf_to_db():
 
 async def main():
     """Main function"""
-    doc_id = await add_test_pdf_to_db()
+    try:
+        doc_id = await add_test_pdf_to_db()
+    finally:
+        # Close the shared engine's connections while the event loop is still running
+        await get_engine().dispose()
+    
     if doc_id:
         print(f"Test PDF added successfully with ID: {doc_id}")
         print(f"You can now use this document ID in the chat by including it in the document_ids parameter")
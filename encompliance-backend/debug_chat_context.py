@@ -2,10 +2,9 @@ import os
 import sys
 import traceback
 import json
-from sqlalchemy.orm import Session
+from pathlib import Path
 from app.database import SessionLocal
 from app.models.document import Document
-from app.services.document_service import get_document_context
 from app.core.config import get_settings
 
 settings = get_settings()
@@ -28,6 +27,9 @@ async def debug_document_context():
         
         print(f"Found document: ID={document.id}, Filename={document.filename}, Path={document.filepath}")
         
+        # Loaded only after the document lookup, since it pulls in the PDF and embedding libraries
+        from app.services.document_service import get_document_context
+        
         # Get document context
         print("\nGetting document context...")
         document_context = await get_document_context([doc_id], db)
@@ -47,8 +49,7 @@ async def debug_document_context():
         print(document_system_message)
         
         # Save the document context to a file for inspection
-        with open("debug_document_context.txt", "w") as f:
-            f.write(document_context)
+        Path("debug_document_context.txt").write_bytes(document_context.encode("utf-8"))
         
         print("\nSaved document context to debug_document_context.txt")
         
@@ -58,8 +59,7 @@ async def debug_document_context():
         print(f"Both documents context length: {len(both_context)}")
         
         # Save the combined context to a file for inspection
-        with open("debug_both_documents_context.txt", "w") as f:
-            f.write(both_context)
+        Path("debug_both_documents_context.txt").write_bytes(both_context.encode("utf-8"))
         
         print("\nSaved both documents context to debug_both_documents_context.txt")
         
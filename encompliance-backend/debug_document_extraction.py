@@ -1,25 +1,97 @@
+import argparse
+import asyncio
 import os
 import sys
 import traceback
-from sqlalchemy.orm import Session
+from typing import List, Optional
 from app.database import SessionLocal
 from app.models.document import Document
-from app.services.document_service import extract_text_from_pdf, get_document_context
 from app.core.config import get_settings
 
 settings = get_settings()
 
-async def debug_document_extraction():
+def resolve_pdf_path(document: Document) -> Optional[str]:
     """
-    Debug the document extraction process for a specific document.
+    Find the file for a document record, trying the usual alternative locations.
+    
+    Args:
+        document: The document record
+    
+    Returns:
+        Path to the file, or None if it can't be found
     """
+    # Get the full path to the document
+    file_path = os.path.join(settings.PDF_STORAGE_PATH, document.filepath)
+    print(f"Full file path: {file_path}")
+    print(f"File exists: {os.path.exists(file_path)}")
+    
+    if os.path.exists(file_path):
+        return file_path
+    
+    print(f"ERROR: File does not exist at expected path: {file_path}")
+    
+    # List the storage directory once and check the alternative names against it,
+    # instead of stat-ing every candidate path
     try:
-        # Create a database session
-        db = SessionLocal()
+        entries = {entry.name for entry in os.scandir(settings.PDF_STORAGE_PATH)}
+    except OSError as e:
+        print(f"Error listing directory: {str(e)}")
+        entries = set()
+    
+    alternative_names = [
+        # Try just the filename in case the path is wrong
+        os.path.basename(document.filepath),
+        
+        # Try with the filename directly (no timestamp)
+        document.filename,
         
-        # Get the document with ID 16 (real test.pdf)
-        doc_id = 16
-        document = db.query(Document).filter(Document.id == doc_id).first()
+        # Try with spaces replaced by underscores
+        document.filepath.replace(" ", "_"),
+        
+        # Try with URL encoding for spaces
+        document.filepath.replace(" ", "%20")
+    ]
+    
+    for name in alternative_names:
+        print(f"Checking alternative name: {name}")
+        if name in entries:
+            alt_path = os.path.join(settings.PDF_STORAGE_PATH, name)
+            print(f"Found file at alternative path: {alt_path}")
+            return alt_path
+    
+    # Try looking in the resources directory
+    alt_path = os.path.join(os.path.dirname(settings.PDF_STORAGE_PATH), "resources", document.filename)
+    print(f"Checking alternative path: {alt_path}")
+    if os.path.exists(alt_path):
+        print(f"Found file at alternative path: {alt_path}")
+        return alt_path
+    
+    print("File not found at any alternative path")
+    
+    # Show what is in the directory, reusing the listing from above
+    print(f"Listing all files in {settings.PDF_STORAGE_PATH}:")
+    for name in sorted(entries):
+        print(f"  - {name}")
+    
+    return None
+
+async def debug_document_extraction(doc_id: int = 16, compare_with: List[int] = None, full_text: bool = False):
+    """
+    Debug the document extraction process for a specific document.
+    
+    Args:
+        doc_id: ID of the document to debug
+        compare_with: Other document IDs to build a combined context with
+        full_text: Print the whole extracted text instead of the first 200 characters
+    """
+    # The document service pulls in the PDF and embedding libraries, so load it only once we get here
+    from app.services.document_service import extract_text_from_pdf, get_document_context
+    
+    # Create a database session
+    db = SessionLocal()
+    try:
+        # The session is synchronous (get_document_context expects one), so query from a worker thread
+        document = await asyncio.to_thread(db.query(Document).filter(Document.id == doc_id).first)
         
         if not document:
             print(f"Document with ID {doc_id} not found in the database")
@@ -27,47 +99,30 @@ async def debug_document_extraction():
         
         print(f"Found document: ID={document.id}, Filename={document.filename}, Path={document.filepath}")
         
-        # Get the full path to the document
-        file_path = os.path.join(settings.PDF_STORAGE_PATH, document.filepath)
-        print(f"Full file path: {file_path}")
-        print(f"File exists: {os.path.exists(file_path)}")
+        file_path = resolve_pdf_path(document)
+        if file_path is None:
+            return
         
-        if not os.path.exists(file_path):
-            print(f"ERROR: File does not exist at expected path: {file_path}")
-            
-            # Try to find the file in alternative locations
-            alternative_paths = [
-                # Try just the filename in case the path is wrong
-                os.path.join(settings.PDF_STORAGE_PATH, os.path.basename(document.filepath)),
-                
-                # Try with the filename directly (no timestamp)
-                os.path.join(settings.PDF_STORAGE_PATH, document.filename),
-                
-                # Try looking in the resources directory
-                os.path.join(os.path.dirname(settings.PDF_STORAGE_PATH), "resources", document.filename),
-                
-                # Try with spaces replaced by underscores
-                os.path.join(settings.PDF_STORAGE_PATH, document.filepath.replace(" ", "_")),
-                
-                # Try with URL encoding for spaces
-                os.path.join(settings.PDF_STORAGE_PATH, document.filepath.replace(" ", "%20"))
-            ]
-            
-            for alt_path in alternative_paths:
-                print(f"Checking alternative path: {alt_path}")
-                if os.path.exists(alt_path):
-                    print(f"Found file at alternative path: {alt_path}")
-                    file_path = alt_path
-                    break
-            else:
-                print("File not found at any alternative path")
-                return
+        # Check if the file is a valid PDF
+        print("\nChecking if the file is a valid PDF...")
+        with open(file_path, 'rb') as f:
+            header = f.read(5)
+            print(f"File header: {header}")
+            if header != b'%PDF-':
+                print(f"WARNING: File does not appear to be a valid PDF (header: {header})")
         
         # Extract text from the PDF
         print("\nExtracting text from PDF...")
-        text = extract_text_from_pdf(file_path)
-        print(f"Extracted {len(text)} characters of text")
-        print(f"First 200 characters: {text[:200]}")
+        extracted = await asyncio.to_thread(extract_text_from_pdf, file_path)
+        if "error" in extracted:
+            print(f"Extraction error: {extracted['error']}")
+        else:
+            text = extracted.get("content", "")
+            print(f"Extracted {len(text)} characters of text")
+            if full_text:
+                print(f"Text: {text}")
+            else:
+                print(f"First 200 characters: {text[:200]}")
         
         # Now test the get_document_context function
         print("\nTesting get_document_context function...")
@@ -75,6 +130,15 @@ async def debug_document_extraction():
         print(f"Document context length: {len(context)}")
         print(f"Document context: {context}")
         
+        # Test with the other documents as well
+        if compare_with:
+            doc_ids = compare_with + [doc_id]
+            print(f"\nTesting with documents {doc_ids}...")
+            combined_context = await get_document_context(doc_ids, db)
+            print(f"Combined context length: {len(combined_context)}")
+            print(f"Combined context first 200 chars: {combined_context[:200]}")
+            print(f"Combined context last 200 chars: {combined_context[-200:]}")
+    
     except Exception as e:
         print(f"Error: {str(e)}")
         traceback.print_exc()
@@ -82,5 +146,11 @@ async def debug_document_extraction():
         db.close()
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(debug_document_extraction()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Debug text extraction and context building for a document")
+    parser.add_argument("--doc-id", type=int, default=16, help="ID of the document to debug")
+    parser.add_argument("--compare-with", type=int, nargs="*", default=[], help="Other document IDs to build a combined context with")
+    parser.add_argument("--full-text", action="store_true", help="Print the whole extracted text")
+    args = parser.parse_args()
+    
+    # e.g. the old document 17 script: --doc-id 17 --compare-with 9 --full-text
+    asyncio.run(debug_document_extraction(args.doc_id, args.compare_with, args.full_text))
@@ -1,6 +1,10 @@
+import hashlib
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 import sys
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # PDF URLs - these are example URLs, replace with actual URLs if different
 PDFS = {
@@ -8,21 +12,120 @@ PDFS = {
     "chapter-748-gro.pdf": "https://www.hhs.texas.gov/sites/default/files/documents/doing-business-with-hhs/provider-portal/protective-services/ccl/min-standards/chapter-748-gro.pdf"
 }
 
+# Shared session so downloads from the same host reuse pooled keep-alive connections;
+# transient gateway errors are retried with backoff
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
+
+# Sidecar file suffixes for the ETag and SHA-256 digest of each downloaded PDF
+ETAG_SUFFIX = ".etag"
+SHA256_SUFFIX = ".sha256"
+
+# Known SHA-256 digests of the published PDFs; when set, downloads must match
+EXPECTED_SHA256 = {}
+
+# Read/write size for downloads and hashing; large chunks keep the number of Python-level reads and writes low
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(filepath):
+    """Compute the SHA-256 digest of a file (hashlib runs it in OpenSSL, using SHA CPU extensions where available)."""
+    h = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def is_local_copy_current(url, filepath):
+    """Check that a downloaded PDF is complete and unchanged on the server, without downloading it again."""
+    # A valid PDF starts with %PDF-; empty or truncated-at-start files fail this check
+    try:
+        with open(filepath, 'rb') as f:
+            if f.read(5) != b'%PDF-':
+                return False
+        size = os.path.getsize(filepath)
+    except OSError:
+        return False
+    
+    # Catch silent corruption by comparing against the digest recorded (or pinned) at download time
+    filename = os.path.basename(filepath)
+    expected_digest = EXPECTED_SHA256.get(filename)
+    if expected_digest is None:
+        try:
+            with open(filepath + SHA256_SUFFIX) as f:
+                expected_digest = f.read().strip()
+        except OSError:
+            pass
+    if expected_digest is not None and file_sha256(filepath) != expected_digest:
+        print(f"{filename} does not match its SHA-256 digest")
+        return False
+    
+    # Ask the server with a HEAD request, conditional on the ETag from the last download if we have one
+    headers = {}
+    try:
+        with open(filepath + ETAG_SUFFIX) as f:
+            headers["If-None-Match"] = f.read().strip()
+    except OSError:
+        pass
+    
+    try:
+        response = SESSION.head(url, allow_redirects=True, headers=headers, timeout=30)
+    except requests.RequestException as e:
+        print(f"Could not check {url} ({str(e)}), keeping local copy")
+        return True
+    
+    if response.status_code == 304:
+        return True
+    if not response.ok:
+        print(f"Could not check {url} (HTTP {response.status_code}), keeping local copy")
+        return True
+    
+    # A successful answer to a conditional request means the ETag no longer matches, whatever the size
+    if "If-None-Match" in headers:
+        print(f"{filename} has changed on the server")
+        return False
+    
+    # Compare sizes unless the server compresses the transfer, in which case Content-Length isn't the file size
+    content_length = response.headers.get("Content-Length")
+    if content_length and not response.headers.get("Content-Encoding"):
+        return int(content_length) == size
+    return True
+
 def download_pdf(url, filename, directory):
     """Download a PDF file from a URL and save it to the specified directory."""
     print(f"Downloading {filename}...")
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()  # Raise an error for bad status codes
-        
-        # Ensure the directory exists
-        os.makedirs(directory, exist_ok=True)
-        
-        # Save the file
-        filepath = os.path.join(directory, filename)
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        with SESSION.get(url, stream=True) as response:
+            response.raise_for_status()  # Raise an error for bad status codes
+            
+            # Ensure the directory exists
+            os.makedirs(directory, exist_ok=True)
+            
+            # Save the file, letting urllib3 undo any gzip/deflate transfer encoding
+            filepath = os.path.join(directory, filename)
+            response.raw.decode_content = True
+            # Hash the stream as it is written rather than reading the file back afterwards
+            h = hashlib.sha256()
+            with open(filepath, 'wb') as f:
+                for chunk in iter(lambda: response.raw.read(DOWNLOAD_CHUNK_SIZE), b''):
+                    h.update(chunk)
+                    f.write(chunk)
+            
+            digest = h.hexdigest()
+            expected_digest = EXPECTED_SHA256.get(filename)
+            if expected_digest is not None and digest != expected_digest:
+                raise ValueError(f"SHA-256 mismatch: expected {expected_digest}, got {digest}")
+            with open(filepath + SHA256_SUFFIX, 'w') as f:
+                f.write(digest)
+            
+            # Remember the ETag so the next run can ask the server whether the file changed
+            etag = response.headers.get("ETag")
+            if etag:
+                with open(filepath + ETAG_SUFFIX, 'w') as f:
+                    f.write(etag)
         
         print(f"Downloaded {filename} successfully to {filepath}")
         return True
@@ -43,17 +146,22 @@ def main():
     # Track success
     success_count = 0
     
-    # Download each PDF
-    for filename, url in PDFS.items():
-        filepath = os.path.join(pdf_directory, filename)
+    # Download the missing PDFs in parallel; the work is network-bound, so total time is the slowest download
+    with ThreadPoolExecutor(max_workers=len(PDFS)) as pool:
+        futures = []
+        for filename, url in PDFS.items():
+            filepath = os.path.join(pdf_directory, filename)
+            
+            # Check if file exists but is corrupt, truncated or out of date
+            if is_local_copy_current(url, filepath):
+                print(f"{filename} already exists, skipping download.")
+                success_count += 1
+            else:
+                print(f"{filename} is missing, corrupt or outdated, re-downloading...")
+                futures.append(pool.submit(download_pdf, url, filename, pdf_directory))
         
-        # Check if file exists but is empty or corrupt
-        if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
-            print(f"{filename} already exists, skipping download.")
-            success_count += 1
-        else:
-            print(f"{filename} is missing or corrupt, re-downloading...")
-            if download_pdf(url, filename, pdf_directory):
+        for future in as_completed(futures):
+            if future.result():
                 success_count += 1
     
     # Print summary
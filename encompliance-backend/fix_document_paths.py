@@ -1,12 +1,151 @@
+import errno
+import logging
 import os
 import sys
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import FrozenSet, Optional
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.models.document import Document
 from app.core.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Directories searched for document files, worked out once rather than per document
+PDF_STORAGE_DIR = settings.PDF_STORAGE_PATH
+RESOURCES_DIR = os.path.join(os.path.dirname(PDF_STORAGE_DIR), "resources")
+ALT_PDF_STORAGE_DIR = os.path.join(os.path.dirname(PDF_STORAGE_DIR), "pdf_storage")
+
+# Number of threads used to check documents' file locations; the checks are stat calls, so
+# they spend their time waiting on the file system rather than holding the GIL
+RESOLVE_MAX_WORKERS = 16
+
+# errno values meaning copy_file_range can't be used for this pair of files
+COPY_FILE_RANGE_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+def fast_copy(src: str, dst: str) -> None:
+    """
+    Copy a file inside the kernel with os.copy_file_range, which is a reflink on CoW file systems.
+    
+    Falls back to shutil.copy2 where copy_file_range isn't available or supported.
+    
+    Args:
+        src: File to copy
+        dst: Destination path
+    """
+    if not hasattr(os, "copy_file_range"):
+        shutil.copy2(src, dst)
+        return
+    
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+    except OSError as e:
+        if e.errno not in COPY_FILE_RANGE_UNSUPPORTED:
+            raise
+        shutil.copy2(src, dst)
+        return
+    
+    # Keep the timestamps and permission bits, as copy2 would
+    shutil.copystat(src, dst)
+
+@lru_cache(maxsize=None)
+def list_directory(directory: str) -> FrozenSet[str]:
+    """
+    Names in a directory, read with a single scandir and cached for the rest of the run.
+    
+    Args:
+        directory: Directory to list
+    
+    Returns:
+        Entry names, or an empty set if the directory doesn't exist
+    """
+    if not os.path.isdir(directory):
+        return frozenset()
+    with os.scandir(directory) as entries:
+        return frozenset(entry.name for entry in entries)
+
+def file_in_directory(directory: str, name: str) -> bool:
+    """Check for a file using the cached directory listing instead of a stat per path."""
+    if os.sep in name or (os.altsep and os.altsep in name):
+        # Names with subdirectories aren't in the top-level listing
+        return os.path.exists(os.path.join(directory, name))
+    return name in list_directory(directory)
+
+@lru_cache(maxsize=1)
+def find_test_pdf() -> Optional[str]:
+    """
+    Find a PDF that looks like a test document anywhere under the storage directory's parent.
+    
+    The tree is searched once per run and the result shared by every test.pdf document.
+    rglob walks it lazily, so the search stops at the first match.
+    
+    Returns:
+        Path of the first matching file, or None if there isn't one
+    """
+    candidates = (
+        path for path in Path(os.path.dirname(PDF_STORAGE_DIR)).rglob("*.pdf")
+        if "test" in path.name.lower() or "compliance" in path.name.lower()
+    )
+    test_file = next(candidates, None)
+    return str(test_file) if test_file is not None else None
+
+def resolve_document_path(doc):
+    """
+    Work out where a document's file is, without changing anything on disk.
+    
+    Args:
+        doc: Row with the document's id, filename and filepath
+    
+    Returns:
+        Tuple of (document, expected path, path to copy from or None, kind), where kind is
+        "ok" (already in place), "alternative", "default", "test" or "missing"
+    """
+    # Check if the file exists at the expected path
+    expected_path = os.path.join(PDF_STORAGE_DIR, doc.filepath)
+    if file_in_directory(PDF_STORAGE_DIR, doc.filepath):
+        return doc, expected_path, None, "ok"
+    
+    # Try alternative locations, as (directory, name) pairs
+    alternatives = [
+        # Try with just the filename (no timestamp)
+        (PDF_STORAGE_DIR, doc.filename),
+        
+        # Try in the resources directory
+        (RESOURCES_DIR, doc.filename),
+        
+        # Try in the pdf_storage directory
+        (ALT_PDF_STORAGE_DIR, doc.filepath),
+        
+        # Try with just the filename in pdf_storage
+        (ALT_PDF_STORAGE_DIR, doc.filename)
+    ]
+    
+    for directory, name in alternatives:
+        if file_in_directory(directory, name):
+            return doc, expected_path, os.path.join(directory, name), "alternative"
+    
+    # Check if we have a default file for common documents
+    if doc.filename == "chapter-746-centers.pdf":
+        if file_in_directory(PDF_STORAGE_DIR, "chapter-746-centers.pdf"):
+            default_path = os.path.join(PDF_STORAGE_DIR, "chapter-746-centers.pdf")
+            return doc, expected_path, default_path, "default"
+    elif doc.filename == "test.pdf":
+        # Try to find any test.pdf or test_compliance.pdf file
+        test_file = find_test_pdf()
+        if test_file:
+            return doc, expected_path, test_file, "test"
+    
+    return doc, expected_path, None, "missing"
 
 def fix_document_paths():
     """
@@ -23,97 +162,65 @@ def fix_document_paths():
     db = SessionLocal()
     
     try:
-        # Get all non-deleted documents
-        documents = db.query(Document).filter(Document.is_deleted == False).all()
-        print(f"Found {len(documents)} documents to check")
+        # Get all non-deleted documents; only these three columns are used, so fetch plain rows
+        # instead of full ORM objects
+        documents = db.query(Document.id, Document.filename, Document.filepath).filter(
+            Document.is_deleted == False
+        ).all()
+        logger.info("Found %s documents to check", len(documents))
         
         # Ensure the PDF storage directory exists
-        os.makedirs(settings.PDF_STORAGE_PATH, exist_ok=True)
+        os.makedirs(PDF_STORAGE_DIR, exist_ok=True)
+        
+        # List the storage directory up front so the worker threads share one scandir of it
+        list_directory(PDF_STORAGE_DIR)
         
-        # Process each document
-        for doc in documents:
-            print(f"\nChecking document: ID={doc.id}, Filename={doc.filename}, Path={doc.filepath}")
+        # Look up every document's file in parallel; the copies below stay sequential
+        try:
+            with ThreadPoolExecutor(max_workers=RESOLVE_MAX_WORKERS) as executor:
+                resolved = list(executor.map(resolve_document_path, documents))
+        except Exception as e:
+            logger.warning("Parallel path check failed (%s), checking documents one at a time", e)
+            resolved = [resolve_document_path(doc) for doc in documents]
+        
+        # Process each document; documents already in place are only logged at DEBUG, so a
+        # large run reports just the documents that needed fixing
+        n_ok = n_copied = n_missing = 0
+        for doc, expected_path, source_path, kind in resolved:
+            logger.debug("Checking document: ID=%s, Filename=%s, Path=%s", doc.id, doc.filename, doc.filepath)
             
-            # Check if the file exists at the expected path
-            expected_path = os.path.join(settings.PDF_STORAGE_PATH, doc.filepath)
-            if os.path.exists(expected_path):
-                print(f"✅ File exists at expected path: {expected_path}")
+            if kind == "ok":
+                logger.debug("File exists at expected path: %s", expected_path)
+                n_ok += 1
                 continue
             
-            print(f"❌ File not found at expected path: {expected_path}")
-            
-            # Try alternative paths
-            alternative_paths = [
-                # Try with just the filename (no timestamp)
-                os.path.join(settings.PDF_STORAGE_PATH, doc.filename),
-                
-                # Try in the resources directory
-                os.path.join(os.path.dirname(settings.PDF_STORAGE_PATH), "resources", doc.filename),
-                
-                # Try in the pdf_storage directory
-                os.path.join(os.path.dirname(settings.PDF_STORAGE_PATH), "pdf_storage", doc.filepath),
-                
-                # Try with just the filename in pdf_storage
-                os.path.join(os.path.dirname(settings.PDF_STORAGE_PATH), "pdf_storage", doc.filename)
-            ]
-            
-            found = False
-            for alt_path in alternative_paths:
-                if os.path.exists(alt_path):
-                    print(f"✅ Found file at alternative path: {alt_path}")
-                    
-                    # Copy the file to the expected path
-                    print(f"📋 Copying file from {alt_path} to {expected_path}")
-                    shutil.copy2(alt_path, expected_path)
-                    
-                    print(f"✅ File copied successfully")
-                    found = True
-                    break
-            
-            if not found:
-                print(f"❌ File not found at any alternative path")
-                
-                # Check if we have a default file for common documents
+            if kind == "missing":
                 if doc.filename == "chapter-746-centers.pdf":
-                    default_path = os.path.join(settings.PDF_STORAGE_PATH, "chapter-746-centers.pdf")
-                    if os.path.exists(default_path):
-                        print(f"✅ Found default file for {doc.filename}")
-                        
-                        # Copy the default file to the expected path
-                        print(f"📋 Copying default file to {expected_path}")
-                        shutil.copy2(default_path, expected_path)
-                        
-                        print(f"✅ Default file copied successfully")
-                    else:
-                        print(f"❌ Default file not found for {doc.filename}")
+                    logger.warning("Document %s: file not found at %s or any alternative path, and no default file for %s",
+                                   doc.id, expected_path, doc.filename)
                 elif doc.filename == "test.pdf":
-                    # Try to find any test.pdf or test_compliance.pdf file
-                    test_files = []
-                    for root, dirs, files in os.walk(os.path.dirname(settings.PDF_STORAGE_PATH)):
-                        for file in files:
-                            if file.endswith(".pdf") and ("test" in file.lower() or "compliance" in file.lower()):
-                                test_files.append(os.path.join(root, file))
-                    
-                    if test_files:
-                        print(f"✅ Found {len(test_files)} test PDF files")
-                        test_path = test_files[0]
-                        
-                        # Copy the test file to the expected path
-                        print(f"📋 Copying test file from {test_path} to {expected_path}")
-                        shutil.copy2(test_path, expected_path)
-                        
-                        print(f"✅ Test file copied successfully")
-                    else:
-                        print(f"❌ No test PDF files found")
+                    logger.warning("Document %s: file not found at %s or any alternative path, and no test PDF files found",
+                                   doc.id, expected_path)
+                else:
+                    logger.warning("Document %s: file not found at %s or any alternative path", doc.id, expected_path)
+                n_missing += 1
+                continue
+            
+            # Copy the alternative, default or test file to the expected path
+            fast_copy(source_path, expected_path)
+            logger.info("Document %s: copied %s file from %s to %s", doc.id, kind, source_path, expected_path)
+            n_copied += 1
         
-        print("\nDocument path check and fix completed")
+        logger.info(
+            "Document path check and fix completed: %s in place, %s copied, %s missing",
+            n_ok, n_copied, n_missing
+        )
         
-    except Exception as e:
-        print(f"Error fixing document paths: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+    except Exception:
+        logger.exception("Error fixing document paths")
     finally:
         db.close()
 
 if __name__ == "__main__":
-    fix_document_paths() 
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    fix_document_paths()
@@ -1,7 +1,15 @@
+import threading
 import uvicorn
-import app.services.document_service as document_service
 
 if __name__ == "__main__":
-    # Ensure documents are indexed at startup
-    document_service.index_existing_documents()  # Force indexation
+    # Imported here rather than at the top, since spawned child processes re-import this module
+    import app.services.document_service as document_service
+    
+    # Ensure documents are indexed at startup; index in the background so the server
+    # starts accepting requests straight away instead of waiting for the whole pass
+    threading.Thread(
+        target=document_service.index_existing_documents,  # Force indexation
+        name="index-existing-documents",
+        daemon=True
+    ).start()
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
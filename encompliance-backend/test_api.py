@@ -2,7 +2,7 @@ import httpx
 import asyncio
 import json
 
-async def test_chat_endpoint():
+async def test_chat_endpoint(client: httpx.AsyncClient):
     """Test the /chat endpoint with a simple query."""
     url = "http://localhost:8000/api/v1/chat"
     
@@ -12,13 +12,17 @@ async def test_chat_endpoint():
         "model": "local-model"
     }
     
+    try:
+        response = await client.post(url, json=payload)
+        print(f"Status Code: {response.status_code}")
+        print(f"Response: {json.dumps(response.json(), indent=2)}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+
+async def main():
+    """Run the API checks over one shared client connection."""
     async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(url, json=payload)
-            print(f"Status Code: {response.status_code}")
-            print(f"Response: {json.dumps(response.json(), indent=2)}")
-        except Exception as e:
-            print(f"Error: {str(e)}")
+        await test_chat_endpoint(client)
 
 if __name__ == "__main__":
-    asyncio.run(test_chat_endpoint()) 
\ No newline at end of file
+    asyncio.run(main())
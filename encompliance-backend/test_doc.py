@@ -1,20 +1,19 @@
 import asyncio
-import sqlite3
 from app.database import get_db
+from app.models.document import Document
 from app.services.document_service import list_documents
 
 async def test_list_documents():
     db = next(get_db())
     user_id = 8  # User ID to test
     
-    # Direct DB check
-    conn = sqlite3.connect("app.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM documents WHERE uploaded_by = ? AND is_deleted = 0", (user_id,))
-    rows = cursor.fetchall()
+    # Direct DB check, through the same session the service function uses
+    rows = db.query(Document.id, Document.filename, Document.filepath).filter(
+        Document.uploaded_by == user_id, Document.is_deleted.is_(False)
+    ).all()
     print(f"Direct DB query found {len(rows)} documents for user {user_id}")
     for row in rows:
-        print(f"Document ID: {row[0]}, Filename: {row[1]}, Filepath: {row[2]}")
+        print(f"Document ID: {row.id}, Filename: {row.filename}, Filepath: {row.filepath}")
     
     # Test service function
     try:
@@ -2,11 +2,30 @@ import os
 import sys
 import requests
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Base URL for the API
 BASE_URL = "http://localhost:8000/api/v1"
 
+# One session per thread, so calls reuse keep-alive connections without sharing a session
+# between the upload threads (requests.Session isn't guaranteed to be thread-safe)
+_thread_local = threading.local()
+
+def get_session():
+    """Get this thread's requests session, creating it on first use."""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = _thread_local.session = requests.Session()
+    return session
+
+# Number of test files uploaded at once
+UPLOAD_MAX_WORKERS = 4
+
+# Bytes written per chunk when saving a downloaded document
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
 # Test user credentials
 TEST_USER = {
     "email": "test@example.com",
@@ -17,7 +36,7 @@ def create_test_user():
     """Create a test user if it doesn't exist."""
     try:
         # Check if user exists by trying to log in
-        response = requests.post(
+        response = get_session().post(
             f"{BASE_URL}/email-login",
             json={"email": TEST_USER["email"], "password": TEST_USER["password"]}
         )
@@ -27,7 +46,7 @@ def create_test_user():
             return response.json()["access_token"]
         
         # Create user if login fails
-        response = requests.post(
+        response = get_session().post(
             f"{BASE_URL}/signup",
             json={
                 "email": TEST_USER["email"],
@@ -41,7 +60,7 @@ def create_test_user():
             print(f"Created test user: {TEST_USER['email']}")
             
             # Log in to get token
-            response = requests.post(
+            response = get_session().post(
                 f"{BASE_URL}/email-login",
                 json={"email": TEST_USER["email"], "password": TEST_USER["password"]}
             )
@@ -67,7 +86,7 @@ def test_document_upload(token, file_path):
         
         # Upload file
         with open(file_path, "rb") as file:
-            response = requests.post(
+            response = get_session().post(
                 f"{BASE_URL}/documents/upload",
                 headers={"Authorization": f"Bearer {token}"},
                 files={"file": (file_name, file)}
@@ -90,7 +109,7 @@ def test_document_upload(token, file_path):
 def test_document_list(token):
     """Test listing documents."""
     try:
-        response = requests.get(
+        response = get_session().get(
             f"{BASE_URL}/documents/list",
             headers={"Authorization": f"Bearer {token}"}
         )
@@ -111,26 +130,28 @@ def test_document_list(token):
 def test_document_download(token, document_id):
     """Test downloading a document."""
     try:
-        response = requests.get(
+        # Stream the body so the file is written chunk by chunk instead of held in memory whole
+        with get_session().get(
             f"{BASE_URL}/documents/download/{document_id}",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        
-        if response.status_code == 200:
-            # Get filename from content-disposition header
-            content_disposition = response.headers.get("content-disposition", "")
-            filename = content_disposition.split("filename=")[1].strip('"') if "filename=" in content_disposition else f"document_{document_id}"
-            
-            # Save file
-            download_path = f"downloaded_{filename}"
-            with open(download_path, "wb") as file:
-                file.write(response.content)
-            
-            print(f"Downloaded document to: {download_path}")
-            return download_path
-        else:
-            print(f"Failed to download document: {response.text}")
-            return None
+            headers={"Authorization": f"Bearer {token}"},
+            stream=True
+        ) as response:
+            if response.status_code == 200:
+                # Get filename from content-disposition header
+                content_disposition = response.headers.get("content-disposition", "")
+                filename = content_disposition.split("filename=")[1].strip('"') if "filename=" in content_disposition else f"document_{document_id}"
+                
+                # Save file
+                download_path = f"downloaded_{filename}"
+                with open(download_path, "wb") as file:
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        file.write(chunk)
+                
+                print(f"Downloaded document to: {download_path}")
+                return download_path
+            else:
+                print(f"Failed to download document: {response.text}")
+                return None
     except Exception as e:
         print(f"Error downloading document: {str(e)}")
         return None
@@ -138,7 +159,7 @@ def test_document_download(token, document_id):
 def test_document_delete(token, document_id):
     """Test deleting a document."""
     try:
-        response = requests.delete(
+        response = get_session().delete(
             f"{BASE_URL}/documents/delete/{document_id}",
             headers={"Authorization": f"Bearer {token}"}
         )
@@ -180,9 +201,6 @@ def main():
             print(f"Failed to create test PDF: {str(e)}")
             pdf_path = None
     
-    if pdf_path:
-        pdf_doc = test_document_upload(token, pdf_path)
-    
     # Test uploading a text file
     txt_path = "resources/test.txt"
     if not os.path.exists(txt_path):
@@ -198,8 +216,11 @@ def main():
             print(f"Failed to create test text file: {str(e)}")
             txt_path = None
     
-    if txt_path:
-        txt_doc = test_document_upload(token, txt_path)
+    # The uploads are independent, so send them at the same time
+    upload_paths = [path for path in (pdf_path, txt_path) if path]
+    with ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS) as executor:
+        uploaded_docs = list(executor.map(lambda path: test_document_upload(token, path), upload_paths))
+    print(f"\nUploaded {sum(1 for doc in uploaded_docs if doc)} of {len(upload_paths)} test files")
     
     print("\n=== Testing Document List ===")
     documents = test_document_list(token)
@@ -1,10 +1,19 @@
-import requests
+import asyncio
+import httpx
 import json
+from functools import lru_cache
 
 # Server URL
 BASE_URL = "http://localhost:8000/api/v1"
 
-def test_frontend_login():
+# Headers the frontend sends with its login request
+FRONTEND_HEADERS = {
+    "Content-Type": "application/json",
+    "Origin": "http://localhost:5173",  # Same origin as frontend
+    "Referer": "http://localhost:5173/"
+}
+
+async def test_frontend_login():
     """Test the login in a way that replicates how the frontend makes the request"""
     print("Testing login with the same approach as the frontend...")
 
@@ -20,37 +29,33 @@ def test_frontend_login():
         "password": "password123"  # assuming this password
     }
     
-    # Try login with working user
-    print("\n=== Testing with working test user ===")
-    try_login(test_working_user)
-    
-    # Try login with frontend user
-    print("\n=== Testing with frontend user (might not exist) ===")
-    try_login(test_frontend_user)
-    
-    # Create frontend user if needed
-    print("\n=== Creating the frontend user for future use ===")
-    create_frontend_user()
+    # One client for every request, so they share its connection pool
+    async with httpx.AsyncClient(base_url=BASE_URL, headers=FRONTEND_HEADERS) as client:
+        # Try login with the working user and the frontend user at the same time
+        await asyncio.gather(
+            try_login("Testing with working test user", test_working_user, client),
+            try_login("Testing with frontend user (might not exist)", test_frontend_user, client)
+        )
+        
+        # Create frontend user if needed
+        print("\n=== Creating the frontend user for future use ===")
+        await create_frontend_user()
+        
+        # Try login with frontend user again
+        await try_login("Testing with frontend user again (after creation)", test_frontend_user, client)
     
-    # Try login with frontend user again
-    print("\n=== Testing with frontend user again (after creation) ===")
-    try_login(test_frontend_user)
+    # Close the database connections while the event loop is still running
+    await get_engine().dispose()
 
-def try_login(credentials):
+async def try_login(label, credentials, client: httpx.AsyncClient):
     """Attempt to login with the given credentials"""
     try:
         # Make the login request
-        response = requests.post(
-            f"{BASE_URL}/email-login", 
-            json=credentials,
-            headers={
-                "Content-Type": "application/json",
-                "Origin": "http://localhost:5173",  # Same origin as frontend
-                "Referer": "http://localhost:5173/"
-            }
-        )
+        response = await client.post("/email-login", json=credentials)
         
-        # Print the response
+        # Print everything for this attempt together, after the response arrives, so concurrent
+        # attempts don't interleave their output
+        print(f"\n=== {label} ===")
         print(f"Response Status Code: {response.status_code}")
         
         # Try to parse the response body
@@ -58,10 +63,11 @@ def try_login(credentials):
             response_body = response.json()
             print(f"Response Body: {json.dumps(response_body, indent=2)}")
         except json.JSONDecodeError:
+            response_body = None
             print(f"Response Text (not JSON): {response.text}")
         
         # Check if login was successful
-        if response.status_code == 200 and "access_token" in response.json():
+        if response.status_code == 200 and response_body and "access_token" in response_body:
             print("Login successful!")
             return True
         else:
@@ -69,57 +75,75 @@ def try_login(credentials):
             return False
             
     except Exception as e:
+        print(f"\n=== {label} ===")
         print(f"Error during login test: {e}")
         return False
 
-def create_frontend_user():
-    """Create the user that the frontend is trying to login with"""
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
-    from app.models.user import User
+@lru_cache(maxsize=1)
+def get_engine():
+    """Async engine shared by every call in this process, so its pooled connections are reused"""
+    from sqlalchemy.ext.asyncio import create_async_engine
     from app.core.config import get_settings
-    from passlib.context import CryptContext
     
     settings = get_settings()
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    
-    # Create DB session
-    engine = create_engine(settings.DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    db = SessionLocal()
+    return create_async_engine(
+        settings.DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://'),
+        pool_size=5,
+        max_overflow=5
+    )
+
+@lru_cache(maxsize=1)
+def get_sessionmaker():
+    """Session factory bound to the shared engine"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    return async_sessionmaker(get_engine(), expire_on_commit=False)
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    """Password hashing context, built once instead of on every user creation"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache(maxsize=None)
+def hash_test_password(password):
+    """bcrypt hash of a test password; the test passwords are fixed, so each is hashed only once"""
+    return get_pwd_context().hash(password)
+
+async def create_frontend_user():
+    """Create the user that the frontend is trying to login with, returning its ID"""
+    from sqlalchemy.future import select
+    from app.models.user import User
     
-    try:
-        # Check if user already exists
-        test_email = "testuser5@gmail.com"
-        test_user = db.query(User).filter(User.email == test_email).first()
-        
-        if test_user:
-            print(f"User {test_email} already exists, no need to create")
-            return test_user
-        
-        # Create the test user with valid fields only
-        print(f"Creating user: {test_email}")
-        test_user = User(
-            email=test_email,
-            username="testuser5",
-            hashed_password=pwd_context.hash("password123"),
-            full_name="Test User 5",
-            operation_name="Test Operation",
-            is_active=True
-        )
-        db.add(test_user)
-        db.commit()
-        db.refresh(test_user)
-        print(f"User {test_email} created successfully")
+    async with get_sessionmaker()() as db:
+        try:
+            # Check if user already exists
+            test_email = "testuser5@gmail.com"
+            test_user_id = await db.scalar(select(User.id).where(User.email == test_email).limit(1))
+            
+            if test_user_id is not None:
+                print(f"User {test_email} already exists, no need to create")
+                return test_user_id
+            
+            # Create the test user with valid fields only
+            print(f"Creating user: {test_email}")
+            test_user = User(
+                email=test_email,
+                username="testuser5",
+                hashed_password=hash_test_password("password123"),
+                full_name="Test User 5",
+                operation_name="Test Operation",
+                is_active=True
+            )
+            db.add(test_user)
+            await db.commit()
+            print(f"User {test_email} created successfully")
+            
+            return test_user.id
         
-        return test_user
-    
-    except Exception as e:
-        print(f"Error creating user: {e}")
-        db.rollback()
-        return None
-    finally:
-        db.close()
+        except Exception as e:
+            print(f"Error creating user: {e}")
+            await db.rollback()
+            return None
 
 if __name__ == "__main__":
-    test_frontend_login() 
\ No newline at end of file
+    asyncio.run(test_frontend_login()) 
\ No newline at end of file
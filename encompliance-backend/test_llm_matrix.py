@@ -0,0 +1,37 @@
+import asyncio
+import sys
+from app.services.llm_service import close_http_clients
+from test_local_model import test_local_model
+from test_llm_with_context import test_llm_with_context as test_context_from_file
+from test_llm_with_context_17 import test_llm_with_context as test_context_from_db
+
+# Scenarios from the individual LLM test scripts, run in order in one process and event loop so
+# the app settings and LLM service are only imported and set up once
+SCENARIOS = {
+    "local-model": test_local_model,
+    "context-from-file": test_context_from_file,
+    "context-from-db-17": test_context_from_db,
+}
+
+async def run_scenarios(names):
+    """
+    Run the named scenarios one after another, sharing the LLM service's HTTP client.
+    
+    Args:
+        names: Keys of SCENARIOS to run
+    """
+    try:
+        for name in names:
+            print(f"\n===== {name} =====")
+            await SCENARIOS[name]()
+    finally:
+        await close_http_clients()
+
+if __name__ == "__main__":
+    # Run every scenario, or only the ones named on the command line
+    names = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+        sys.exit(1)
+    asyncio.run(run_scenarios(names))
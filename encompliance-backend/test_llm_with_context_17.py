@@ -1,3 +1,4 @@
+import hashlib
 import os
 import sys
 import traceback
@@ -10,12 +11,9 @@ from app.services.document_service import get_document_context
 
 settings = get_settings()
 
-# Default system message
-DEFAULT_SYSTEM_MESSAGE = """
-You are an AI assistant for Encompliance.io, a platform that helps daycare operators comply with regulations.
-Your role is to provide helpful, accurate information about childcare regulations and compliance.
-Be concise, professional, and focus on answering the user's questions directly.
-"""
+# Responses saved by document context and prompt digest; pass --cached to print a saved response
+# instead of calling the model again
+LLM_RESPONSE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".encompliance_cache", "llm")
 
 async def test_llm_with_context():
     """
@@ -35,6 +33,19 @@ async def test_llm_with_context():
         # Construct the prompt
         prompt = "What does the real test.pdf file say?"
         
+        # The context digest shows whether the model server is seeing the same prefix as last run
+        digest = hashlib.sha256(document_context.encode("utf-8")).hexdigest()
+        print(f"Document context SHA-256: {digest}")
+        cache_path = os.path.join(
+            LLM_RESPONSE_CACHE_DIR,
+            f"{digest}-{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]}.json"
+        )
+        if "--cached" in sys.argv and os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                print(f"\nLLM Response (cached in {cache_path}):")
+                print(json.load(f)["response"])
+            return
+        
         # Define the operation type
         operation_type = "chat"
         
@@ -46,11 +57,25 @@ async def test_llm_with_context():
             document_ids=[doc_id],
             document_context=document_context,
             db=db,
-            stream=False
+            stream=True
         )
         
         print("\nLLM Response:")
-        print(response)
+        # Errors come back as a plain string; otherwise print chunks as they are generated
+        if isinstance(response, str):
+            print(response)
+        else:
+            chunks = []
+            async for chunk in response:
+                chunks.append(chunk)
+                sys.stdout.write(chunk)
+                sys.stdout.flush()
+            print()
+            
+            # Save the response for later --cached runs against the same context and prompt
+            os.makedirs(LLM_RESPONSE_CACHE_DIR, exist_ok=True)
+            with open(cache_path, "w", encoding="utf-8") as f:
+                json.dump({"digest": digest, "prompt": prompt, "response": "".join(chunks)}, f)
         
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -4,6 +4,10 @@ import json
 # Server URL
 BASE_URL = "http://localhost:8000/api/v1"
 
+# Shared session so repeated logins reuse one keep-alive connection
+SESSION = requests.Session()
+SESSION.headers.update({"Content-Type": "application/json"})
+
 def test_login():
     """Test the email-login endpoint with our test user"""
     print("Testing login with test user...")
@@ -16,11 +20,7 @@ def test_login():
     
     try:
         # Make the login request
-        response = requests.post(
-            f"{BASE_URL}/email-login", 
-            json=login_data,
-            headers={"Content-Type": "application/json"}
-        )
+        response = SESSION.post(f"{BASE_URL}/email-login", json=login_data)
         
         # Print the response
         print(f"Response Status Code: {response.status_code}")
@@ -1,45 +1,77 @@
+import hashlib
 import os
 import PyPDF2
 import traceback
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
 from io import BytesIO
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+# PyMuPDF extracts text several times faster than PyPDF2; fall back to PyPDF2 if it isn't installed
+try:
+    import fitz  # PyMuPDF
+    USE_PYMUPDF = True
+except ImportError:
+    print("Warning: PyMuPDF not installed. Falling back to PyPDF2 for PDF text extraction.")
+    USE_PYMUPDF = False
+
+# Worker processes for PyPDF2 page extraction, and the page count below which the pages are
+# read in-process because starting the workers costs more than it saves
+PDF_EXTRACT_MAX_WORKERS = os.cpu_count() or 1
+PDF_PARALLEL_MIN_PAGES = 4
+
+# Extracted text is kept here between runs, one file per PDF version
+PDF_TEXT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".encompliance_cache")
+
+# Location and SHA-1 of the checked-in test PDF; it is only regenerated with reportlab
+# when it is missing or no longer matches
+TEST_PDF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "test_compliance.pdf")
+TEST_PDF_SHA1 = "4f5a3bde02e5489cfc9956e95388d9fdd4fc3616"
+
+# Text drawn into the test PDF
+TEST_PDF_TITLE = "Test Compliance Document"
+TEST_PDF_PARAGRAPHS = (
+    "This is a test PDF document for the compliance system.",
+    "",
+    "Compliance Regulations:",
+    "1. All daycare facilities must maintain a 1:4 staff-to-child ratio for children under 2 years old.",
+    "2. Staff members must have CPR certification renewed every 2 years.",
+    "3. Background checks must be performed on all staff members annually.",
+    "4. Facilities must have at least 35 square feet of indoor space per child.",
+    "5. Fire drills must be conducted monthly and documented.",
+    "6. All medications must be stored in locked cabinets.",
+    "7. Food handling areas must be separate from diapering areas.",
+    "8. Building must comply with local fire and safety codes.",
+    "9. Emergency evacuation plans must be posted in visible locations.",
+    "10. Daily health checks must be performed and documented for each child.",
+    "",
+    "Residential Care Compliance Requirements:",
+    "1. Maintain a 1:6 staff-to-resident ratio during waking hours.",
+    "2. Medication administration records must be maintained for all residents.",
+    "3. Staff must complete 40 hours of training annually.",
+    "4. Each resident must have an individualized care plan updated quarterly.",
+    "5. Facilities must conduct and document monthly safety inspections.",
+)
+
+# Text the extractors should return for the test PDF; parsers differ in blank lines and trailing
+# newlines, so it is compared with whitespace normalized
+TEST_PDF_EXPECTED_TEXT = "Page 1:\n" + "\n".join([TEST_PDF_TITLE, *TEST_PDF_PARAGRAPHS])
 
 def create_test_pdf(output_path):
     """Create a test PDF file"""
+    # reportlab is only needed when the fixture has to be regenerated
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+    
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=letter)
     c.setFont("Helvetica", 12)
     
     # Add a title
-    c.drawString(100, 750, "Test Compliance Document")
+    c.drawString(100, 750, TEST_PDF_TITLE)
     
     # Add some paragraphs of text
-    paragraphs = [
-        "This is a test PDF document for the compliance system.",
-        "",
-        "Compliance Regulations:",
-        "1. All daycare facilities must maintain a 1:4 staff-to-child ratio for children under 2 years old.",
-        "2. Staff members must have CPR certification renewed every 2 years.",
-        "3. Background checks must be performed on all staff members annually.",
-        "4. Facilities must have at least 35 square feet of indoor space per child.",
-        "5. Fire drills must be conducted monthly and documented.",
-        "6. All medications must be stored in locked cabinets.",
-        "7. Food handling areas must be separate from diapering areas.",
-        "8. Building must comply with local fire and safety codes.",
-        "9. Emergency evacuation plans must be posted in visible locations.",
-        "10. Daily health checks must be performed and documented for each child.",
-        "",
-        "Residential Care Compliance Requirements:",
-        "1. Maintain a 1:6 staff-to-resident ratio during waking hours.",
-        "2. Medication administration records must be maintained for all residents.",
-        "3. Staff must complete 40 hours of training annually.",
-        "4. Each resident must have an individualized care plan updated quarterly.",
-        "5. Facilities must conduct and document monthly safety inspections.",
-    ]
-    
     y_position = 730
-    for paragraph in paragraphs:
+    for paragraph in TEST_PDF_PARAGRAPHS:
         y_position -= 20
         c.drawString(100, y_position, paragraph)
         if y_position < 100:
@@ -51,23 +83,80 @@ def create_test_pdf(output_path):
     # Save the PDF to the file
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     with open(output_path, "wb") as f:
-        f.write(buffer.getvalue())
+        f.write(buffer.getbuffer())
     
     print(f"Created test PDF at: {output_path}")
     return output_path
 
-def extract_text_from_pdf(pdf_path):
-    """Extract text from a PDF file"""
+def file_sha1(path):
+    """Return the hex SHA-1 digest of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@lru_cache(maxsize=None)
+def get_test_pdf():
+    """
+    Return the path to the test PDF, generating it at most once per run.
+    
+    Returns:
+        Path to resources/test_compliance.pdf
+    """
+    if os.path.exists(TEST_PDF_PATH) and file_sha1(TEST_PDF_PATH) == TEST_PDF_SHA1:
+        return TEST_PDF_PATH
+    return create_test_pdf(TEST_PDF_PATH)
+
+def extract_page_range(pdf_path, page_start, page_end):
+    """
+    Extract the text of pages [page_start, page_end) with PyPDF2.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        page_start: Index of the first page to read
+        page_end: Index one past the last page to read
+        
+    Returns:
+        List of page texts, in page order
+    """
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return [reader.pages[page_num].extract_text() for page_num in range(page_start, page_end)]
+
+def read_pdf_text(pdf_path):
+    """Extract text from a PDF file, without caching"""
     try:
         text = []
         
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
+        if USE_PYMUPDF:
+            # MuPDF parses the content streams in C
+            with fitz.open(pdf_path) as doc:
+                for page_num, page in enumerate(doc):
+                    text.append(f"Page {page_num + 1}:\n{page.get_text()}")
+        else:
+            with open(pdf_path, 'rb') as file:
+                reader = PyPDF2.PdfReader(file)
+                num_pages = len(reader.pages)
+                parallel = num_pages >= PDF_PARALLEL_MIN_PAGES and PDF_EXTRACT_MAX_WORKERS >= 2
+                
+                # Extract text from each page
+                if not parallel:
+                    page_texts = [reader.pages[page_num].extract_text() for page_num in range(num_pages)]
+            
+            if parallel:
+                # PyPDF2's decoder is pure Python, so split the pages into one contiguous range per
+                # worker process; each worker reopens the file and reads only its range
+                range_size = -(-num_pages // PDF_EXTRACT_MAX_WORKERS)
+                starts = range(0, num_pages, range_size)
+                ends = [min(start + range_size, num_pages) for start in starts]
+                page_texts = []
+                with ProcessPoolExecutor(max_workers=len(ends)) as executor:
+                    for texts in executor.map(extract_page_range, [pdf_path] * len(ends), starts, ends):
+                        page_texts.extend(texts)
             
-            # Extract text from each page
-            for page_num in range(len(reader.pages)):
-                page = reader.pages[page_num]
-                text.append(f"Page {page_num + 1}:\n{page.extract_text()}")
+            for page_num, page_text in enumerate(page_texts):
+                text.append(f"Page {page_num + 1}:\n{page_text}")
         
         return "\n\n".join(text)
     except Exception as e:
@@ -75,16 +164,55 @@ def extract_text_from_pdf(pdf_path):
         print(traceback.format_exc())
         return f"[Error extracting text from {os.path.basename(pdf_path)}]"
 
+@lru_cache(maxsize=64)
+def extract_text_for_stat(pdf_path, mtime_ns, size):
+    """
+    Extract text for one version of a file, memoized in memory and on disk.
+    
+    Args:
+        pdf_path: Absolute path to the PDF file
+        mtime_ns: Modification time of the file in nanoseconds
+        size: Size of the file in bytes
+        
+    Returns:
+        Extracted text from the PDF
+    """
+    # The key changes whenever the file is modified, so stale entries are never read
+    cache_key = hashlib.sha1(f"{pdf_path}:{mtime_ns}:{size}".encode("utf-8")).hexdigest()
+    cache_path = os.path.join(PDF_TEXT_CACHE_DIR, f"{cache_key}.txt")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        pass
+    
+    text = read_pdf_text(pdf_path)
+    
+    # Errors aren't cached, so a failed extraction is retried next time
+    if not text.startswith("[Error"):
+        try:
+            os.makedirs(PDF_TEXT_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not write PDF text cache {cache_path}: {str(e)}")
+    return text
+
+def extract_text_from_pdf(pdf_path):
+    """Extract text from a PDF file, reusing the result while the file is unchanged"""
+    try:
+        stat = os.stat(pdf_path)
+    except OSError:
+        # Let the extractor report the missing file
+        return read_pdf_text(pdf_path)
+    return extract_text_for_stat(os.path.abspath(pdf_path), stat.st_mtime_ns, stat.st_size)
+
 def test_pdf_extraction():
     """Test the PDF extraction functionality"""
-    # Create resources directory if it doesn't exist
-    resources_dir = os.path.join(os.path.dirname(__file__), "resources")
-    os.makedirs(resources_dir, exist_ok=True)
-    
-    # Create test PDF
-    test_pdf_path = os.path.join(resources_dir, "test_compliance.pdf")
-    if not os.path.exists(test_pdf_path):
-        test_pdf_path = create_test_pdf(test_pdf_path)
+    # Reuse the checked-in test PDF unless it has to be regenerated
+    test_pdf_path = get_test_pdf()
     
     print(f"\nTesting PDF at path: {test_pdf_path}")
     print(f"File exists: {os.path.exists(test_pdf_path)}")
@@ -99,6 +227,12 @@ def test_pdf_extraction():
         print(f"\nSuccessfully extracted text ({len(text)} characters)")
         print("Text preview:")
         print(text[:500] + "..." if len(text) > 500 else text)
+        
+        # The test PDF's contents are authored above, so check the parser actually recovered them
+        if " ".join(text.split()) == " ".join(TEST_PDF_EXPECTED_TEXT.split()):
+            print("\nExtracted text matches the expected test PDF text")
+        else:
+            print("\nWARNING: Extracted text does not match the expected test PDF text")
     else:
         print("Failed to extract text")
 
@@ -1,27 +1,7 @@
 import os
 import sys
-import PyPDF2
 from pathlib import Path
-
-def extract_text_from_pdf(pdf_path):
-    """Extract text from a PDF file"""
-    try:
-        text = []
-        
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            
-            # Extract text from each page
-            for page_num in range(len(reader.pages)):
-                page = reader.pages[page_num]
-                text.append(f"Page {page_num + 1}:\n{page.extract_text()}")
-        
-        return "\n\n".join(text)
-    except Exception as e:
-        print(f"Error extracting text from PDF {pdf_path}: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        return f"[Error extracting text from {os.path.basename(pdf_path)}]"
+from test_pdf_context import extract_text_from_pdf
 
 def main():
     """Main function"""
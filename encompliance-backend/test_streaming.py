@@ -1,7 +1,9 @@
 import asyncio
 import httpx
-import json
+import orjson
 import os
+import sys
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -20,6 +22,36 @@ if '/v1' in LM_STUDIO_URL:
 else:
     CHAT_ENDPOINT = f"{LM_STUDIO_URL}/v1/chat/completions"
 
+# Streamed text is written to the terminal once this many characters are pending or this many
+# seconds have passed, instead of one write per token
+STREAM_FLUSH_CHARS = 64
+STREAM_FLUSH_INTERVAL = 0.05
+
+# SSE framing, compared against the raw bytes so chunks never need decoding
+SSE_DATA_PREFIX = b"data: "
+SSE_DATA_PREFIX_LEN = len(SSE_DATA_PREFIX)
+SSE_DONE = b"[DONE]"
+
+async def aiter_raw_lines(response):
+    """
+    Yield the lines of a streaming response as bytes, reassembling lines split across chunks.
+    
+    Args:
+        response: The open streaming response
+        
+    Yields:
+        Each line without its trailing newline
+    """
+    pending = b""
+    async for chunk in response.aiter_bytes():
+        lines = (pending + chunk).split(b"\n") if pending else chunk.split(b"\n")
+        # The last piece is an incomplete line until the next chunk (or the end of the stream)
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
 async def test_streaming():
     """
     Test streaming with LM Studio.
@@ -54,33 +86,48 @@ async def test_streaming():
                 print("Streaming response:")
                 print("-" * 50)
                 
-                # Process streaming response
+                # Process streaming response line by line, so an event split across network
+                # chunks is never parsed in pieces
                 buffer = ""
-                async for chunk in response.aiter_text():
-                    if chunk.strip():
-                        # Parse the SSE data format
-                        for line in chunk.strip().split('\n'):
-                            if line.startswith('data: '):
-                                data = line[6:]  # Remove 'data: ' prefix
-                                if data.strip() == '[DONE]':
-                                    print("\n[DONE]")
-                                    break
-
-                                try:
-                                    chunk_data = json.loads(data)
-                                    if (
-                                        chunk_data.get("choices") and 
-                                        chunk_data["choices"][0].get("delta") and 
-                                        chunk_data["choices"][0]["delta"].get("content")
-                                    ):
-                                        text_chunk = chunk_data["choices"][0]["delta"]["content"]
-                                        buffer += text_chunk
-                                        print(text_chunk, end="", flush=True)
-                                except Exception as e:
-                                    print(f"\nError parsing chunk data: {str(e)}")
-                                    print(f"Raw chunk: {data[:100]}")
-                                    continue
+                pending = []
+                pending_chars = 0
+                last_flush = time.monotonic()
+                async for line in aiter_raw_lines(response):
+                    # Parse the SSE data format; orjson reads the bytes payload directly
+                    if not line.startswith(SSE_DATA_PREFIX):
+                        continue
+                    data = line[SSE_DATA_PREFIX_LEN:].strip()  # Remove 'data: ' prefix
+                    if data == SSE_DONE:
+                        sys.stdout.write("".join(pending))
+                        pending = []
+                        print("\n[DONE]")
+                        break
+                    
+                    try:
+                        chunk_data = orjson.loads(data)
+                        if (
+                            chunk_data.get("choices") and 
+                            chunk_data["choices"][0].get("delta") and 
+                            chunk_data["choices"][0]["delta"].get("content")
+                        ):
+                            text_chunk = chunk_data["choices"][0]["delta"]["content"]
+                            buffer += text_chunk
+                            pending.append(text_chunk)
+                            pending_chars += len(text_chunk)
+                            now = time.monotonic()
+                            if pending_chars >= STREAM_FLUSH_CHARS or now - last_flush >= STREAM_FLUSH_INTERVAL:
+                                sys.stdout.write("".join(pending))
+                                sys.stdout.flush()
+                                pending = []
+                                pending_chars = 0
+                                last_flush = now
+                    except Exception as e:
+                        print(f"\nError parsing chunk data: {str(e)}")
+                        print(f"Raw chunk: {data[:100].decode('utf-8', 'replace')}")
+                        continue
                 
+                # Write whatever is left if the stream ended without [DONE]
+                sys.stdout.write("".join(pending))
                 print("\n" + "-" * 50)
                 print(f"Complete response: {buffer}")
     